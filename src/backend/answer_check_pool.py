@@ -0,0 +1,220 @@
+# backend/answer_check_pool.py
+"""Step answer checks in worker processes under a CPU time budget.
+
+Every session of the app shares one process, so an answer that takes
+sympy seconds to parse or simplify would stall all of them. Instead, each
+submission passes the answer checker's front end (length and nesting
+limits) here, and is then checked in one of a few worker processes. A
+worker arms a CPU timer (SIGPROF) of ANSWER_CHECK_BUDGET_SECONDS for each
+check. Work that does not return to Python in time, such as the integer
+power in "9^9^9", is ended by killing the worker after
+ANSWER_CHECK_KILL_GRACE_SECONDS more and starting a fresh one. Such an
+answer is refused with AnswerCheckError instead of being graded.
+
+Each step's answer key goes to the same worker, which keeps its parsed key
+and the inputs it has parsed cached. A wrong answer's fingerprint is
+computed in the same check. Verdicts are cached here, so resubmitting an
+answer costs nothing, and so are refusals by the CPU budget or the front
+end. A worker killed on the wall clock is not: the machine may only have
+been busy, so the answer is checked again when it is resubmitted. With
+ANSWER_CHECK_WORKERS=0 checks run in the calling thread, bounded only by
+the front end.
+"""
+import multiprocessing
+import os
+import signal
+import threading
+from typing import Optional, Sequence, Tuple
+
+from backend.answer_checker import (
+    NUMERIC_CHECK, AnswerCheckError, answer_key, bounded_input, grade_answer, warm_answer_keys,
+)
+from backend.retrieval_cache import BoundedLRUCache
+
+ANSWER_CHECK_WORKERS = int(os.getenv("ANSWER_CHECK_WORKERS", 2))
+ANSWER_CHECK_BUDGET_SECONDS = float(os.getenv("ANSWER_CHECK_BUDGET_SECONDS", 1.0))
+ANSWER_CHECK_KILL_GRACE_SECONDS = float(os.getenv("ANSWER_CHECK_KILL_GRACE_SECONDS", 0.5))
+VERDICT_CACHE_BYTES = int(os.getenv("ANSWER_VERDICT_CACHE_BYTES", 4 * 1024 * 1024))
+
+_TOO_COMPLEX = "Your answer is too complex to check. Try simplifying it."
+_BUSY = "The answer checker is busy. Please submit again in a moment."
+
+
+class CheckTimeout(BaseException):
+    """Raised in a worker when a check exhausts its CPU budget
+
+    Not an Exception, so the checker's own "except Exception" fallbacks
+    cannot turn a timeout into a verdict.
+    """
+
+
+def _on_budget(signum, frame):
+    raise CheckTimeout()
+
+
+def _serve(connection, budget):
+    """Worker loop: answer ("check", input, valid_answers, numeric) and ("warm", keys) messages"""
+    signal.signal(signal.SIGPROF, _on_budget)
+    while True:
+        try:
+            message = connection.recv()
+        except EOFError:
+            return
+        try:
+            signal.setitimer(signal.ITIMER_PROF, budget)
+            if message[0] == "check":
+                reply = ("ok", grade_answer(*message[1:]))
+            else:
+                for valid_answers in message[1]:
+                    answer_key(valid_answers)
+                reply = ("ok", None)
+        except CheckTimeout:
+            reply = ("refused", _TOO_COMPLEX)
+        except AnswerCheckError as e:
+            reply = ("refused", str(e))
+        except Exception as e:
+            reply = ("error", str(e) or type(e).__name__)
+        finally:
+            signal.setitimer(signal.ITIMER_PROF, 0)
+        connection.send(reply)
+
+
+class _Worker:
+    def __init__(self, budget):
+        self.connection, child = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(target=_serve, args=(child, budget), daemon=True,
+                                               name="answer-check")
+        self.process.start()
+        child.close()
+
+    def stop(self):
+        self.process.kill()
+        self.process.join()
+        self.connection.close()
+
+
+class AnswerCheckPool:
+    """Worker processes that check step answers, at most one check per worker at a time
+
+    grade() and check() block the calling session until the verdict is in,
+    which takes at most budget + grace seconds plus the wait for a free
+    worker.
+    """
+
+    def __init__(self, workers=ANSWER_CHECK_WORKERS, budget=ANSWER_CHECK_BUDGET_SECONDS,
+                 grace=ANSWER_CHECK_KILL_GRACE_SECONDS):
+        self.workers = workers
+        self.budget = budget
+        self.grace = grace
+        self.verdicts = BoundedLRUCache(VERDICT_CACHE_BYTES, lambda verdict: len(repr(verdict)))
+        self._workers = None
+        self._idle = set()
+        self._condition = threading.Condition()
+        self.counts = {"checked": 0, "refused": 0, "killed": 0, "busy": 0}
+
+    def _acquire(self, index, exact=False):
+        """Take worker index if it is idle, else any idle worker unless exact; None if none frees up"""
+        with self._condition:
+            if self._workers is None:
+                self._workers = [_Worker(self.budget) for _ in range(self.workers)]
+                self._idle = set(range(self.workers))
+            # A busy worker is free again, or killed, within budget + grace
+            if not self._condition.wait_for(lambda: index in self._idle or self._idle and not exact,
+                                            timeout=2 * (self.budget + self.grace)):
+                return None
+            index = index if index in self._idle else min(self._idle)
+            self._idle.remove(index)
+            return index
+
+    def _release(self, index):
+        with self._condition:
+            self._idle.add(index)
+            self._condition.notify_all()
+
+    def _call(self, index, message):
+        """The worker's reply, ("killed", None) or ("died", None); a killed or dead worker is replaced"""
+        worker = self._workers[index]
+        try:
+            worker.connection.send(message)
+            if worker.connection.poll(self.budget + self.grace):
+                return worker.connection.recv()
+            reply = ("killed", None)
+        except (EOFError, OSError):
+            reply = ("died", None)
+        worker.stop()
+        self._workers[index] = _Worker(self.budget)
+        with self._condition:
+            self.counts["killed"] += 1
+        return reply
+
+    def _preferred(self, valid_answers):
+        return hash(valid_answers) % self.workers
+
+    def check(self, student_input: str, valid_answers: Sequence[str], numeric: bool = NUMERIC_CHECK) -> bool:
+        """Whether the input is a correct answer to the step, or AnswerCheckError if it is not graded"""
+        return self.grade(student_input, valid_answers, numeric)[0]
+
+    def grade(self, student_input: str, valid_answers: Sequence[str],
+              numeric: bool = NUMERIC_CHECK) -> Tuple[bool, Optional[str]]:
+        """(correct, fingerprint of the input if it is wrong), or AnswerCheckError if it is not graded"""
+        text = bounded_input(student_input)
+        valid_answers = tuple(valid_answers)
+        if self.workers <= 0:
+            return grade_answer(text, valid_answers, numeric)
+        key = (valid_answers, text, numeric)
+        verdict = self.verdicts.get(key)
+        if verdict is None:
+            # A worker that died mid-check says nothing about the answer: check it once more on its replacement
+            for _ in range(2):
+                index = self._acquire(self._preferred(valid_answers))
+                if index is None:
+                    with self._condition:
+                        self.counts["busy"] += 1
+                    raise AnswerCheckError(_BUSY)
+                try:
+                    reply = self._call(index, ("check", text, valid_answers, numeric))
+                finally:
+                    self._release(index)
+                if reply[0] != "died":
+                    break
+            if reply[0] in ("ok", "refused"):
+                verdict = reply[1]
+            elif reply[0] in ("killed", "died"):
+                # Not cached: wall-clock time depends on the load, so a resubmission is checked again
+                raise AnswerCheckError(_TOO_COMPLEX)
+            else:
+                # A checker bug, not the student's answer: grade it wrong as before, but do not cache that
+                print(f"⚠️ Answer check failed: {reply[1]}")
+                return False, None
+            self.verdicts.put(key, verdict)
+            with self._condition:
+                self.counts["refused" if isinstance(verdict, str) else "checked"] += 1
+        if isinstance(verdict, str):
+            raise AnswerCheckError(verdict)
+        return verdict
+
+    def warm(self, steps: Optional[Sequence[dict]]) -> None:
+        """Parse the answer keys of a question's steps in the workers that will check them"""
+        if self.workers <= 0:
+            warm_answer_keys(steps)
+            return
+        keys = {}
+        for step in steps or ():
+            if step.get("valid_answers"):
+                valid_answers = tuple(step["valid_answers"])
+                keys.setdefault(self._preferred(valid_answers), []).append(valid_answers)
+        for index, valid_answers in keys.items():
+            if self._acquire(index, exact=True) is None:
+                continue
+            try:
+                self._call(index, ("warm", valid_answers))
+            finally:
+                self._release(index)
+
+    def stats(self):
+        with self._condition:
+            return {"idle": len(self._idle), **self.counts, "cache_hits": self.verdicts.hits}
+
+
+# Shared by every session in this process
+ANSWER_CHECK_POOL = AnswerCheckPool()
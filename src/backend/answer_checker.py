@@ -0,0 +1,463 @@
+# backend/answer_checker.py
+"""Step answer checking by mathematical equivalence instead of string matching.
+
+A step's valid_answers are parsed once into an answer key and cached, so
+each submission only parses the student's input. The prefetcher warms
+the keys of the questions a student is looking at. Three kinds of answer
+are understood:
+- expressions, equal when their difference simplifies to zero, so
+  "4x(x^2-16)" matches "4x^3 - 64x". Both sides are first compiled to
+  NumPy and compared at random points, which rejects most wrong answers
+  without sympy. Agreement at sample points proves nothing (an answer
+  off by 10^-12 agrees too), so it is always confirmed symbolically;
+- comma-separated solution sets, compared ignoring order ("4, -4, 0" or
+  "x = 0, x = ±4" match "-4, 0, 4"). Numbers separated only by spaces
+  ("-4 0 4") are read as a list too, never as a product;
+- "x = 4 is local minimum" statements, of which a step's valid_answers
+  list all parts of one answer, so every point must be classified.
+Anything else is compared as text with case and spaces ignored. A wrong
+answer is reduced to a fingerprint, the same string for every way of
+writing it ("4(x^3 - 16)" and "4x^3 - 64"), which wrong_answers.py counts.
+
+Student input first passes a front end that runs in linear time: inputs
+longer than MAX_INPUT_LENGTH or nested deeper than MAX_NESTING_DEPTH are
+refused with AnswerCheckError before any regular expression or sympy sees
+them. Only digits, letters, + - * / ^ ( ) and decimal points reach sympy,
+and unknown names become symbols, so parsing cannot reach Python builtins.
+Inputs within the limits can still be expensive ("9^9^9"); the worker pool
+of answer_check_pool.py bounds their CPU time.
+"""
+import functools
+import keyword
+import os
+import re
+import string
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+import sympy
+from sympy.parsing.sympy_parser import (
+    convert_xor, implicit_multiplication_application, parse_expr, standard_transformations,
+)
+
+ANSWER_KEY_CACHE_SIZE = int(os.getenv("ANSWER_KEY_CACHE_SIZE", "4096"))
+STUDENT_INPUT_CACHE_SIZE = int(os.getenv("STUDENT_INPUT_CACHE_SIZE", "16384"))
+
+# Front end limits on student input: far above any real answer, far below what pins a parser
+MAX_INPUT_LENGTH = int(os.getenv("ANSWER_MAX_INPUT_LENGTH", "400"))
+MAX_NESTING_DEPTH = int(os.getenv("ANSWER_MAX_NESTING_DEPTH", "16"))
+
+EXPRESSION, SOLUTION_SET, CLASSIFICATION, TEXT = "expression", "set", "classification", "text"
+
+_TRANSFORMATIONS = standard_transformations + (implicit_multiplication_application, convert_xor)
+# Everything a parsed expression may refer to besides the names the transformations emit
+_GLOBALS = {
+    **{name: getattr(sympy, name) for name in (
+        "Integer", "Float", "Rational", "Symbol", "Function", "Lambda", "factorial", "factorial2",
+        "sin", "cos", "tan", "sec", "csc", "cot", "asin", "acos", "atan", "exp", "log", "sqrt", "pi",
+    )},
+    "ln": sympy.log,
+    "abs": sympy.Abs,
+}
+NUMBER, NAME, OPERATOR, OPEN, CLOSE, SYMBOL = "number", "name", "operator", "open", "close", "symbol"
+_OPERATORS = frozenset("+-*/^")
+_OPENING, _CLOSING = frozenset("([{"), frozenset(")]}")
+_DIGITS, _LETTERS = frozenset(string.digits), frozenset(string.ascii_letters)
+# What parse_expression hands to sympy
+_EXPRESSION_KINDS = frozenset((NUMBER, NAME, OPERATOR))
+_EXPRESSION_BRACKETS = frozenset(((OPEN, "("), (CLOSE, ")")))
+# "f(x) =", "f'(x) =", "y =", "dy/dx =" in front of an answer
+_LEFT_SIDE = re.compile(r"^\s*(?:[A-Za-z]'*(?:\([A-Za-z]\))?|d[A-Za-z]/d[A-Za-z])\s*=")
+_STATEMENT = re.compile(
+    r"(?P<var>[A-Za-z])\s*=\s*(?P<value>[^,;=]+?)\s+is\s+(?:an?\s+)?(?:a\s+)?"
+    r"(?P<label>(?:local\s+|relative\s+)?(?:min(?:imum)?|max(?:imum)?)|neither)\b",
+    re.IGNORECASE,
+)
+# "-4 0 4": numbers separated only by spaces are a list, never a product
+_SPACED_NUMBER = r"[-+]?(?:\d+(?:\.\d*)?|\.\d+)"
+_SPACED_NUMBERS = re.compile(rf"{_SPACED_NUMBER}(?:\s+{_SPACED_NUMBER})+")
+_NUMBER_SPACE_NUMBER = re.compile(r"\d\.?\s+\.?\d")
+# Numeric fast path: values at NUMERIC_SAMPLES random points differing by more than NUMERIC_MISMATCH
+# (relative) anywhere mean different; anything else is decided symbolically
+NUMERIC_CHECK = os.getenv("ANSWER_NUMERIC_CHECK", "1") != "0"
+NUMERIC_SAMPLES = 16
+NUMERIC_MIN_SAMPLES = 4
+NUMERIC_MISMATCH = 1e-6
+_NUMPY_FUNCTIONS = {
+    sympy.sin: np.sin, sympy.cos: np.cos, sympy.tan: np.tan, sympy.asin: np.arcsin, sympy.acos: np.arccos,
+    sympy.atan: np.arctan, sympy.exp: np.exp, sympy.log: np.log, sympy.Abs: np.abs,
+    sympy.sec: lambda x: 1 / np.cos(x), sympy.csc: lambda x: 1 / np.sin(x), sympy.cot: lambda x: 1 / np.tan(x),
+}
+_UNICODE = str.maketrans({"−": "-", "–": "-", "·": "*", "×": "*", "²": "^2", "³": "^3"})
+
+
+class AnswerCheckError(ValueError):
+    """A submission that is not graded; the message is shown to the student"""
+
+
+class _Unparseable(ValueError):
+    pass
+
+
+def tokenize(text: str) -> Tuple[Tuple[str, str], ...]:
+    """(kind, text) tokens of text in one pass, or AnswerCheckError past MAX_NESTING_DEPTH
+
+    Numbers are digit runs with at most one decimal point, names are letter
+    runs, brackets are OPEN/CLOSE and every other non-space character is a
+    one-character OPERATOR or SYMBOL token.
+    """
+    tokens, depth, position, end = [], 0, 0, len(text)
+    while position < end:
+        char, start = text[position], position
+        position += 1
+        if char in _DIGITS or char == "." and position < end and text[position] in _DIGITS:
+            while position < end and text[position] in _DIGITS:
+                position += 1
+            if char != "." and position + 1 < end and text[position] == "." and text[position + 1] in _DIGITS:
+                position += 1
+                while position < end and text[position] in _DIGITS:
+                    position += 1
+            tokens.append((NUMBER, text[start:position]))
+        elif char in _LETTERS:
+            while position < end and text[position] in _LETTERS:
+                position += 1
+            tokens.append((NAME, text[start:position]))
+        elif char in _OPENING:
+            depth += 1
+            if depth > MAX_NESTING_DEPTH:
+                raise AnswerCheckError(f"Your answer nests brackets more than {MAX_NESTING_DEPTH} deep.")
+            tokens.append((OPEN, char))
+        elif char in _CLOSING:
+            depth = max(depth - 1, 0)
+            tokens.append((CLOSE, char))
+        elif char in _OPERATORS:
+            tokens.append((OPERATOR, char))
+        elif not char.isspace():
+            tokens.append((SYMBOL, char))
+    return tuple(tokens)
+
+
+def bounded_input(student_input: str) -> str:
+    """The student's input ready for parsing, or AnswerCheckError if it is too long or too deeply nested"""
+    if len(student_input) > MAX_INPUT_LENGTH:
+        raise AnswerCheckError(f"Your answer is longer than {MAX_INPUT_LENGTH} characters.")
+    text = student_input.translate(_UNICODE).strip()
+    # The unicode replacements can lengthen the input, up to doubling it
+    if len(text) > MAX_INPUT_LENGTH:
+        raise AnswerCheckError(f"Your answer is longer than {MAX_INPUT_LENGTH} characters.")
+    tokenize(text)
+    return text
+
+
+def _normalize_text(text: str) -> str:
+    return text.translate(_UNICODE).strip().lower().replace(" ", "")
+
+
+def parse_expression(text: str) -> sympy.Expr:
+    """A real-valued sympy expression, or _Unparseable for anything outside the whitelist"""
+    text = _LEFT_SIDE.sub("", text.translate(_UNICODE), count=1).strip().rstrip(".")
+    try:
+        tokens = tokenize(text)
+    except AnswerCheckError as e:
+        raise _Unparseable(text) from e
+    # sympy would read "4 0" as 4*0; a space between two numbers is a missing comma
+    if not tokens or _NUMBER_SPACE_NUMBER.search(text) or any(kind not in _EXPRESSION_KINDS and (kind, token) not in _EXPRESSION_BRACKETS
+                         for kind, token in tokens):
+        raise _Unparseable(text)
+    # Words ("yes", "none") are text; one- and two-letter runs are products such as "xe^x"
+    if any(kind == NAME and (len(name) > 2 and name not in _GLOBALS or keyword.iskeyword(name))
+           for kind, name in tokens):
+        raise _Unparseable(text)
+    try:
+        expr = parse_expr(text, local_dict={}, global_dict=dict(_GLOBALS), transformations=_TRANSFORMATIONS)
+    except Exception as e:
+        raise _Unparseable(text) from e
+    if not isinstance(expr, sympy.Expr):
+        raise _Unparseable(text)
+    # One real symbol per letter, whichever transformation made it, and "e" is Euler's number
+    expr = expr.xreplace({
+        symbol: sympy.E if symbol.name == "e" else sympy.Symbol(symbol.name, real=True)
+        for symbol in expr.free_symbols
+    })
+    # Decimals as exact fractions, so "2.5" and "5/2" are the same answer
+    return sympy.nsimplify(expr, rational=True) if expr.has(sympy.Float) else expr
+
+
+def _split_top_level(text: str) -> List[str]:
+    """Comma-separated parts, ignoring commas inside parentheses"""
+    parts, depth, start = [], 0, 0
+    for position, char in enumerate(text):
+        if char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        elif char == "," and depth == 0:
+            parts.append(text[start:position])
+            start = position + 1
+    parts.append(text[start:])
+    return parts
+
+
+def parse_solution_set(text: str) -> Tuple[sympy.Expr, ...]:
+    """The distinct values of "-4, 0, 4", "x = -4, x = 0, x = 4", "{0, ±4}" and the like"""
+    text = text.translate(_UNICODE).strip().strip("{}[]").replace("+/-", "±").replace("+-", "±")
+    values = []
+    for part in _split_top_level(text):
+        part = _LEFT_SIDE.sub("", part, count=1).strip()
+        if _SPACED_NUMBERS.fullmatch(part):
+            values.extend(parse_expression(value) for value in part.split())
+        elif part.startswith("±"):
+            value = parse_expression(part[1:])
+            values.extend((-value, value))
+        elif part:
+            values.append(parse_expression(part))
+    if not values:
+        raise _Unparseable(text)
+    return _distinct(values)
+
+
+def _label(text: str) -> str:
+    text = text.lower()
+    if "min" in text:
+        return "local minimum"
+    if "max" in text:
+        return "local maximum"
+    return "neither"
+
+
+def parse_classification(text: str) -> Tuple[Tuple[sympy.Expr, str], ...]:
+    """(point, label) pairs of every "x = p is local minimum" statement in text"""
+    pairs = tuple((parse_expression(match.group("value")), _label(match.group("label")))
+                  for match in _STATEMENT.finditer(text.translate(_UNICODE)))
+    if not pairs:
+        raise _Unparseable(text)
+    return pairs
+
+
+def _distinct(values: Sequence[sympy.Expr]) -> Tuple[sympy.Expr, ...]:
+    distinct = []
+    for value in values:
+        if not any(equivalent(value, seen) for seen in distinct):
+            distinct.append(value)
+    return tuple(distinct)
+
+
+class _NotNumeric(ValueError):
+    pass
+
+
+def _add(parts):
+    return lambda env: functools.reduce(np.add, (part(env) for part in parts))
+
+
+def _multiply(parts):
+    return lambda env: functools.reduce(np.multiply, (part(env) for part in parts))
+
+
+def _compile(expr: sympy.Expr):
+    """expr as a function of {symbol name: sample array} built from NumPy ufuncs"""
+    if expr.is_Number or expr.is_NumberSymbol:
+        if not expr.is_real:
+            raise _NotNumeric(expr)
+        value = float(expr)
+        return lambda env: value
+    if expr.is_Symbol:
+        name = expr.name
+        return lambda env: env[name]
+    if expr.is_Add:
+        return _add([_compile(arg) for arg in expr.args])
+    if expr.is_Mul:
+        return _multiply([_compile(arg) for arg in expr.args])
+    if expr.is_Pow:
+        base, exponent = _compile(expr.base), _compile(expr.exp)
+        return lambda env: np.power(base(env), exponent(env))
+    function = _NUMPY_FUNCTIONS.get(type(expr))
+    if function is None or len(expr.args) != 1:
+        raise _NotNumeric(expr)
+    argument = _compile(expr.args[0])
+    return lambda env: function(argument(env))
+
+
+@functools.lru_cache(maxsize=STUDENT_INPUT_CACHE_SIZE)
+def compile_numeric(expr: sympy.Expr):
+    """The cached NumPy callable of expr, or None if it uses something without a NumPy counterpart"""
+    try:
+        return _compile(expr)
+    except _NotNumeric:
+        return None
+
+
+@functools.lru_cache(maxsize=8)
+def _sample_points(names: Tuple[str, ...]) -> dict:
+    # The same points for every check, half of them positive so log() and sqrt() have a domain
+    rng = np.random.default_rng(len(names))
+    points = np.concatenate((rng.uniform(-4, 4, (len(names), NUMERIC_SAMPLES // 2)),
+                             rng.uniform(0.05, 4, (len(names), NUMERIC_SAMPLES - NUMERIC_SAMPLES // 2))), axis=1)
+    return dict(zip(names, points))
+
+
+def numerically_different(a: sympy.Expr, b: sympy.Expr) -> bool:
+    """Whether a and b differ at random sample points; False means only that sampling could not tell"""
+    compiled_a, compiled_b = compile_numeric(a), compile_numeric(b)
+    if compiled_a is None or compiled_b is None:
+        return False
+    env = _sample_points(tuple(sorted(symbol.name for symbol in a.free_symbols | b.free_symbols)))
+    with np.errstate(all="ignore"):
+        try:
+            values_a = np.broadcast_to(np.asarray(compiled_a(env), dtype=float), (NUMERIC_SAMPLES,))
+            values_b = np.broadcast_to(np.asarray(compiled_b(env), dtype=float), (NUMERIC_SAMPLES,))
+        except (TypeError, ValueError, ZeroDivisionError, OverflowError):
+            return False
+        valid = np.isfinite(values_a)
+        # Different domains (log(x^2) vs 2log(x)) are for the symbolic check to judge
+        if not np.array_equal(valid, np.isfinite(values_b)) or valid.sum() < NUMERIC_MIN_SAMPLES:
+            return False
+        values_a, values_b = values_a[valid], values_b[valid]
+        error = np.max(np.abs(values_a - values_b) / np.maximum(np.maximum(np.abs(values_a), np.abs(values_b)), 1.0))
+    return bool(error > NUMERIC_MISMATCH)
+
+
+def equivalent(a: sympy.Expr, b: sympy.Expr, numeric: bool = True) -> bool:
+    """Whether a - b is identically zero; sampling can only reject, a match is always proved symbolically"""
+    if a == b:
+        return True
+    if numeric and numerically_different(a, b):
+        return False
+    difference = a - b
+    if difference == 0:
+        return True
+    try:
+        # Polynomials and ratios of them are decided exactly by cancelling; only the rest needs simplify()
+        if difference.is_rational_function():
+            return sympy.cancel(difference) == 0
+        return sympy.expand(difference) == 0 or sympy.simplify(difference) == 0
+    except Exception:
+        return False
+
+
+def _same_set(a: Sequence[sympy.Expr], b: Sequence[sympy.Expr], numeric: bool) -> bool:
+    return len(a) == len(b) and all(any(equivalent(x, y, numeric) for y in b) for x in a)
+
+
+def _same_classification(a, b, numeric: bool) -> bool:
+    return len(a) == len(b) and all(
+        any(label == other_label and equivalent(point, other_point, numeric) for other_point, other_label in b)
+        for point, label in a
+    )
+
+
+@functools.lru_cache(maxsize=ANSWER_KEY_CACHE_SIZE)
+def answer_key(valid_answers: Tuple[str, ...]) -> Tuple[Tuple[str, object], ...]:
+    """The accepted answers of a step as (kind, parsed value) alternatives"""
+    statements, alternatives = [], []
+    for answer in valid_answers:
+        try:
+            statements.extend(parse_classification(answer))
+            continue
+        except _Unparseable:
+            pass
+        try:
+            if len(_split_top_level(answer)) > 1:
+                alternative = (SOLUTION_SET, parse_solution_set(answer))
+            else:
+                alternative = (EXPRESSION, parse_expression(answer))
+        except _Unparseable:
+            alternative = (TEXT, _normalize_text(answer))
+        # Spacing variants ("-4, 0, 4" / "-4,0,4") parse to the same alternative
+        if alternative not in alternatives:
+            alternatives.append(alternative)
+    if statements:
+        # The statements of one step are the parts of one answer, e.g. one per critical point
+        alternatives.append((CLASSIFICATION, tuple(statements)))
+    return tuple(alternatives)
+
+
+@functools.lru_cache(maxsize=STUDENT_INPUT_CACHE_SIZE)
+def parse_student_input(text: str, kind: str):
+    """The student's input read as one kind of answer, or None if it is not one"""
+    try:
+        if kind == CLASSIFICATION:
+            return parse_classification(text)
+        if kind == SOLUTION_SET:
+            return parse_solution_set(text)
+        if kind == EXPRESSION:
+            if len(_split_top_level(text)) > 1:
+                return None
+            return parse_expression(text)
+    except _Unparseable:
+        return None
+    return _normalize_text(text)
+
+
+def check_answer(student_input: str, valid_answers: Sequence[str], numeric: bool = NUMERIC_CHECK) -> bool:
+    """Whether the input is equivalent to any accepted answer of the step (numeric=False: always prove it)
+
+    Raises AnswerCheckError for input past the front end limits.
+    """
+    text = bounded_input(student_input)
+    for kind, expected in answer_key(tuple(valid_answers)):
+        given = parse_student_input(text, kind)
+        if given is None:
+            continue
+        if kind == EXPRESSION and equivalent(given, expected, numeric):
+            return True
+        if kind == SOLUTION_SET and _same_set(given, expected, numeric):
+            return True
+        if kind == CLASSIFICATION and _same_classification(given, expected, numeric):
+            return True
+        if kind == TEXT and given == expected:
+            return True
+    return False
+
+
+def _canonical(expr: sympy.Expr) -> str:
+    try:
+        # cancel() is canonical for polynomials and their ratios: expanded numerator over expanded denominator
+        if expr.is_rational_function():
+            expr = sympy.cancel(expr)
+    except Exception:
+        pass
+    return str(expr).replace("**", "^")
+
+
+def _fingerprint(text: str, valid_answers: Sequence[str]) -> Optional[str]:
+    for kind, _ in answer_key(tuple(valid_answers)):
+        given = parse_student_input(text, kind)
+        if given is None:
+            continue
+        if kind == EXPRESSION:
+            return f"{kind}:{_canonical(given)}"
+        if kind == SOLUTION_SET:
+            return f"{kind}:" + ", ".join(sorted(_canonical(value) for value in given))
+        if kind == CLASSIFICATION:
+            return f"{kind}:" + "; ".join(sorted(f"{_canonical(point)} {label}" for point, label in given))
+        return f"{kind}:{given}"
+    return None
+
+
+def fingerprint(text: str, valid_answers: Sequence[str]) -> str:
+    """A canonical form of the input, read as the first kind of answer the step accepts that it parses as"""
+    try:
+        canonical = _fingerprint(text, valid_answers)
+    except ValueError:
+        # An integer too long for str(), e.g. from "9^9^7"
+        canonical = None
+    # Canonical forms can be far longer than the input; those are kept as typed
+    if canonical is None or len(canonical) > MAX_INPUT_LENGTH:
+        return f"{TEXT}:{_normalize_text(text)}"
+    return canonical
+
+
+def grade_answer(student_input: str, valid_answers: Sequence[str],
+                 numeric: bool = NUMERIC_CHECK) -> Tuple[bool, Optional[str]]:
+    """(correct, fingerprint of the input if it is wrong), or AnswerCheckError as check_answer"""
+    if check_answer(student_input, valid_answers, numeric):
+        return True, None
+    return False, fingerprint(bounded_input(student_input), valid_answers)
+
+
+def warm_answer_keys(steps: Optional[Sequence[dict]]) -> None:
+    """Parse and cache the answer keys of a question's steps ahead of the first submission"""
+    for step in steps or ():
+        if step.get("valid_answers"):
+            answer_key(tuple(step["valid_answers"]))
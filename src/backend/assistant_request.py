@@ -0,0 +1,65 @@
+# backend/assistant_request.py
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+from backend.conversation_memory import count_tokens, truncate_to_tokens
+from backend.prompt_templates import render_template
+
+# Student input beyond this adds little to similarity but costs embedding tokens
+RETRIEVAL_INPUT_MAX_TOKENS = 64
+# Help modes whose first message is a fixed prompt about the question, so it can be precomputed
+OPENING_HELP_MODES = ("Conceptual Help", "Application Help")
+OPENING_TEMPLATES = ("opening_conceptual", "opening_application")
+
+
+@dataclass(frozen=True)
+class AssistantRequest:
+    """One call to the assistant, split into fields instead of a pre-baked prompt string
+
+    Only question, step and student_input feed the retrieval query; help mode,
+    history and the template instructions go into the generation prompt only.
+    hints never reach the model.
+    """
+    question: str
+    help_mode: str
+    student_input: str = ""
+    step: Optional[str] = None  # instruction of the current step in step-by-step mode
+    history: str = ""           # bounded conversation context (see ConversationMemory)
+    template: Optional[str] = None
+    template_version: Optional[str] = None
+    hints: Tuple[str, ...] = ()  # hints from the question JSON, served when the model is shed or down
+
+    def template_name(self):
+        if self.template:
+            return self.template
+        if self.step:
+            return "step_question"
+        if self.student_input or self.history:
+            return "chat"
+        if self.help_mode == "Conceptual Help":
+            return "opening_conceptual"
+        return "opening_application"
+
+    def retrieval_query(self):
+        """Compact text to embed and keyword-match: what the student is working on and asking"""
+        parts = [self.question]
+        if self.step:
+            parts.append(self.step)
+        if self.student_input:
+            parts.append(truncate_to_tokens(self.student_input, RETRIEVAL_INPUT_MAX_TOKENS))
+        return "\n".join(parts)
+
+    def prompt(self):
+        """Full generation prompt assembled from the versioned template"""
+        return render_template(
+            self.template_name(),
+            self.template_version,
+            question=self.question,
+            help_mode=self.help_mode,
+            student_input=self.student_input,
+            step=self.step or "",
+            history=self.history,
+        )
+
+    def retrieval_tokens(self):
+        return count_tokens(self.retrieval_query())
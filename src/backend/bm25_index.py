@@ -0,0 +1,124 @@
+# backend/bm25_index.py
+import heapq
+import json
+import math
+import os
+import re
+from collections import Counter, defaultdict
+
+# Math-aware tokens: "32x^2", "x^4", "f'(x)"-style words, plain numbers and words
+TOKEN_PATTERN = re.compile(r"\d+(?:\.\d+)?[a-z](?:\^\d+)?|[a-z]\^\d+|[a-z]+'*|\d+(?:\.\d+)?")
+STOPWORDS = frozenset(
+    "a an and are as at be by do does for from how i if in is it its me my of on or so "
+    "that the this to what when which with you your".split()
+)
+
+
+def tokenize(text):
+    """Lowercase, split into math-aware tokens, drop stopwords and plural 's'"""
+    tokens = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        if token in STOPWORDS:
+            continue
+        if len(token) > 3 and token.endswith("s") and token.isalpha():
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+class BM25Index:
+    """Inverted BM25 index over the same chunks that live in the FAISS docstore"""
+
+    def __init__(self, doc_ids, doc_lengths, postings, index_version=None, k1=1.5, b=0.75):
+        self.doc_ids = doc_ids
+        self.doc_lengths = doc_lengths
+        self.postings = postings  # token -> [(doc position, term frequency), ...]
+        self.index_version = index_version
+        self.k1 = k1
+        self.b = b
+        self.avg_length = (sum(doc_lengths) / len(doc_lengths)) if doc_lengths else 0.0
+        n_docs = len(doc_ids)
+        self.idf = {
+            token: math.log(1 + (n_docs - len(posting) + 0.5) / (len(posting) + 0.5))
+            for token, posting in postings.items()
+        }
+
+    @classmethod
+    def from_texts(cls, doc_ids, texts, index_version=None):
+        postings = defaultdict(list)
+        doc_lengths = []
+        for position, text in enumerate(texts):
+            tokens = tokenize(text)
+            doc_lengths.append(len(tokens))
+            for token, count in Counter(tokens).items():
+                postings[token].append((position, count))
+        return cls(list(doc_ids), doc_lengths, dict(postings), index_version)
+
+    @classmethod
+    def from_vector_store(cls, vector_store, index_version=None):
+        """Index every chunk in FAISS order so positions line up with the dense index"""
+        doc_ids = [vector_store.index_to_docstore_id[i] for i in sorted(vector_store.index_to_docstore_id)]
+        texts = [vector_store.docstore.search(doc_id).page_content for doc_id in doc_ids]
+        return cls.from_texts(doc_ids, texts, index_version)
+
+    def search(self, query, k=3, allowed=None):
+        """Return up to k (doc ID, score) pairs, best first
+
+        allowed is an optional bool array over positions (ChunkMetadataIndex.mask) to search within.
+        """
+        scores = defaultdict(float)
+        for token in set(tokenize(query)):
+            posting = self.postings.get(token)
+            if not posting:
+                continue
+            idf = self.idf[token]
+            for position, tf in posting:
+                if allowed is not None and not allowed[position]:
+                    continue
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[position] / self.avg_length)
+                scores[position] += idf * tf * (self.k1 + 1) / (tf + norm)
+        best = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+        return [(self.doc_ids[position], score) for position, score in best]
+
+    def save(self, path):
+        with open(path, "w") as f:
+            json.dump({
+                "index_version": self.index_version,
+                "doc_ids": self.doc_ids,
+                "doc_lengths": self.doc_lengths,
+                "postings": self.postings,
+            }, f)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "r") as f:
+            data = json.load(f)
+        postings = {token: [tuple(entry) for entry in posting] for token, posting in data["postings"].items()}
+        return cls(data["doc_ids"], data["doc_lengths"], postings, data.get("index_version"))
+
+    @classmethod
+    def load_or_build(cls, vector_store, index_version, path=None):
+        """Load the index saved at ingest time, rebuilding it if missing or stale"""
+        if path and os.path.exists(path):
+            try:
+                index = cls.load(path)
+                if index.index_version == index_version:
+                    return index
+            except Exception as e:
+                print(f"⚠️ Could not load BM25 index, rebuilding: {e}")
+        index = cls.from_vector_store(vector_store, index_version)
+        if path and os.path.isdir(os.path.dirname(path) or "."):
+            try:
+                index.save(path)
+            except Exception as e:
+                print(f"⚠️ Could not save BM25 index: {e}")
+        return index
+
+
+def reciprocal_rank_fusion(rankings, k=3, rrf_k=60):
+    """Fuse several best-first ID lists with reciprocal-rank fusion"""
+    scores = defaultdict(float)
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking):
+            scores[doc_id] += 1.0 / (rrf_k + rank + 1)
+    return [doc_id for doc_id, _ in heapq.nlargest(k, scores.items(), key=lambda item: item[1])]
@@ -0,0 +1,127 @@
+# backend/conversation_memory.py
+import hashlib
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import tiktoken
+    _ENCODING = tiktoken.get_encoding("cl100k_base")
+except Exception:  # tiktoken missing or its encoding file unavailable offline
+    _ENCODING = None
+
+_WORD_PATTERN = re.compile(r"\w+|[^\w\s]")
+_SOURCES_PATTERN = re.compile(r"\n\n\*\*Sources:\*\*\n.*\Z", re.DOTALL)
+
+# Summaries for every session run on this small shared pool, off the Streamlit script thread
+_SUMMARY_EXECUTOR = ThreadPoolExecutor(max_workers=4, thread_name_prefix="conversation-summary")
+
+
+def count_tokens(text):
+    """Count tokens locally (cl100k_base when tiktoken is installed, else a word/punctuation estimate)"""
+    if _ENCODING is not None:
+        return len(_ENCODING.encode(text, disallowed_special=()))
+    return len(_WORD_PATTERN.findall(text))
+
+
+def format_message(message):
+    """One history line, without the sources footer the UI appends to answers"""
+    content = _SOURCES_PATTERN.sub("", message["content"]).strip()
+    return f"{message['role'].capitalize()}: {content}"
+
+
+def truncate_to_tokens(text, max_tokens):
+    if count_tokens(text) <= max_tokens:
+        return text
+    if _ENCODING is not None:
+        return _ENCODING.decode(_ENCODING.encode(text, disallowed_special=())[-max_tokens:])
+    return " ".join(text.split()[-max_tokens:])
+
+
+class ConversationMemory:
+    """Token-budgeted view of a chat history
+
+    The most recent messages are kept verbatim; older ones are folded into a
+    rolling summary that is refreshed in the background after each reply, so
+    the prompt (and retrieval query) stays bounded however long the chat runs.
+    """
+
+    def __init__(self, max_tokens=1200, recent_messages=6, summary_max_tokens=300):
+        self.max_tokens = max_tokens
+        self.recent_messages = recent_messages
+        self.summary_max_tokens = summary_max_tokens
+        self.summary = ""
+        self.summarized_count = 0  # chat_history[:summarized_count] is covered by the summary
+        self._history_key = None
+        self._refreshing = False
+        self._lock = threading.Lock()
+
+    def _sync(self, chat_history):
+        """Start over when the frontend replaces chat_history with a new conversation"""
+        key = (id(chat_history), hashlib.sha1(chat_history[0]["content"].encode("utf-8")).hexdigest() if chat_history else None)
+        if key != self._history_key or len(chat_history) < self.summarized_count:
+            with self._lock:
+                self.summary = ""
+                self.summarized_count = 0
+                self._history_key = key
+
+    def build_context(self, chat_history):
+        """Conversation context that fits in max_tokens: summary first, newest messages last"""
+        self._sync(chat_history)
+        with self._lock:
+            summary = self.summary
+            start = self.summarized_count
+
+        parts = []
+        budget = self.max_tokens
+        if summary:
+            summary_line = f"Summary of earlier conversation: {summary}"
+            budget -= count_tokens(summary_line)
+
+        lines = []
+        for message in reversed(chat_history[start:]):
+            line = format_message(message)
+            cost = count_tokens(line)
+            if cost > budget:
+                if not lines:
+                    lines.append(truncate_to_tokens(line, max(budget, 1)))
+                break
+            lines.append(line)
+            budget -= cost
+
+        if summary:
+            parts.append(summary_line)
+        parts.extend(reversed(lines))
+        return "\n".join(parts)
+
+    def refresh_in_background(self, chat_history, summarize_fn):
+        """Fold messages older than the verbatim window into the summary, without blocking
+
+        summarize_fn(previous_summary, lines, max_tokens) -> new summary text
+        """
+        self._sync(chat_history)
+        with self._lock:
+            end = len(chat_history) - self.recent_messages
+            if self._refreshing or end <= self.summarized_count:
+                return None
+            self._refreshing = True
+            start = self.summarized_count
+            previous_summary = self.summary
+            history_key = self._history_key
+        lines = [format_message(message) for message in chat_history[start:end]]
+        return _SUMMARY_EXECUTOR.submit(self._refresh, previous_summary, lines, end, history_key, summarize_fn)
+
+    def _refresh(self, previous_summary, lines, end, history_key, summarize_fn):
+        try:
+            summary = summarize_fn(previous_summary, lines, self.summary_max_tokens)
+            summary = truncate_to_tokens(summary.strip(), self.summary_max_tokens)
+        except Exception as e:
+            print(f"⚠️ Failed to refresh conversation summary: {e}")
+            summary = None
+        with self._lock:
+            self._refreshing = False
+            # Drop the result if the conversation was reset while we were summarizing
+            if summary is not None and history_key == self._history_key:
+                self.summary = summary
+                self.summarized_count = end
+        return summary
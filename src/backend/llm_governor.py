@@ -0,0 +1,245 @@
+# backend/llm_governor.py
+import asyncio
+import heapq
+import itertools
+import json
+import math
+import os
+import tempfile
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from enum import IntEnum
+
+from backend.resilience import LatencyTracker
+
+try:
+    import fcntl
+except ImportError:  # Windows: the buckets are only shared within one process
+    fcntl = None
+
+
+class Priority(IntEnum):
+    """Lower value is served first"""
+    INTERACTIVE = 0  # short step-mode questions
+    CHAT = 1         # chat turns and opening messages (both can be shed to a precomputed or degraded answer)
+    BACKGROUND = 2   # summaries, pool refills, validation
+    BULK = 3         # precomputation and batch jobs
+
+
+class GovernorQueueFull(Exception):
+    """Raised instead of queueing when the LLM backlog is already at its limit"""
+
+    def __init__(self, estimated_wait):
+        super().__init__(f"LLM queue is full (estimated wait {estimated_wait:.0f}s)")
+        self.estimated_wait = estimated_wait
+
+
+class GovernorTimeout(Exception):
+    """Raised when a queued call does not get a slot before its timeout"""
+
+
+class FileTokenBucket:
+    """Request and token buckets whose state lives in a locked file shared by all workers"""
+
+    def __init__(self, path, requests_per_minute, tokens_per_minute):
+        self.path = path
+        self.request_rate = requests_per_minute / 60.0
+        self.token_rate = tokens_per_minute / 60.0
+        self.request_capacity = max(1.0, float(requests_per_minute))
+        self.token_capacity = max(1.0, float(tokens_per_minute))
+        self._local_lock = threading.Lock()
+
+    def _refilled(self, raw):
+        try:
+            state = json.loads(raw) if raw else {}
+        except ValueError:
+            state = {}
+        now = time.time()
+        elapsed = max(0.0, now - state.get("updated", now))
+        state["requests"] = min(self.request_capacity, state.get("requests", self.request_capacity) + elapsed * self.request_rate)
+        state["tokens"] = min(self.token_capacity, state.get("tokens", self.token_capacity) + elapsed * self.token_rate)
+        state["updated"] = now
+        return state
+
+    @contextmanager
+    def _locked_state(self):
+        with self._local_lock:
+            with open(self.path, "a+") as f:
+                if fcntl:
+                    fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    f.seek(0)
+                    state = self._refilled(f.read())
+                    yield state
+                    f.seek(0)
+                    f.truncate()
+                    f.write(json.dumps(state))
+                    f.flush()
+                finally:
+                    if fcntl:
+                        fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _wait_for(self, state, tokens):
+        tokens = min(tokens, self.token_capacity)
+        request_wait = max(0.0, (1 - state["requests"]) / self.request_rate)
+        token_wait = max(0.0, (tokens - state["tokens"]) / self.token_rate)
+        return max(request_wait, token_wait)
+
+    def try_acquire(self, tokens):
+        """Take one request and `tokens` tokens; returns 0 on success, else seconds until possible"""
+        with self._locked_state() as state:
+            wait = self._wait_for(state, tokens)
+            if wait == 0:
+                state["requests"] -= 1
+                state["tokens"] -= min(tokens, self.token_capacity)
+            return wait
+
+    def peek_wait(self, tokens):
+        """Seconds until try_acquire(tokens) could succeed; reads the state file without locking or writing it"""
+        try:
+            with open(self.path, "r") as f:
+                raw = f.read()
+        except OSError:
+            raw = ""
+        return self._wait_for(self._refilled(raw), tokens)
+
+
+class LLMGovernor:
+    """Process-wide admission control for model calls
+
+    Calls queue by priority (FIFO within a class) for one of max_in_flight
+    slots and for room in the shared request/token buckets. When max_queue
+    callers are already waiting, new ones are rejected with GovernorQueueFull
+    so the UI can say so instead of hanging.
+    """
+
+    def __init__(self, bucket, max_in_flight=16, max_queue=200):
+        self.bucket = bucket
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self._cond = threading.Condition()
+        self._queue = []  # heap of [priority, sequence]
+        self._sequence = itertools.count()
+        self._in_flight = 0
+        self._checking_bucket = False  # one caller at a time reads the buckets, outside _cond
+        self.service_time = 2.0  # moving average of seconds per call
+        self.rejected = 0
+        # Time from acquire() to getting a slot, for the load-shedding policy
+        self.wait_latency = LatencyTracker(window=500, min_samples=10, max_age=120)
+
+    @property
+    def queue_depth(self):
+        return len(self._queue)
+
+    @property
+    def in_flight(self):
+        return self._in_flight
+
+    def estimate_wait(self, priority=Priority.CHAT, tokens=0):
+        """Rough seconds a new call of this priority would wait before starting"""
+        with self._cond:
+            ahead = sum(1 for entry in self._queue if entry[0] <= priority)
+            busy = self._in_flight >= self.max_in_flight
+        wait = 0.0
+        if ahead or busy:
+            wait = math.ceil((ahead + 1) / self.max_in_flight) * self.service_time
+        return wait + self.bucket.peek_wait(tokens)
+
+    def acquire(self, priority=Priority.CHAT, tokens=0, timeout=None):
+        queued = time.monotonic()
+        deadline = None if timeout is None else queued + timeout
+        with self._cond:
+            if len(self._queue) >= self.max_queue:
+                self.rejected += 1
+                ahead = sum(1 for entry in self._queue if entry[0] <= priority)
+                raise GovernorQueueFull(math.ceil((ahead + 1) / self.max_in_flight) * self.service_time)
+            entry = [int(priority), next(self._sequence)]
+            heapq.heappush(self._queue, entry)
+            try:
+                while True:
+                    wait = 0.5
+                    if self._queue[0] is entry and self._in_flight < self.max_in_flight and not self._checking_bucket:
+                        # The buckets are file I/O shared with other workers; don't hold up release() and
+                        # other callers meanwhile. Nobody else can take a slot until the flag is cleared.
+                        self._checking_bucket = True
+                        self._cond.release()
+                        try:
+                            bucket_wait = self.bucket.try_acquire(tokens)
+                        finally:
+                            self._cond.acquire()
+                            self._checking_bucket = False
+                            self._cond.notify_all()
+                        if bucket_wait == 0:
+                            # A higher-priority caller may have queued ahead meanwhile; the tokens are ours
+                            self._queue.remove(entry)
+                            heapq.heapify(self._queue)
+                            self._in_flight += 1
+                            self._cond.notify_all()
+                            started = time.monotonic()
+                            self.wait_latency.record(started - queued)
+                            return started
+                        wait = min(wait, bucket_wait)
+                    if deadline is not None:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            raise GovernorTimeout(f"No LLM slot within {timeout:.1f}s")
+                        wait = min(wait, remaining)
+                    self._cond.wait(wait)
+            except BaseException:
+                if entry in self._queue:
+                    self._queue.remove(entry)
+                    heapq.heapify(self._queue)
+                    self._cond.notify_all()
+                raise
+
+    def release(self, started):
+        with self._cond:
+            self._in_flight -= 1
+            self.service_time = 0.8 * self.service_time + 0.2 * (time.monotonic() - started)
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, priority=Priority.CHAT, tokens=0, timeout=None):
+        started = self.acquire(priority, tokens, timeout)
+        try:
+            yield
+        finally:
+            self.release(started)
+
+    @asynccontextmanager
+    async def aslot(self, priority=Priority.BULK, tokens=0, timeout=None):
+        # Waiting happens on a worker thread so the event loop keeps running other tasks
+        future = asyncio.get_running_loop().run_in_executor(None, self.acquire, priority, tokens, timeout)
+        try:
+            started = await asyncio.shield(future)
+        except asyncio.CancelledError:
+            # The thread may still win a slot after we gave up; hand it straight back
+            future.add_done_callback(lambda f: f.cancelled() or f.exception() or self.release(f.result()))
+            raise
+        try:
+            yield
+        finally:
+            self.release(started)
+
+    def stats(self):
+        return {
+            "queue_depth": self.queue_depth,
+            "in_flight": self._in_flight,
+            "service_time": self.service_time,
+            "wait_p95": self.wait_latency.percentile(95),
+            "rejected": self.rejected,
+        }
+
+
+# Shared by every session in this process; the buckets are shared with other
+# worker processes through the state file
+GOVERNOR = LLMGovernor(
+    FileTokenBucket(
+        os.getenv("LLM_GOVERNOR_STATE", os.path.join(tempfile.gettempdir(), "math127_llm_governor.json")),
+        requests_per_minute=int(os.getenv("LLM_REQUESTS_PER_MINUTE", "500")),
+        tokens_per_minute=int(os.getenv("LLM_TOKENS_PER_MINUTE", "160000")),
+    ),
+    max_in_flight=int(os.getenv("LLM_MAX_IN_FLIGHT", "16")),
+    max_queue=int(os.getenv("LLM_MAX_QUEUE", "200")),
+)
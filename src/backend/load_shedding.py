@@ -0,0 +1,88 @@
+# backend/load_shedding.py
+import os
+import threading
+import time
+
+from backend.llm_governor import GOVERNOR, Priority
+from backend.resilience import CHAT_LATENCY
+
+
+class DegradationPolicy:
+    """Decides when low-priority model calls should be answered without the model
+
+    Shedding starts when the governor queue reaches queue_high, or the p95
+    wait for a slot exceeds wait_high seconds, or the p95 model latency
+    exceeds latency_high seconds. It stops once all three are back under
+    their *_low thresholds and at least min_shed_seconds have passed, so the
+    policy does not flap. Latency samples expire, so service resumes on its
+    own once the backlog drains. Only calls at shed_priority or lower
+    (numerically >=) are shed; interactive step questions always queue.
+    """
+
+    def __init__(self, governor, latency=CHAT_LATENCY, queue_high=40, queue_low=8, wait_high=8.0, wait_low=2.0,
+                 latency_high=15.0, latency_low=6.0, shed_priority=Priority.CHAT, min_shed_seconds=10.0):
+        self.governor = governor
+        self.latency = latency
+        self.queue_high = queue_high
+        self.queue_low = queue_low
+        self.wait_high = wait_high
+        self.wait_low = wait_low
+        self.latency_high = latency_high
+        self.latency_low = latency_low
+        self.shed_priority = shed_priority
+        self.min_shed_seconds = min_shed_seconds
+        self.shedding_since = None
+        self.shed_count = 0
+        self._lock = threading.Lock()
+
+    def signals(self):
+        return {
+            "queue_depth": self.governor.queue_depth,
+            "wait_p95": self.governor.wait_latency.percentile(95, default=0.0),
+            "latency_p95": self.latency.percentile(95, default=0.0),
+        }
+
+    def update(self):
+        """Re-evaluate the signals; returns True while shedding"""
+        signals = self.signals()
+        overloaded = (
+            signals["queue_depth"] >= self.queue_high
+            or signals["wait_p95"] >= self.wait_high
+            or signals["latency_p95"] >= self.latency_high
+        )
+        recovered = (
+            signals["queue_depth"] <= self.queue_low
+            and signals["wait_p95"] <= self.wait_low
+            and signals["latency_p95"] <= self.latency_low
+        )
+        now = time.monotonic()
+        with self._lock:
+            if self.shedding_since is None and overloaded:
+                self.shedding_since = now
+                print(f"⚠️ LLM backend saturated, shedding low-priority requests: {signals}")
+            elif self.shedding_since is not None and recovered and now - self.shedding_since >= self.min_shed_seconds:
+                self.shedding_since = None
+                print("✅ LLM backend recovered, resuming normal service")
+            return self.shedding_since is not None
+
+    def should_shed(self, priority):
+        return priority >= self.shed_priority and self.update()
+
+    def record_shed(self):
+        with self._lock:
+            self.shed_count += 1
+
+    def stats(self):
+        return {**self.signals(), "shedding": self.shedding_since is not None, "shed_count": self.shed_count}
+
+
+# Shared by every session in this process, watching the process-wide governor
+LOAD_SHEDDING = DegradationPolicy(
+    GOVERNOR,
+    queue_high=int(os.getenv("SHED_QUEUE_HIGH", "40")),
+    queue_low=int(os.getenv("SHED_QUEUE_LOW", "8")),
+    wait_high=float(os.getenv("SHED_WAIT_P95_HIGH", "8")),
+    wait_low=float(os.getenv("SHED_WAIT_P95_LOW", "2")),
+    latency_high=float(os.getenv("SHED_LATENCY_P95_HIGH", "15")),
+    latency_low=float(os.getenv("SHED_LATENCY_P95_LOW", "6")),
+)
@@ -1,24 +1,78 @@
 # backend/math_assistant.py
+import asyncio
 import math
 import os
+import time
 import streamlit as st
 from dotenv import load_dotenv
 import boto3
 from langchain_openai import OpenAIEmbeddings
 from langchain_community.vectorstores import FAISS
 from langchain_openai import ChatOpenAI
-from langchain.chains import RetrievalQA
+from langchain_core.messages import HumanMessage, SystemMessage
 
 # Import text extraction functions
 from backend.extract_text import download_pdfs, process_pdfs
+from backend.assistant_request import OPENING_TEMPLATES, AssistantRequest
+from backend.conversation_memory import count_tokens
+from backend.llm_governor import GOVERNOR, GovernorQueueFull, GovernorTimeout, Priority
+from backend.load_shedding import LOAD_SHEDDING
+from backend.precomputed_answers import PRECOMPUTED_ANSWERS
+from backend.resilience import (
+    ANSWER_CACHE,
+    ANSWER_DEADLINE_SECONDS,
+    CANNED_GUIDANCE,
+    CHAT_LATENCY,
+    MODEL_BREAKER,
+    Deadline,
+    DeadlineExceeded,
+    hedged_call,
+)
+from backend.retrieval import ChunkRetriever, save_bm25_index
+from backend.retrieval_cache import query_hash
+from backend.single_flight import SINGLE_FLIGHT
 
 # Load environment variables
 load_dotenv()
 
+# Same "stuff" prompt RetrievalQA uses for chat models
+QA_SYSTEM_PROMPT = """Use the following pieces of context to answer the user's question. 
+If you don't know the answer, just say that you don't know, don't try to make up an answer.
+----------------
+{context}"""
+
+# Completion budget reserved against the shared tokens-per-minute limit
+COMPLETION_TOKENS_ESTIMATE = 512
+
+# Shown instead of a model reply that mentions an answer or solution
+NO_DIRECT_ANSWER = "I can help guide you through this, but I won't provide the direct answer. Let me explain the concepts and steps instead."
+# Feedback on a wrong answer is about the student's answer, so it names one; the prompt forbids giving the correct one
+UNFILTERED_TEMPLATES = frozenset({"wrong_answer"})
+
+# How answers served without the model are labelled for the student
+FALLBACK_REASONS = {
+    "unavailable": "⚠️ *The AI tutor is temporarily unavailable",
+    "overloaded": "⏳ *The AI tutor is very busy right now",
+}
+FALLBACK_KINDS = {
+    "cached": "this is a saved answer to the same question.*",
+    "precomputed": "this is a prepared answer for this question.*",
+    "hint": "here are hints for this problem instead.*",
+    "keyword": "so here is some general guidance instead.*",
+}
+
 class MathAssistant:
-    def __init__(self):
-        self.embeddings = self.initialize_openai()
-        self.vector_store = self.load_or_create_vector_store()
+    def __init__(self, embeddings=None, vector_store=None):
+        """Batch tools may inject a prebuilt embeddings client and vector store"""
+        self._llms = {}
+        # Share one upstream call between concurrent identical requests across sessions
+        self.coalesce_requests = True
+        # Duplicate slow model calls after the recent p95 latency (see hedge_delay)
+        self.hedge_requests = True
+        self.embeddings = embeddings if embeddings is not None else self.initialize_openai()
+        index_dir = None if vector_store is not None else "pdf_vectorstore.faiss"
+        self.vector_store = vector_store if vector_store is not None else self.load_or_create_vector_store()
+        self.retriever = ChunkRetriever(self.vector_store, self.embeddings, index_dir) if self.vector_store else None
     
     def initialize_openai(self):
         """Initialize OpenAI embeddings"""
@@ -111,154 +165,517 @@ class MathAssistant:
         if vector_store:
             try:
                 vector_store.save_local(filename)
+                # Keyword index over the same chunks for hybrid / keyword-only retrieval
+                save_bm25_index(vector_store, filename)
                 return True
             except Exception as e:
                 st.error(f"❌ Failed to save vector store: {str(e)}")
                 return False
         return False
 
-    def get_answer(self, query, help_mode):
-        """Enhanced query method with context-aware prompting"""
-        OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+    def get_llm(self, temperature, max_retries=None):
+        """Chat model client, reused across calls so async requests share one connection pool
+
+        Deadline-bound callers pass max_retries=0 and rely on hedging instead of
+        client retries, which would otherwise run past the deadline.
+        """
+        key = (temperature, max_retries)
+        if key not in self._llms:
+            options = {} if max_retries is None else {"max_retries": max_retries}
+            self._llms[key] = ChatOpenAI(
+                openai_api_key=os.getenv("OPENAI_API_KEY"),
+                model_name="gpt-3.5-turbo",
+                temperature=temperature,
+                **options
+            )
+        return self._llms[key]
+
+    def split_query(self, query):
+        """(retrieval query, generation prompt) for an AssistantRequest or a legacy prompt string"""
+        if isinstance(query, AssistantRequest):
+            return query.retrieval_query(), query.prompt()
+        # A plain string already contains all necessary instructions and context
+        return query, query
+
+    def default_priority(self, query):
+        """Step-mode questions are short and the student is waiting on them; chat turns come next"""
+        if isinstance(query, AssistantRequest) and query.step:
+            return Priority.INTERACTIVE
+        return Priority.CHAT
+
+    def estimate_tokens(self, messages):
+        """Prompt plus reserved completion tokens, charged against the governor's token bucket"""
+        if isinstance(messages, str):
+            return count_tokens(messages) + COMPLETION_TOKENS_ESTIMATE
+        return sum(count_tokens(message.content) for message in messages) + COMPLETION_TOKENS_ESTIMATE
+
+    def build_answer_messages(self, prompt, docs):
+        """Stuff all retrieved docs into a single prompt"""
+        context = "\n\n".join(doc.page_content for doc in docs)
+        return [
+            SystemMessage(content=QA_SYSTEM_PROMPT.format(context=context)),
+            HumanMessage(content=prompt)
+        ]
+
+    def format_answer(self, answer, docs, query=None):
+        """Attach sources and make sure no direct solutions are given
+
+        A replaced reply is marked "filtered", so batch jobs can tell it from a real answer.
+        """
+        sources = [doc.metadata.get("source", "Unknown") for doc in docs]
+        unique_sources = list(set(sources))
+        result = {"sources": unique_sources}
         
+        # Post-process the answer to ensure no direct solutions are given
+        template = query.template_name() if isinstance(query, AssistantRequest) else None
+        if template not in UNFILTERED_TEMPLATES and ("answer" in answer.lower() or "solution" in answer.lower()):
+            answer = NO_DIRECT_ANSWER
+            result["filtered"] = True
+        
+        return {"answer": answer, **result}
+
+    def cache_answer(self, key, result):
+        """Keep a model answer as the degraded-mode fallback; canned replies are not worth keeping"""
+        if not result.get("degraded") and not result.get("filtered"):
+            ANSWER_CACHE.put(key, result)
+
+    def request_key(self, retrieval_query, prompt, chapter=None, section=None):
+        """Normalized identity of an answer request, used to coalesce identical in-flight calls"""
+        return query_hash(f"{retrieval_query}\x00{prompt}\x00{chapter}\x00{section}")
+
+    def hedge_delay(self):
+        """Fire a duplicate call once the first is slower than the recent p95
+
+        No hedging until enough latencies have been seen, or while calls are
+        already queueing in the governor, where a duplicate would only add load.
+        """
+        if not self.hedge_requests or GOVERNOR.queue_depth:
+            return None
+        return CHAT_LATENCY.percentile(95)
+
+    def generate_with_deadline(self, messages, priority, deadline):
+        """One hedged chat call that gives up at the deadline; feeds the breaker and latency window
+
+        Only upstream errors and timeouts count against the breaker. Running out
+        of time while still queued in the governor does not.
+        """
+        tokens = self.estimate_tokens(messages)
+        upstream_calls = []
+
+        def attempt(timeout):
+            with GOVERNOR.slot(priority, tokens, timeout=timeout):
+                started = time.monotonic()
+                upstream_calls.append(started)
+                # Slightly more creative for explanations
+                response = self.get_llm(0.2, max_retries=0).invoke(messages, timeout=max(deadline.remaining(), 0.1))
+                CHAT_LATENCY.record(time.monotonic() - started)
+            return response
+
+        try:
+            response = hedged_call(attempt, deadline, self.hedge_delay())
+        except (GovernorQueueFull, GovernorTimeout):
+            # Queueing here says nothing about the upstream's health
+            raise
+        except DeadlineExceeded:
+            if upstream_calls:
+                MODEL_BREAKER.record_failure()
+            raise
+        except Exception:
+            MODEL_BREAKER.record_failure()
+            raise
+        MODEL_BREAKER.record_success()
+        return response
+
+    def prepared_opening(self, query, chapter=None, section=None):
+        """The precomputed answer (precompute_openings.py) to an opening request, else None"""
+        if not isinstance(query, AssistantRequest) or query.template_name() not in OPENING_TEMPLATES:
+            return None
+        retrieval_query, prompt = self.split_query(query)
+        stored = PRECOMPUTED_ANSWERS.get(self.request_key(retrieval_query, prompt, chapter, section))
+        if stored is None:
+            return None
+        return {"answer": stored["answer"], "sources": list(stored["sources"])}
+
+    def degraded_answer(self, query, chapter=None, section=None, reason="unavailable"):
+        """Answer without the chat model, from the best source available
+
+        In order: the last good answer to this exact request, a precomputed
+        answer, the question's hints, and (only when the model is unavailable,
+        not merely busy) keyword-retrieved course notes with canned guidance.
+        Returns None when reason is "overloaded" and nothing better than the
+        canned text exists, so the caller queues for the model instead.
+        """
+        retrieval_query, prompt = self.split_query(query)
+        key = self.request_key(retrieval_query, prompt, chapter, section)
+        stored, kind = ANSWER_CACHE.get(key), "cached"
+        if stored is None:
+            stored, kind = PRECOMPUTED_ANSWERS.get(key), "precomputed"
+        hints = query.hints if isinstance(query, AssistantRequest) else ()
+
+        if stored is not None:
+            body, sources = stored["answer"], list(stored["sources"])
+        elif hints:
+            kind = "hint"
+            body, sources = "\n".join(f"- 💡 {hint}" for hint in hints), []
+        elif reason == "overloaded":
+            return None
+        else:
+            kind = "keyword"
+            # Local BM25 only: no embedding call while the endpoint is unhealthy
+            docs = self.retriever.search(retrieval_query, k=2, mode="keyword", chapter=chapter, section=section)
+            template = query.template_name() if isinstance(query, AssistantRequest) else "chat"
+            body = CANNED_GUIDANCE[template]
+            for doc in docs:
+                body += "\n\n> " + " ".join(doc.page_content.split())[:400]
+            sources = list({doc.metadata.get("source", "Unknown") for doc in docs})
+
+        separator = "; " if kind != "keyword" else ", "
+        return {
+            "answer": f"{FALLBACK_REASONS[reason]}{separator}{FALLBACK_KINDS[kind]}\n\n{body}",
+            "sources": sources,
+            "degraded": kind,
+        }
+
+    def shed_answer(self, query, priority, chapter=None, section=None):
+        """Fallback answer for a low-priority request while the backend is saturated, else None"""
+        if not LOAD_SHEDDING.should_shed(priority):
+            return None
+        result = self.degraded_answer(query, chapter, section, reason="overloaded")
+        if result is not None:
+            LOAD_SHEDDING.record_shed()
+        return result
+
+    def get_answer(self, query, help_mode, chapter=None, section=None, priority=None, deadline=None):
+        """Enhanced query method with context-aware prompting
+
+        query is an AssistantRequest (or, for older callers, one prompt string);
+        chapter/section scope retrieval to the student's current section first.
+        priority orders this call in the shared LLM queue (default: default_priority).
+        deadline bounds retrieval plus generation (default ANSWER_DEADLINE_SECONDS);
+        on timeout, or while the model circuit is open, a degraded answer is returned.
+        """
         try:
             if not self.vector_store:
                 st.warning("⚠️ No vector store found!")
                 return None
             
-            # Create a retriever from the vector store
-            retriever = self.vector_store.as_retriever(
-                search_type="similarity",
-                search_kwargs={"k": 3}  # Return top 3 most relevant chunks
-            )
+            retrieval_query, prompt = self.split_query(query)
+            if priority is None:
+                priority = self.default_priority(query)
+            if deadline is None:
+                deadline = Deadline(ANSWER_DEADLINE_SECONDS)
+            key = self.request_key(retrieval_query, prompt, chapter, section)
+            prepared = self.prepared_opening(query, chapter, section)
+            if prepared is not None:
+                return prepared
+            shed = self.shed_answer(query, priority, chapter, section)
+            if shed is not None:
+                return shed
+            if not MODEL_BREAKER.allow():
+                return self.degraded_answer(query, chapter, section)
             
-            # The query from the frontend already contains all necessary instructions and context
-            enhanced_query = query
+            def upstream():
+                # Top 3 most relevant chunks; repeat queries are served from the shared caches
+                docs = self.retriever.search(retrieval_query, k=3, chapter=chapter, section=section, deadline=deadline)
+                deadline.check("generation")
+                response = self.generate_with_deadline(self.build_answer_messages(prompt, docs), priority, deadline)
+                result = self.format_answer(response.content, docs, query)
+                self.cache_answer(key, result)
+                return result
             
-            # Use more capable model for better answers
-            llm = ChatOpenAI(
-                openai_api_key=OPENAI_API_KEY, 
-                model_name="gpt-3.5-turbo",
-                temperature=0.2  # Slightly more creative for explanations
-            )
+            spinner_text = "🤔 Generating answer..."
+            estimated_wait = GOVERNOR.estimate_wait(priority)
+            if estimated_wait >= 1:
+                spinner_text = f"🤔 Generating answer... (busy, about {estimated_wait:.0f}s wait)"
+            with st.spinner(spinner_text):
+                try:
+                    result = SINGLE_FLIGHT.do(key, upstream) if self.coalesce_requests else upstream()
+                except GovernorQueueFull:
+                    raise
+                except Exception as e:
+                    print(f"⚠️ Model call failed, answering in degraded mode: {e}")
+                    return self.degraded_answer(query, chapter, section)
             
-            # Create a QA chain
-            qa_chain = RetrievalQA.from_chain_type(
-                llm=llm,
-                chain_type="stuff",  # Simple method that passes all retrieved docs
-                retriever=retriever,
-                return_source_documents=True  # Return source documents for citations
-            )
+            # Coalesced callers share one result; give each its own copy
+            return {**result, "sources": list(result["sources"])}
+        except GovernorQueueFull as e:
+            st.warning(f"⏳ The assistant is very busy right now (about {e.estimated_wait:.0f}s backlog). Please try again shortly.")
+            return None
+        except Exception as e:
+            st.error(f"❌ Failed to get answer: {str(e)}")
+            return None
+
+    async def aget_answer(self, query, help_mode, chapter=None, section=None, priority=Priority.BULK, deadline=None):
+        """Async get_answer for batch jobs; safe to run many concurrently from one event loop
+
+        Unlike get_answer there is no degraded fallback: batch output should only
+        hold real answers, so failures (and an open circuit) return None.
+        """
+        try:
+            if not self.vector_store:
+                print("⚠️ No vector store found!")
+                return None
+            if not MODEL_BREAKER.allow():
+                print("⚠️ Model circuit is open, skipping request")
+                return None
             
-            with st.spinner("🤔 Generating answer..."):
-                result = qa_chain({"query": enhanced_query})
+            retrieval_query, prompt = self.split_query(query)
+
+            async def upstream():
+                docs = await self.retriever.asearch(retrieval_query, k=3, chapter=chapter, section=section, deadline=deadline)
+                messages = self.build_answer_messages(prompt, docs)
+                async with GOVERNOR.aslot(priority, self.estimate_tokens(messages)):
+                    try:
+                        call = self.get_llm(0.2).ainvoke(messages)
+                        response = await (call if deadline is None else asyncio.wait_for(call, deadline.remaining()))
+                    except Exception:
+                        MODEL_BREAKER.record_failure()
+                        raise
+                MODEL_BREAKER.record_success()
+                return self.format_answer(response.content, docs, query)
+
+            if self.coalesce_requests:
+                result = await SINGLE_FLIGHT.ado(self.request_key(retrieval_query, prompt, chapter, section), upstream)
+            else:
+                result = await upstream()
+            return {**result, "sources": list(result["sources"])}
+        except Exception as e:
+            print(f"❌ Failed to get answer: {str(e)}")
+            return None
+
+    def stream_answer(self, query, help_mode, chapter=None, section=None, priority=None, deadline=None):
+        """Streaming get_answer: yields text chunks as they arrive, then the final result dict
+
+        The final item is what get_answer would have returned (None on failure).
+        Concurrent identical streams share one upstream call. The deadline bounds
+        the HTTP call; a stream that fails before its first chunk falls back to
+        the degraded answer.
+        """
+        try:
+            if not self.vector_store:
+                st.warning("⚠️ No vector store found!")
+                yield None
+                return
+            
+            retrieval_query, prompt = self.split_query(query)
+            if priority is None:
+                priority = self.default_priority(query)
+            if deadline is None:
+                deadline = Deadline(ANSWER_DEADLINE_SECONDS)
+            key = self.request_key(retrieval_query, prompt, chapter, section)
+            result = self.shed_answer(query, priority, chapter, section)
+            if result is None and not MODEL_BREAKER.allow():
+                result = self.degraded_answer(query, chapter, section)
+            if result is not None:
+                yield result["answer"]
+                yield result
+                return
             
-            answer = result["result"]
-            sources = [doc.metadata.get("source", "Unknown") for doc in result["source_documents"]]
-            unique_sources = list(set(sources))
+            def upstream():
+                docs = self.retriever.search(retrieval_query, k=3, chapter=chapter, section=section, deadline=deadline)
+                yield docs
+                messages = self.build_answer_messages(prompt, docs)
+                try:
+                    with GOVERNOR.slot(priority, self.estimate_tokens(messages), timeout=deadline.remaining()):
+                        llm = self.get_llm(0.2, max_retries=0)
+                        for chunk in llm.stream(messages, timeout=max(deadline.remaining(), 0.1)):
+                            if chunk.content:
+                                yield chunk.content
+                except (GovernorQueueFull, GovernorTimeout):
+                    raise
+                except Exception:
+                    MODEL_BREAKER.record_failure()
+                    raise
+                MODEL_BREAKER.record_success()
             
-            # Post-process the answer to ensure no direct solutions are given
-            if "answer" in answer.lower() or "solution" in answer.lower():
-                answer = "I can help guide you through this, but I won't provide the direct answer. Let me explain the concepts and steps instead."
+            events = SINGLE_FLIGHT.stream(key, upstream) if self.coalesce_requests else upstream()
             
-            return {
-                "answer": answer,
-                "sources": unique_sources
-            }
+            parts = []
+            try:
+                docs = next(events)
+                for chunk in events:
+                    parts.append(chunk)
+                    yield chunk
+            except GovernorQueueFull:
+                raise
+            except Exception as e:
+                if parts:
+                    raise
+                print(f"⚠️ Model call failed, answering in degraded mode: {e}")
+                result = self.degraded_answer(query, chapter, section)
+                yield result["answer"]
+                yield result
+                return
+            result = self.format_answer("".join(parts), docs, query)
+            self.cache_answer(key, result)
+            yield result
+        except GovernorQueueFull as e:
+            st.warning(f"⏳ The assistant is very busy right now (about {e.estimated_wait:.0f}s backlog). Please try again shortly.")
+            yield None
         except Exception as e:
             st.error(f"❌ Failed to get answer: {str(e)}")
-            return None
+            yield None
+
+    def summarize_conversation(self, previous_summary, lines, max_tokens=300):
+        """Rolling summary of older chat turns, used by ConversationMemory in the background"""
+        prompt = f"""
+        You are maintaining a running summary of a tutoring conversation about a Math 127 problem.
+        Update the summary with the new messages below. Keep what the student has already tried,
+        what they understood or struggled with, and which hints were given. Do not solve the problem.
+        Use at most {max_tokens} tokens.
 
-    def generate_similar_question(self, original_question, question_type=None):
-        """Generate a similar math question using LLM"""
+        Current summary: {previous_summary or "(none)"}
+
+        New messages:
+        {chr(10).join(lines)}
+
+        Updated summary:
+        """
+        # Summaries can wait; give up rather than hold a queue position for long
+        with GOVERNOR.slot(Priority.BACKGROUND, self.estimate_tokens(prompt), timeout=60):
+            return self.get_llm(0.0).invoke(prompt).content
+
+    def similar_question_prompt(self, original_question, question_type=None):
+        """Enhanced prompt specifically for math problems"""
+        prompt = """
+        Generate a similar math problem to the following, but with different numbers, 
+        variables, or slight variations in the scenario. The new problem should:
+        1. Test the same mathematical concepts and skills
+        2. Have approximately the same difficulty level
+        3. Be clearly stated and unambiguous
+        4. Have a different solution than the original
+        5. Maintain the same mathematical structure and operations
+        6. Keep the same question format and style
+        7. If this is a {question_type} type question, maintain the same step structure
+
+        Original Question: {question}
+
+        New Similar Question:
+        """
+        return prompt.format(
+            question=original_question,
+            question_type=question_type if question_type else "general"
+        )
+
+    def trim_similar_question(self, similar_question):
+        """Extract the generated question and trim it if the response is too long"""
+        similar_question = similar_question.strip()
+        if len(similar_question) > 1000:
+            similar_question = similar_question[:1000] + "..."
+        return similar_question
+
+    def generate_similar_question(self, original_question, question_type=None, priority=Priority.CHAT, fallback=True):
+        """Generate a similar math question using LLM
+
+        With fallback=False (background pool refills) errors are raised instead
+        of returning the regex fallback, so it never gets stored.
+        """
         OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
         try:
             if not OPENAI_API_KEY:
+                if not fallback:
+                    raise RuntimeError("missing API key")
                 return "Could not generate similar question due to missing API key."
     
-            # Enhanced prompt specifically for math problems
-            prompt = """
-            Generate a similar math problem to the following, but with different numbers, 
-            variables, or slight variations in the scenario. The new problem should:
-            1. Test the same mathematical concepts and skills
-            2. Have approximately the same difficulty level
-            3. Be clearly stated and unambiguous
-            4. Have a different solution than the original
-            5. Maintain the same mathematical structure and operations
-            6. Keep the same question format and style
-            7. If this is a {question_type} type question, maintain the same step structure
-    
-            Original Question: {question}
-    
-            New Similar Question:
-            """
-    
-            # Use a direct call to OpenAI API
-            llm = ChatOpenAI(
-                openai_api_key=OPENAI_API_KEY, 
-                model_name="gpt-3.5-turbo",  # Consider gpt-4 if available
-                temperature=0.7  # Good for creativity while maintaining structure
-            )
-    
-            # Format the prompt with the original question and type
-            formatted_prompt = prompt.format(
-                question=original_question,
-                question_type=question_type if question_type else "general"
-            )
+            # Good for creativity while maintaining structure
+            llm = self.get_llm(0.7)
     
             # Get the response from the LLM
-            response = llm.invoke(formatted_prompt)
-    
-            # Extract the generated question from the response
-            similar_question = response.content.strip()
-    
-            # If the response is too long, trim it
-            if len(similar_question) > 1000:
-                similar_question = similar_question[:1000] + "..."
-        
-            return similar_question
+            prompt = self.similar_question_prompt(original_question, question_type)
+            with GOVERNOR.slot(priority, self.estimate_tokens(prompt)):
+                response = llm.invoke(prompt)
+            return self.trim_similar_question(response.content)
     
         except Exception as e:
+            if not fallback:
+                raise
             st.error(f"❌ Failed to generate similar question: {str(e)}")
+            return self.fallback_similar_question(original_question)
+
+    async def agenerate_similar_question(self, original_question, question_type=None, priority=Priority.BULK,
+                                         fallback=True):
+        """Async generate_similar_question for batch jobs (fallback=False raises instead)"""
+        if not os.getenv("OPENAI_API_KEY"):
+            if not fallback:
+                raise RuntimeError("missing API key")
+            return "Could not generate similar question due to missing API key."
+
+        try:
+            prompt = self.similar_question_prompt(original_question, question_type)
+            async with GOVERNOR.aslot(priority, self.estimate_tokens(prompt)):
+                response = await self.get_llm(0.7).ainvoke(prompt)
+            return self.trim_similar_question(response.content)
+        except Exception as e:
+            if not fallback:
+                raise
+            print(f"❌ Failed to generate similar question: {str(e)}")
+            return self.fallback_similar_question(original_question)
+
+    async def abatch_get_answer(self, requests, max_concurrency=64):
+        """Run (query, help_mode[, chapter, section]) tuples concurrently; results keep the input order"""
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def run(request):
+            async with semaphore:
+                return await self.aget_answer(*request)
+
+        return await asyncio.gather(*(run(request) for request in requests))
+
+    async def abatch_generate_similar_questions(self, questions, max_concurrency=64):
+        """Run (original_question, question_type) pairs concurrently; results keep the input order"""
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def run(original_question, question_type):
+            async with semaphore:
+                return await self.agenerate_similar_question(original_question, question_type)
+
+        return await asyncio.gather(
+            *(run(original_question, question_type) for original_question, question_type in questions)
+        )
+
+    def batch_get_answer(self, requests, max_concurrency=64):
+        """Blocking wrapper around abatch_get_answer for scripts"""
+        return asyncio.run(self.abatch_get_answer(requests, max_concurrency))
+
+    def fallback_similar_question(self, original_question):
+        """Enhanced fallback with better mathematical integrity"""
+        try:
+            import re
+            import random
         
-            # Enhanced fallback with better mathematical integrity
-            try:
-                import re
-                import random
+            # More sophisticated number replacement
+            def replace_number(match):
+                num = float(match.group(0))
+                # Keep the same order of magnitude but change the value
+                magnitude = max(1, 10 ** int(math.log10(abs(num))) if num != 0 else 1)
             
-                # More sophisticated number replacement
-                def replace_number(match):
-                    num = float(match.group(0))
-                    # Keep the same order of magnitude but change the value
-                    magnitude = max(1, 10 ** int(math.log10(abs(num))) if num != 0 else 1)
-                
-                    # Generate a new number with the same general magnitude
-                    if abs(num) < 1:
-                        new_num = round(random.uniform(0.1, 0.9) * (1 if num > 0 else -1), 2)
-                    else:
-                        new_num = round(random.uniform(0.7, 1.3) * num, 2)
-                    
-                    # Make sure it's different from original
-                    if new_num == num:
-                        new_num = num + (0.1 * magnitude if num > 0 else -0.1 * magnitude)
+                # Generate a new number with the same general magnitude
+                if abs(num) < 1:
+                    new_num = round(random.uniform(0.1, 0.9) * (1 if num > 0 else -1), 2)
+                else:
+                    new_num = round(random.uniform(0.7, 1.3) * num, 2)
                 
-                    # Return as integer if original was integer
-                    if num.is_integer():
-                        return str(int(new_num))
-                    return str(new_num)
-            
-                # Replace numbers in the question
-                modified_question = re.sub(r'-?\d+(\.\d+)?', replace_number, original_question)
+                # Make sure it's different from original
+                if new_num == num:
+                    new_num = num + (0.1 * magnitude if num > 0 else -0.1 * magnitude)
             
-                # Also replace variable names in some cases
-                var_mapping = {'x': ['y', 'z', 't'], 'y': ['x', 'z', 'w'], 'f': ['g', 'h', 'F']}
-                for old_var, new_vars in var_mapping.items():
-                    if old_var in original_question:
-                        modified_question = modified_question.replace(old_var, random.choice(new_vars))
-            
-                return modified_question
-            
-            except Exception as nested_e:
-                # Ultimate fallback if everything else fails
-                return f"Unable to generate a similar question. Please try again. Error: {str(nested_e)}"
+                # Return as integer if original was integer
+                if num.is_integer():
+                    return str(int(new_num))
+                return str(new_num)
+        
+            # Replace numbers in the question
+            modified_question = re.sub(r'-?\d+(\.\d+)?', replace_number, original_question)
+        
+            # Also replace variable names in some cases
+            var_mapping = {'x': ['y', 'z', 't'], 'y': ['x', 'z', 'w'], 'f': ['g', 'h', 'F']}
+            for old_var, new_vars in var_mapping.items():
+                if old_var in original_question:
+                    modified_question = modified_question.replace(old_var, random.choice(new_vars))
+        
+            return modified_question
+        
+        except Exception as nested_e:
+            # Ultimate fallback if everything else fails
+            return f"Unable to generate a similar question. Please try again. Error: {str(nested_e)}"
@@ -0,0 +1,99 @@
+# backend/metadata_index.py
+import re
+from collections import defaultdict
+
+import faiss
+import numpy as np
+
+# "4.1.1.pdf" -> chapter 4, section "4.1"
+SECTION_PATTERN = re.compile(r"(\d+)\.(\d+)")
+
+
+def parse_section(value):
+    """Extract (chapter, "chapter.section") from a source name or section label"""
+    match = SECTION_PATTERN.search(str(value or ""))
+    if not match:
+        return None, None
+    return int(match.group(1)), f"{match.group(1)}.{match.group(2)}"
+
+
+class ChunkMetadataIndex:
+    """Bitmaps over FAISS positions keyed by source, section, chapter and page
+
+    Bit i is set when the chunk at FAISS position i carries that metadata, so a
+    scope filter is a single integer AND and plugs straight into
+    faiss.IDSelectorBitmap. The per-position mask and the FAISS selector of a
+    scope are built on its first search and reused; there are only as many
+    scopes as sections and chapters.
+    """
+
+    def __init__(self, ntotal):
+        self.ntotal = ntotal
+        self.all_chunks = (1 << ntotal) - 1
+        self.by_source = defaultdict(int)
+        self.by_section = defaultdict(int)
+        self.by_chapter = defaultdict(int)
+        self.by_page = defaultdict(int)  # (source, page) -> bitmap
+        self._masks = {}  # bitmap -> numpy bool array over positions
+        self._params = {}  # bitmap -> faiss.SearchParameters
+
+    @classmethod
+    def from_vector_store(cls, vector_store):
+        index = cls(vector_store.index.ntotal)
+        for position, doc_id in vector_store.index_to_docstore_id.items():
+            doc = vector_store.docstore.search(doc_id)
+            if isinstance(doc, str):
+                continue
+            index.add(position, doc.metadata)
+        return index
+
+    def add(self, position, metadata):
+        self._masks.clear()
+        self._params.clear()
+        bit = 1 << position
+        source = metadata.get("source", "Unknown")
+        self.by_source[source] |= bit
+        self.by_page[(source, metadata.get("page"))] |= bit
+        chapter, section = parse_section(metadata.get("title") or source)
+        if section:
+            self.by_section[section] |= bit
+            self.by_chapter[chapter] |= bit
+
+    def scopes(self, chapter=None, section=None):
+        """Progressively wider (name, bitmap) scopes: section, then chapter, then everything"""
+        scopes = []
+        section_chapter, section_key = parse_section(section)
+        if section_key and self.by_section.get(section_key):
+            scopes.append((f"section {section_key}", self.by_section[section_key]))
+        chapter = chapter if chapter is not None else section_chapter
+        if chapter is not None and self.by_chapter.get(int(chapter)):
+            bitmap = self.by_chapter[int(chapter)]
+            if not scopes or scopes[-1][1] != bitmap:
+                scopes.append((f"chapter {int(chapter)}", bitmap))
+        if not scopes or scopes[-1][1] != self.all_chunks:
+            scopes.append(("all", self.all_chunks))
+        return scopes
+
+    def mask(self, bitmap):
+        """Bool array, True at the positions in bitmap; None for every chunk"""
+        if bitmap == self.all_chunks:
+            return None
+        mask = self._masks.get(bitmap)
+        if mask is None:
+            packed = np.frombuffer(bitmap.to_bytes((self.ntotal + 7) // 8, "little"), dtype=np.uint8)
+            mask = np.unpackbits(packed, count=self.ntotal, bitorder="little").astype(bool)
+            self._masks[bitmap] = mask
+        return mask
+
+    def faiss_params(self, bitmap):
+        """SearchParameters restricting a FAISS search to the positions in bitmap"""
+        if bitmap == self.all_chunks:
+            return None
+        params = self._params.get(bitmap)
+        if params is None:
+            packed = np.frombuffer(bitmap.to_bytes((self.ntotal + 7) // 8, "little"), dtype=np.uint8).copy()
+            selector = faiss.IDSelectorBitmap(self.ntotal, faiss.swig_ptr(packed))
+            params = faiss.SearchParameters(sel=selector)
+            params._keepalive = (selector, packed)  # the selector only holds a raw pointer
+            self._params[bitmap] = params
+        return params
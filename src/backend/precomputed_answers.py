@@ -0,0 +1,70 @@
+# backend/precomputed_answers.py
+import json
+import os
+import threading
+import time
+
+PRECOMPUTED_ANSWERS_PATH = os.getenv(
+    "PRECOMPUTED_ANSWERS_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "precomputed_answers.json"),
+)
+# How long the loaded answers are trusted before the file is stat()ed again
+PRECOMPUTED_CHECK_SECONDS = float(os.getenv("PRECOMPUTED_CHECK_SECONDS", "1.0"))
+
+
+class PrecomputedAnswers:
+    """Model answers generated ahead of time (see precompute_openings.py), keyed by request key
+
+    The file is re-read when its mtime changes, so a fresh precompute run is
+    picked up without restarting the app; between checks (every
+    check_seconds) a lookup touches only memory.
+    """
+
+    def __init__(self, path, check_seconds=PRECOMPUTED_CHECK_SECONDS):
+        self.path = path
+        self.check_seconds = check_seconds
+        self._answers = {}
+        self._mtime = None
+        self._checked_at = None
+        self._lock = threading.Lock()
+
+    def _refresh(self):
+        now = time.monotonic()
+        if self._checked_at is not None and now - self._checked_at < self.check_seconds:
+            return
+        self._checked_at = now
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            return
+        if mtime == self._mtime:
+            return
+        try:
+            with open(self.path, "r") as f:
+                answers = json.load(f)["answers"]
+        except (OSError, ValueError, KeyError) as e:
+            print(f"⚠️ Could not load precomputed answers from {self.path}: {e}")
+            return
+        with self._lock:
+            self._answers = answers
+            self._mtime = mtime
+
+    def get(self, key):
+        self._refresh()
+        with self._lock:
+            return self._answers.get(key)
+
+    def __len__(self):
+        self._refresh()
+        return len(self._answers)
+
+    def save(self, answers):
+        """Replace the file atomically with {request key: {"answer", "sources"}}"""
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"answers": answers}, f)
+        os.replace(tmp_path, self.path)
+
+
+PRECOMPUTED_ANSWERS = PrecomputedAnswers(PRECOMPUTED_ANSWERS_PATH)
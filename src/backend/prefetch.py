@@ -0,0 +1,133 @@
+# backend/prefetch.py
+"""Background warming of the pages a student is likely to open next.
+
+Every click reruns the app, and the next page loads what it shows only
+then: the section's questions, the question record and the opening help
+message. While a student reads a page, it queues those loads here instead.
+The chapter page queues every section of the chapter. A section's question
+list queues, for the questions at the top of the list, what the question
+page shows (the record and its related questions) and their precomputed
+opening answers. Steps, hints and templates of a lazily loaded store
+question (question_store.py) stay undecoded until a student opens its
+help page; the question page queues parsing its step answer keys, so the
+first answer check is served from memory. Work runs on one daemon
+thread, and a target warmed within PREFETCH_TTL_SECONDS is not queued
+again. Requests beyond PREFETCH_MAX_PENDING are dropped, so prefetching
+stays bounded.
+"""
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+
+from backend.answer_check_pool import ANSWER_CHECK_POOL
+from backend.assistant_request import OPENING_HELP_MODES, AssistantRequest
+
+PREFETCH_MAX_PENDING = int(os.getenv("PREFETCH_MAX_PENDING", "256"))
+PREFETCH_TTL_SECONDS = float(os.getenv("PREFETCH_TTL_SECONDS", "30"))
+# Questions warmed per question list: the top of the page, which is what the student sees first
+PREFETCH_QUESTIONS_PER_PAGE = int(os.getenv("PREFETCH_QUESTIONS_PER_PAGE", "50"))
+# Warmed targets remembered for the TTL check
+_RECENT_LIMIT = 4096
+
+
+class Prefetcher:
+    """Runs warm-up calls on a background thread, each target at most once per ttl_seconds"""
+
+    def __init__(self, max_pending=PREFETCH_MAX_PENDING, ttl_seconds=PREFETCH_TTL_SECONDS):
+        self.max_pending = max_pending
+        self.ttl_seconds = ttl_seconds
+        self.counts = {"queued": 0, "warmed": 0, "failed": 0, "skipped": 0, "dropped": 0}
+        self._queue = queue.Queue()
+        self._pending = set()
+        self._recent = OrderedDict()  # key -> monotonic time it was warmed
+        self._lock = threading.Lock()
+        self._worker = None
+
+    def submit(self, key, fn, *args):
+        """Queue fn(*args) unless key is queued or was warmed recently; returns whether it was queued"""
+        with self._lock:
+            warmed_at = self._recent.get(key)
+            if key in self._pending or (warmed_at is not None and time.monotonic() - warmed_at < self.ttl_seconds):
+                self.counts["skipped"] += 1
+                return False
+            if len(self._pending) >= self.max_pending:
+                self.counts["dropped"] += 1
+                return False
+            self._pending.add(key)
+            self.counts["queued"] += 1
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, daemon=True, name="prefetch")
+                self._worker.start()
+        self._queue.put((key, fn, args))
+        return True
+
+    def _run(self):
+        while True:
+            key, fn, args = self._queue.get()
+            try:
+                fn(*args)
+                outcome = "warmed"
+            except Exception as e:
+                print(f"⚠️ Prefetch of {key} failed: {e}")
+                outcome = "failed"
+            with self._lock:
+                self._pending.discard(key)
+                self._recent[key] = time.monotonic()
+                self._recent.move_to_end(key)
+                while len(self._recent) > _RECENT_LIMIT:
+                    self._recent.popitem(last=False)
+                self.counts[outcome] += 1
+            self._queue.task_done()
+
+    def join(self):
+        """Block until everything queued so far has run"""
+        self._queue.join()
+
+    def stats(self):
+        with self._lock:
+            return {"pending": len(self._pending), **self.counts}
+
+
+def warm_section(loader, chapter, section):
+    """Load a section's questions and generic hints into the shared question cache"""
+    loader.load_section_questions(chapter, section)
+    loader.get_generic_hints(chapter, section)
+
+
+def warm_question(loader, assistant, question_id, chapter, section):
+    """Load what a question's page shows and resolve its precomputed opening answers"""
+    question = loader.get_question_by_id(question_id)
+    if question is None:
+        return
+    loader.get_related_questions(question)
+    for help_mode in OPENING_HELP_MODES:
+        assistant.prepared_opening(AssistantRequest(question=question["text"], help_mode=help_mode), chapter, section)
+
+
+def warm_steps(question):
+    """Decode a question's steps and parse their answer keys in the answer check workers"""
+    ANSWER_CHECK_POOL.warm(question.get("steps"))
+
+
+def prefetch_chapter(loader, chapter, sections):
+    """Queue every section of the chapter being viewed"""
+    for section in sections:
+        PREFETCHER.submit(("section", chapter, str(section)), warm_section, loader, chapter, str(section))
+
+
+def prefetch_questions(loader, assistant, chapter, section, question_ids):
+    """Queue the page records and opening answers of the first questions listed on the page being viewed"""
+    for question_id in question_ids[:PREFETCH_QUESTIONS_PER_PAGE]:
+        PREFETCHER.submit(("question", question_id, chapter, str(section)),
+                          warm_question, loader, assistant, question_id, chapter, str(section))
+
+
+def prefetch_answer_keys(question):
+    """Queue the step answer keys of the question being viewed, which its help page checks against"""
+    PREFETCHER.submit(("steps", question["id"]), warm_steps, question)
+
+
+# Shared by every session in this process
+PREFETCHER = Prefetcher()
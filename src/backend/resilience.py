@@ -0,0 +1,206 @@
+# backend/resilience.py
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from backend.retrieval_cache import BoundedLRUCache
+
+# End-to-end budget for one interactive answer (retrieval + generation)
+ANSWER_DEADLINE_SECONDS = float(os.getenv("ANSWER_DEADLINE_SECONDS", "20"))
+
+# Hedged attempts run here so the caller can stop waiting on a slow one
+_HEDGE_EXECUTOR = ThreadPoolExecutor(max_workers=32, thread_name_prefix="hedged-call")
+
+
+class DeadlineExceeded(TimeoutError):
+    """The request's time budget ran out before an answer was available"""
+
+
+class CircuitOpen(Exception):
+    """The model endpoint is failing; calls are short-circuited to degraded mode"""
+
+
+class Deadline:
+    """Absolute point in time by which a request must finish, passed down through each stage"""
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self):
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self):
+        return time.monotonic() >= self.expires_at
+
+    def check(self, stage):
+        if self.expired():
+            raise DeadlineExceeded(f"Deadline of {self.seconds:.0f}s exceeded before {stage}")
+
+
+class LatencyTracker:
+    """Sliding window of recent call latencies
+
+    Samples older than max_age seconds are dropped, so a burst of slow calls
+    stops counting once traffic moves on (or stops).
+    """
+
+    def __init__(self, window=200, min_samples=20, max_age=None):
+        self.min_samples = min_samples
+        self.max_age = max_age
+        self._samples = deque(maxlen=window)  # (recorded_at, seconds)
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        with self._lock:
+            self._samples.append((time.monotonic(), seconds))
+
+    def percentile(self, p, default=None):
+        """p-th percentile (0-100), or default until enough samples have been seen"""
+        with self._lock:
+            if self.max_age is not None:
+                cutoff = time.monotonic() - self.max_age
+                while self._samples and self._samples[0][0] < cutoff:
+                    self._samples.popleft()
+            if len(self._samples) < self.min_samples:
+                return default
+            ordered = sorted(seconds for _, seconds in self._samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+
+def hedged_call(fn, deadline, hedge_after=None, max_attempts=2):
+    """Call fn(timeout) and return the first successful result
+
+    If the first attempt has not finished after hedge_after seconds (or fails
+    early), a duplicate attempt is started and whichever succeeds first wins.
+    Losing attempts finish in the background. Raises DeadlineExceeded when
+    nothing succeeds within the deadline, or the last error when every
+    attempt failed.
+    """
+    start = time.monotonic()
+    pending = {_HEDGE_EXECUTOR.submit(fn, deadline.remaining())}
+    attempts = 1
+    last_error = None
+    while pending:
+        timeout = deadline.remaining()
+        if attempts < max_attempts and hedge_after is not None:
+            timeout = min(timeout, max(0.0, start + hedge_after - time.monotonic()))
+        done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                return future.result()
+            last_error = future.exception()
+        if deadline.expired():
+            break
+        hedge_due = hedge_after is not None and time.monotonic() - start >= hedge_after
+        if attempts < max_attempts and (hedge_due or not pending):
+            pending.add(_HEDGE_EXECUTOR.submit(fn, deadline.remaining()))
+            attempts += 1
+    if pending or last_error is None:
+        raise DeadlineExceeded(f"No answer within {deadline.seconds:.0f}s")
+    raise last_error
+
+
+class CircuitBreaker:
+    """Closed -> open after failure_threshold consecutive failures -> half-open after reset_timeout
+
+    While open, allow() is False and callers should use a degraded answer. In
+    the half-open state a single probe call is let through; its outcome
+    closes or re-opens the circuit. A probe that records no outcome within
+    probe_timeout (default reset_timeout), e.g. because its caller ran out of
+    time before calling the model, no longer holds the circuit: the next
+    allow() starts a new probe.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0, probe_timeout=None):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.probe_timeout = reset_timeout if probe_timeout is None else probe_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._probe_in_flight = False
+        self._probe_started_at = None
+        self.trips = 0
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state()
+
+    def _state(self):
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self):
+        with self._lock:
+            state = self._state()
+            if state == "closed":
+                return True
+            if state != "half_open":
+                return False
+            now = time.monotonic()
+            if self._probe_in_flight and now - self._probe_started_at < self.probe_timeout:
+                return False
+            self._probe_in_flight = True
+            self._probe_started_at = now
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._probe_in_flight or (self._opened_at is None and self._failures >= self.failure_threshold):
+                self.trips += 1
+                self._opened_at = time.monotonic()
+                self._probe_in_flight = False
+
+    def stats(self):
+        with self._lock:
+            return {"state": self._state(), "consecutive_failures": self._failures, "trips": self.trips}
+
+
+def _answer_size(result):
+    return len(result["answer"]) * 2 + sum(len(source) + 50 for source in result["sources"]) + 200
+
+
+# Process-wide, like the retrieval caches: every session shares the model's health
+MODEL_BREAKER = CircuitBreaker(
+    failure_threshold=int(os.getenv("MODEL_BREAKER_FAILURES", "5")),
+    reset_timeout=float(os.getenv("MODEL_BREAKER_RESET_SECONDS", "30")),
+)
+CHAT_LATENCY = LatencyTracker(max_age=600)
+# Last good answer per request key, served when the model is unavailable
+ANSWER_CACHE = BoundedLRUCache(int(os.getenv("ANSWER_CACHE_BYTES", 16 * 1024 * 1024)), _answer_size)
+
+# Shown with the keyword-retrieved course material when no model answer is available
+CANNED_GUIDANCE = {
+    "opening_conceptual": (
+        "Start by restating the question in your own words: what is given, and what are you asked to find? "
+        "The course notes below cover the ideas this question relies on."
+    ),
+    "opening_application": (
+        "Break the problem into steps: identify the technique the question calls for, apply it to the given "
+        "function or data, then check that your result answers what was asked. The course notes below may help."
+    ),
+    "chat": (
+        "Look back at the step you are working on and compare your work with the definitions and rules "
+        "in the course notes below."
+    ),
+    "step_question": (
+        "Focus on just this step. Use the hint for the step and the relevant rule from the course notes below."
+    ),
+    "wrong_answer": (
+        "Compare each part of your answer with the rule this step uses in the course notes below."
+    ),
+}
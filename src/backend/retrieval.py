@@ -0,0 +1,205 @@
+# backend/retrieval.py
+import asyncio
+import hashlib
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FuturesTimeout
+import numpy as np
+
+from backend.bm25_index import BM25Index, reciprocal_rank_fusion
+from backend.metadata_index import ChunkMetadataIndex
+from backend.retrieval_cache import (
+    RETRIEVAL_CACHE,
+    aget_cached_embedding,
+    get_cached_embedding,
+    query_hash,
+)
+
+BM25_FILENAME = "bm25_index.json"
+
+# "vector": dense FAISS only, "hybrid": BM25 + FAISS fused with RRF,
+# "keyword": BM25 only, answered locally without calling the embedding endpoint
+RETRIEVAL_MODES = ("vector", "hybrid", "keyword")
+DEFAULT_RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "hybrid")
+
+# Embedding calls slower than this push retrieval to keyword-only for a while
+EMBEDDING_SLOW_SECONDS = float(os.getenv("EMBEDDING_SLOW_SECONDS", "2.0"))
+EMBEDDING_COOLDOWN_SECONDS = float(os.getenv("EMBEDDING_COOLDOWN_SECONDS", "60"))
+
+# Deadline-bounded embedding calls run here; one that times out still fills the cache
+_EMBEDDING_EXECUTOR = ThreadPoolExecutor(max_workers=8, thread_name_prefix="embedding")
+
+
+def compute_index_version(vector_store):
+    """Fingerprint the indexed chunk set so cached results die with the index"""
+    digest = hashlib.sha1(str(vector_store.index.ntotal).encode("utf-8"))
+    for position in sorted(vector_store.index_to_docstore_id):
+        digest.update(vector_store.index_to_docstore_id[position].encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+def save_bm25_index(vector_store, index_dir):
+    """Build the keyword index at ingest time, next to the saved FAISS files"""
+    index = BM25Index.from_vector_store(vector_store, compute_index_version(vector_store))
+    index.save(os.path.join(index_dir, BM25_FILENAME))
+    return index
+
+
+class ChunkRetriever:
+    """Top-k chunk search over the FAISS store backed by the process-wide caches"""
+
+    def __init__(self, vector_store, embeddings, index_dir=None, mode=DEFAULT_RETRIEVAL_MODE):
+        self.vector_store = vector_store
+        self.embeddings = embeddings
+        self.mode = mode if mode in RETRIEVAL_MODES else "hybrid"
+        self.model = getattr(embeddings, "model", "embeddings")
+        self.index_version = compute_index_version(vector_store)
+        bm25_path = os.path.join(index_dir, BM25_FILENAME) if index_dir else None
+        self.bm25 = BM25Index.load_or_build(vector_store, self.index_version, bm25_path)
+        self.metadata = ChunkMetadataIndex.from_vector_store(vector_store)
+        self.embedding_degraded_until = 0.0
+
+    def _resolve_mode(self, mode):
+        mode = mode or self.mode
+        if mode != "keyword" and time.monotonic() < self.embedding_degraded_until:
+            return "keyword"
+        return mode
+
+    def _record_embedding_latency(self, seconds):
+        if seconds > EMBEDDING_SLOW_SECONDS:
+            print(f"⚠️ Embedding call took {seconds:.1f}s, using keyword retrieval for {EMBEDDING_COOLDOWN_SECONDS:.0f}s")
+            self.embedding_degraded_until = time.monotonic() + EMBEDDING_COOLDOWN_SECONDS
+
+    def _record_embedding_failure(self, error):
+        print(f"⚠️ Embedding endpoint unavailable, using keyword retrieval: {error}")
+        self.embedding_degraded_until = time.monotonic() + EMBEDDING_COOLDOWN_SECONDS
+
+    def embed_query(self, query, timeout=None):
+        if timeout is None:
+            return get_cached_embedding(self.model, query, self.embeddings.embed_query)
+        future = _EMBEDDING_EXECUTOR.submit(get_cached_embedding, self.model, query, self.embeddings.embed_query)
+        return future.result(timeout)
+
+    async def aembed_query(self, query, timeout=None):
+        embedding = aget_cached_embedding(self.model, query, self.embeddings.aembed_query)
+        if timeout is None:
+            return await embedding
+        return await asyncio.wait_for(embedding, timeout)
+
+    def _embedding_timeout(self, deadline):
+        """Time the embedding call may take before retrieval falls back to keyword-only"""
+        if deadline is None:
+            return None
+        return min(EMBEDDING_SLOW_SECONDS, deadline.remaining() / 2)
+
+    def _cache_key(self, query, k, mode, scopes):
+        return (query_hash(query), k, self.index_version, mode, tuple(name for name, _ in scopes))
+
+    def search_ids(self, query, k=3, mode=None, chapter=None, section=None, deadline=None):
+        """Return the docstore IDs of the k most relevant chunks
+
+        With a chapter/section, the current section's chunks are searched first and
+        the scope widens to the chapter and then the whole corpus only to fill
+        the remaining top-k slots. With a deadline, the embedding call gets at
+        most half the remaining budget before keyword-only results are used.
+        """
+        mode = self._resolve_mode(mode)
+        scopes = self.metadata.scopes(chapter, section)
+        cache_key = self._cache_key(query, k, mode, scopes)
+        ids = RETRIEVAL_CACHE.get(cache_key)
+        if ids is not None:
+            return ids
+        if mode == "keyword":
+            return self._cache(cache_key, self._rank(query, None, k, mode, scopes))
+
+        start = time.monotonic()
+        try:
+            embedding = self.embed_query(query, self._embedding_timeout(deadline))
+        except FuturesTimeout:
+            self._record_embedding_latency(time.monotonic() - start)
+            return self.search_ids(query, k, "keyword", chapter, section)
+        except Exception as e:
+            self._record_embedding_failure(e)
+            return self.search_ids(query, k, "keyword", chapter, section)
+        self._record_embedding_latency(time.monotonic() - start)
+        return self._cache(cache_key, self._rank(query, embedding, k, mode, scopes))
+
+    async def asearch_ids(self, query, k=3, mode=None, chapter=None, section=None, deadline=None):
+        mode = self._resolve_mode(mode)
+        scopes = self.metadata.scopes(chapter, section)
+        cache_key = self._cache_key(query, k, mode, scopes)
+        ids = RETRIEVAL_CACHE.get(cache_key)
+        if ids is not None:
+            return ids
+        if mode == "keyword":
+            return self._cache(cache_key, self._rank(query, None, k, mode, scopes))
+
+        # Only the embedding is a network call; the searches themselves are in-process
+        start = time.monotonic()
+        try:
+            embedding = await self.aembed_query(query, self._embedding_timeout(deadline))
+        except asyncio.TimeoutError:
+            self._record_embedding_latency(time.monotonic() - start)
+            return await self.asearch_ids(query, k, "keyword", chapter, section)
+        except Exception as e:
+            self._record_embedding_failure(e)
+            return await self.asearch_ids(query, k, "keyword", chapter, section)
+        self._record_embedding_latency(time.monotonic() - start)
+        return self._cache(cache_key, self._rank(query, embedding, k, mode, scopes))
+
+    def _cache(self, cache_key, ids):
+        RETRIEVAL_CACHE.put(cache_key, ids)
+        return ids
+
+    def _dense_ids(self, embedding, k, bitmap):
+        vector = np.frombuffer(embedding, dtype=np.float32).reshape(1, -1)
+        params = self.metadata.faiss_params(bitmap)
+        if params is None:
+            _, positions = self.vector_store.index.search(vector, k)
+        else:
+            _, positions = self.vector_store.index.search(vector, k, params=params)
+        return [
+            self.vector_store.index_to_docstore_id[int(position)]
+            for position in positions[0]
+            if position != -1
+        ]
+
+    def _keyword_ids(self, query, k, bitmap):
+        return [doc_id for doc_id, _ in self.bm25.search(query, k, allowed=self.metadata.mask(bitmap))]
+
+    def _rank_scope(self, query, embedding, k, mode, bitmap):
+        if mode == "keyword":
+            return self._keyword_ids(query, k, bitmap)
+        if mode == "vector":
+            return self._dense_ids(embedding, k, bitmap)
+        # Over-fetch from both lists so fusion has room to reorder
+        candidates = max(4 * k, 20)
+        dense = self._dense_ids(embedding, candidates, bitmap)
+        lexical = self._keyword_ids(query, candidates, bitmap)
+        return reciprocal_rank_fusion([dense, lexical], k)
+
+    def _rank(self, query, embedding, k, mode, scopes):
+        ids = []
+        for _, bitmap in scopes:
+            for doc_id in self._rank_scope(query, embedding, k, mode, bitmap):
+                if doc_id not in ids:
+                    ids.append(doc_id)
+            if len(ids) >= k:
+                break
+        return tuple(ids[:k])
+
+    def get_documents(self, ids):
+        docs = []
+        for doc_id in ids:
+            doc = self.vector_store.docstore.search(doc_id)
+            if not isinstance(doc, str):  # docstore returns an error string for unknown IDs
+                docs.append(doc)
+        return docs
+
+    def search(self, query, k=3, mode=None, chapter=None, section=None, deadline=None):
+        """Return the k most relevant chunks as LangChain documents"""
+        return self.get_documents(self.search_ids(query, k, mode, chapter, section, deadline))
+
+    async def asearch(self, query, k=3, mode=None, chapter=None, section=None, deadline=None):
+        return self.get_documents(await self.asearch_ids(query, k, mode, chapter, section, deadline))
@@ -0,0 +1,113 @@
+# backend/retrieval_cache.py
+import hashlib
+import os
+import re
+import threading
+from array import array
+from collections import OrderedDict
+
+# Rough per-entry bookkeeping cost (key tuple, OrderedDict node, boxed sizes)
+ENTRY_OVERHEAD_BYTES = 200
+
+
+def normalize_query(query):
+    """Collapse whitespace so trivially different prompts share cache entries"""
+    return re.sub(r"\s+", " ", query).strip()
+
+
+def query_hash(query):
+    """Stable hash of a normalized query string"""
+    return hashlib.sha256(normalize_query(query).encode("utf-8")).hexdigest()
+
+
+class BoundedLRUCache:
+    """Thread-safe LRU cache that evicts once its memory budget is exceeded"""
+
+    def __init__(self, max_bytes, sizeof):
+        self.max_bytes = max_bytes
+        self._sizeof = sizeof
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value):
+        size = self._sizeof(value) + ENTRY_OVERHEAD_BYTES
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.current_bytes -= old[1]
+            self._entries[key] = (value, size)
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted_size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        return {
+            "entries": len(self._entries),
+            "bytes": self.current_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+def _embedding_size(vector):
+    return vector.itemsize * len(vector)
+
+
+def _id_list_size(ids):
+    return sum(len(doc_id) + 50 for doc_id in ids) + 56
+
+
+# Process-wide caches shared by every session's MathAssistant.
+# query embeddings: (model, query hash) -> array('f')
+EMBEDDING_CACHE = BoundedLRUCache(
+    int(os.getenv("EMBEDDING_CACHE_BYTES", 64 * 1024 * 1024)), _embedding_size
+)
+# top-k results: (query hash, k, index version) -> tuple of docstore IDs
+RETRIEVAL_CACHE = BoundedLRUCache(
+    int(os.getenv("RETRIEVAL_CACHE_BYTES", 8 * 1024 * 1024)), _id_list_size
+)
+
+
+def get_cached_embedding(model, query, embed_fn):
+    """Return the query embedding, calling embed_fn only on a cache miss"""
+    key = (model, query_hash(query))
+    vector = EMBEDDING_CACHE.get(key)
+    if vector is None:
+        vector = array("f", embed_fn(normalize_query(query)))
+        EMBEDDING_CACHE.put(key, vector)
+    return vector
+
+
+async def aget_cached_embedding(model, query, aembed_fn):
+    """Async get_cached_embedding for the concurrent batch APIs"""
+    key = (model, query_hash(query))
+    vector = EMBEDDING_CACHE.get(key)
+    if vector is None:
+        vector = array("f", await aembed_fn(normalize_query(query)))
+        EMBEDDING_CACHE.put(key, vector)
+    return vector
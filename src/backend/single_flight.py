@@ -0,0 +1,156 @@
+# backend/single_flight.py
+import asyncio
+import threading
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class _StreamCall:
+    """Broadcast buffer: every subscriber replays the chunks so far, then follows live"""
+
+    def __init__(self):
+        self.chunks = []
+        self.finished = False
+        self.error = None
+        self.condition = threading.Condition()
+
+    def publish(self, chunk):
+        with self.condition:
+            self.chunks.append(chunk)
+            self.condition.notify_all()
+
+    def finish(self, error=None):
+        with self.condition:
+            self.finished = True
+            self.error = error
+            self.condition.notify_all()
+
+    def subscribe(self):
+        position = 0
+        while True:
+            with self.condition:
+                while position >= len(self.chunks) and not self.finished:
+                    self.condition.wait()
+                pending = self.chunks[position:]
+                finished, error = self.finished, self.error
+            for chunk in pending:
+                yield chunk
+            position += len(pending)
+            if finished and position >= len(self.chunks):
+                if error is not None:
+                    raise error
+                return
+
+
+class SingleFlight:
+    """Coalesce concurrent identical requests into one upstream call
+
+    Callers that arrive while a call for the same key is in flight wait for it
+    and share its result (or exception) instead of issuing their own. Keys are
+    forgotten as soon as the call completes, so this is not a cache.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._streams = {}
+        self._async_calls = {}
+        self.upstream_calls = 0
+        self.coalesced_calls = 0
+
+    def do(self, key, fn):
+        """Run fn() once for all concurrent callers with this key (thread-safe)"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.upstream_calls += 1
+            else:
+                self.coalesced_calls += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    async def ado(self, key, coro_fn):
+        """Async do(): coalesces coroutines running on the same event loop"""
+        loop_key = (id(asyncio.get_running_loop()), key)
+        with self._lock:
+            future = self._async_calls.get(loop_key)
+            leader = future is None
+            if leader:
+                future = self._async_calls[loop_key] = asyncio.get_running_loop().create_future()
+                self.upstream_calls += 1
+            else:
+                self.coalesced_calls += 1
+
+        if not leader:
+            return await asyncio.shield(future)
+
+        try:
+            result = await coro_fn()
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # mark retrieved when nobody else is waiting
+            raise
+        finally:
+            with self._lock:
+                del self._async_calls[loop_key]
+
+    def stream(self, key, generator_fn):
+        """Iterate one upstream stream for all concurrent callers with this key
+
+        The upstream generator is drained on a background thread, so a subscriber
+        that stops reading (e.g. a Streamlit rerun) cannot stall the others.
+        """
+        with self._lock:
+            call = self._streams.get(key)
+            if call is None:
+                call = self._streams[key] = _StreamCall()
+                self.upstream_calls += 1
+                threading.Thread(
+                    target=self._pump, args=(key, call, generator_fn), daemon=True, name="single-flight-stream"
+                ).start()
+            else:
+                self.coalesced_calls += 1
+        return call.subscribe()
+
+    def _pump(self, key, call, generator_fn):
+        error = None
+        try:
+            for chunk in generator_fn():
+                call.publish(chunk)
+        except Exception as e:
+            error = e
+        finally:
+            with self._lock:
+                del self._streams[key]
+            call.finish(error)
+
+    def stats(self):
+        return {"upstream_calls": self.upstream_calls, "coalesced_calls": self.coalesced_calls}
+
+
+# Shared by every session in the process
+SINGLE_FLIGHT = SingleFlight()
@@ -0,0 +1,223 @@
+# backend/variant_generators.py
+"""Local similar-question generators for typed questions, with no model call.
+
+Each generator perturbs the concrete numbers of a bank question under
+constraints that keep it well-posed (e.g. integer critical points), and
+recomputes every step's valid_answers exactly, so practice variants work in
+step-by-step mode. generate_variant() returns None for question types or
+shapes it cannot handle; callers then fall back to the LLM.
+"""
+import copy
+import random
+import re
+
+_FUNCTION_PATTERN = re.compile(r"f\(x\)\s*=\s*(?P<body>[^.,;]+?)(?=\s*(?:[.,;]|$|\s+on\s|\s+for\s))")
+_TERM_PATTERN = re.compile(r"([+-]?)\s*(\d*)\s*(x(?:\^(\d+))?)?")
+
+# Step texts for critical_points variants when the bank question's own steps cannot be reused
+CRITICAL_POINTS_STEPS = [
+    {"instruction": "Find the derivative of f(x).", "hint": "Use the power rule.", "format": "ax^n + bx^m"},
+    {"instruction": "Set the derivative equal to zero and solve for x.", "hint": "Factor the equation.",
+     "format": "List all solutions."},
+    {"instruction": "Classify each critical point as a local minimum, maximum, or neither.",
+     "hint": "Use the second derivative test or analyze the graph.",
+     "format": "x = value is (local minimum/maximum/neither)"},
+]
+
+
+def parse_polynomial(text):
+    """Integer coefficients {degree: coefficient} of e.g. "x^4 - 32x^2 + 5", or None if not a polynomial"""
+    text = text.replace(" ", "").replace("*", "")
+    if not text or not re.fullmatch(r"[0-9x^+-]+", text):
+        return None
+    coefficients = {}
+    position = 0
+    while position < len(text):
+        match = _TERM_PATTERN.match(text, position)
+        if not match or match.end() == position:
+            return None
+        sign, digits, variable, exponent = match.groups()
+        if not digits and not variable:
+            return None
+        coefficient = int(digits) if digits else 1
+        degree = (int(exponent) if exponent else 1) if variable else 0
+        coefficients[degree] = coefficients.get(degree, 0) + (-coefficient if sign == "-" else coefficient)
+        position = match.end()
+    return {degree: c for degree, c in coefficients.items() if c}
+
+
+def format_polynomial(coefficients, variable="x"):
+    """Human-style polynomial: highest degree first, "x" for 1x, no "^1" """
+    parts = []
+    for degree in sorted(coefficients, reverse=True):
+        c = coefficients[degree]
+        if not c:
+            continue
+        magnitude = abs(c)
+        if degree == 0:
+            term = str(magnitude)
+        else:
+            term = ("" if magnitude == 1 else str(magnitude)) + variable + ("" if degree == 1 else f"^{degree}")
+        if not parts:
+            parts.append(term if c > 0 else f"-{term}")
+        else:
+            parts.append(f"+ {term}" if c > 0 else f"- {term}")
+    return " ".join(parts) if parts else "0"
+
+
+def derivative(coefficients):
+    return {degree - 1: degree * c for degree, c in coefficients.items() if degree > 0}
+
+
+def evaluate(coefficients, x):
+    return sum(c * x ** degree for degree, c in coefficients.items())
+
+
+def _divisors(n):
+    n = abs(n)
+    small = [d for d in range(1, int(n ** 0.5) + 1) if n % d == 0]
+    return sorted(set(small + [n // d for d in small]))
+
+
+def integer_roots(coefficients):
+    """All integer roots if the polynomial splits completely over the integers, else None"""
+    coefficients = dict(coefficients)
+    roots = []
+    # Factor out x^k first so the rational-root search has a nonzero constant term
+    lowest = min(coefficients) if coefficients else 0
+    if lowest > 0:
+        roots.append(0)
+        coefficients = {degree - lowest: c for degree, c in coefficients.items()}
+    degree = max(coefficients) if coefficients else 0
+    # Synthetic division by each root, keeping multiplicities
+    dense = [coefficients.get(d, 0) for d in range(degree, -1, -1)]
+    while len(dense) > 1:
+        constant, leading = dense[-1], dense[0]
+        for candidate in (s * d for d in _divisors(constant) for s in (1, -1)):
+            if leading and candidate and (constant % candidate == 0) and _dense_eval(dense, candidate) == 0:
+                roots.append(candidate)
+                dense = _synthetic_divide(dense, candidate)
+                break
+        else:
+            return None
+    return sorted(set(roots))
+
+
+def _dense_eval(dense, x):
+    value = 0
+    for c in dense:
+        value = value * x + c
+    return value
+
+
+def _synthetic_divide(dense, root):
+    quotient = [dense[0]]
+    for c in dense[1:-1]:
+        quotient.append(c + quotient[-1] * root)
+    return quotient
+
+
+def classify_critical_points(f_prime, points):
+    """"local minimum" / "local maximum" / "neither" per point, by the first derivative test"""
+    labels = {}
+    for index, point in enumerate(points):
+        left = point - 0.5 if index == 0 else (points[index - 1] + point) / 2
+        right = point + 0.5 if index == len(points) - 1 else (point + points[index + 1]) / 2
+        before, after = evaluate(f_prime, left), evaluate(f_prime, right)
+        if before < 0 < after:
+            labels[point] = "local minimum"
+        elif before > 0 > after:
+            labels[point] = "local maximum"
+        else:
+            labels[point] = "neither"
+    return labels
+
+
+class CriticalPointsGenerator:
+    """Variants of "Find the critical points of f(x) = <polynomial>"
+
+    Keeps the same terms (the degrees with nonzero coefficients) and the same
+    leading sign, perturbs the coefficients, and accepts a candidate only if
+    f' splits over the integers with the same number of critical points, so
+    every step has a clean exact answer.
+    """
+
+    question_type = "critical_points"
+    max_tries = 5000
+
+    def generate(self, question, rng):
+        match = _FUNCTION_PATTERN.search(question["text"])
+        if not match:
+            return None
+        original = parse_polynomial(match.group("body"))
+        if not original or max(original) < 2 or max(original) > 6:
+            return None
+        original_points = integer_roots(derivative(original))
+        if not original_points:
+            return None
+
+        for _ in range(self.max_tries):
+            candidate = self._perturb(original, rng)
+            if candidate == original:
+                continue
+            f_prime = derivative(candidate)
+            points = integer_roots(f_prime)
+            if points is None or len(points) != len(original_points) or max(abs(p) for p in points) > 12:
+                continue
+            body = format_polynomial(candidate)
+            text = question["text"][:match.start("body")] + body + question["text"][match.end("body"):]
+            return {
+                "text": text,
+                "type": self.question_type,
+                "function": body,
+                "steps": self._steps(question.get("steps", []), f_prime, points),
+                "source": "symbolic",
+            }
+        return None
+
+    def _perturb(self, original, rng):
+        leading = max(original)
+        candidate = {}
+        for degree, c in original.items():
+            if degree == leading:
+                value = rng.choice([1, 1, 1, 2, 3]) * (1 if c > 0 else -1)
+            else:
+                spread = max(10, 4 * abs(c))
+                value = rng.randint(-spread, spread)
+            if value:
+                candidate[degree] = value
+        return candidate if leading in candidate else original
+
+    def _steps(self, template_steps, f_prime, points):
+        derivative_text = format_polynomial(f_prime)
+        points_text = ", ".join(str(p) for p in points)
+        labels = classify_critical_points(f_prime, points)
+        answers = [
+            [derivative_text, derivative_text.replace(" ", "")],
+            [points_text, points_text.replace(" ", "")],
+            [f"x = {p} is {labels[p]}" for p in points],
+        ]
+        base = template_steps if len(template_steps) == len(answers) else CRITICAL_POINTS_STEPS
+        steps = []
+        for step, valid_answers in zip(base, answers):
+            step = copy.deepcopy(step)
+            step["valid_answers"] = valid_answers
+            # The bank's placeholder shows the original question's answer
+            step.pop("placeholder", None)
+            steps.append(step)
+        return steps
+
+
+VARIANT_GENERATORS = {generator.question_type: generator for generator in (CriticalPointsGenerator(),)}
+
+
+def has_generator(question_type):
+    return question_type in VARIANT_GENERATORS
+
+
+def generate_variant(question, seed=None):
+    """Local variant of a bank question (text, steps with valid_answers), or None if unsupported"""
+    generator = VARIANT_GENERATORS.get(question.get("type"))
+    if generator is None:
+        return None
+    return generator.generate(question, random.Random(seed))
@@ -0,0 +1,271 @@
+# backend/variant_pool.py
+import hashlib
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import closing
+
+from backend.variant_validator import VARIANT_VALIDATOR
+
+VARIANT_POOL_PATH = os.getenv(
+    "VARIANT_POOL_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "variant_pool.sqlite3"),
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS variants (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    question_id TEXT NOT NULL,
+    text TEXT NOT NULL,
+    text_hash TEXT NOT NULL,
+    data TEXT,
+    source TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    status TEXT NOT NULL DEFAULT 'ready',
+    question_type TEXT,
+    UNIQUE (question_id, text_hash)
+);
+CREATE TABLE IF NOT EXISTS seen (
+    session_id TEXT NOT NULL,
+    variant_id INTEGER NOT NULL,
+    seen_at REAL NOT NULL,
+    PRIMARY KEY (session_id, variant_id)
+);
+CREATE INDEX IF NOT EXISTS variants_by_question ON variants (question_id);
+"""
+# Columns added after the first release, for pool files created before them
+_MIGRATIONS = {
+    "status": "ALTER TABLE variants ADD COLUMN status TEXT NOT NULL DEFAULT 'ready'",
+    "question_type": "ALTER TABLE variants ADD COLUMN question_type TEXT",
+}
+
+# Only "ready" variants are served; "pending" ones wait for the validator
+READY, PENDING, REJECTED = "ready", "pending", "rejected"
+
+
+def text_hash(text):
+    return hashlib.sha256(" ".join(text.split()).encode("utf-8")).hexdigest()
+
+
+class VariantPool:
+    """Persistent pool of pre-generated similar questions per question ID
+
+    take() serves a variant the session has not seen yet straight from SQLite
+    and, when fewer than low_water unseen variants remain for that session,
+    queues a background refill that tops the question up (up to
+    max_per_question variants, shared by all sessions). Only the refill
+    worker calls the generator, so students never wait on it.
+
+    Model-written variants of typed questions are stored as pending and
+    handed to the validator; they become servable (with derived steps) once
+    it accepts them. Rejected ones are kept so the same text is not stored
+    again, but do not count towards max_per_question.
+    """
+
+    def __init__(self, path, low_water=3, refill_batch=5, max_per_question=40, seen_ttl_days=30, validator=None):
+        self.path = path
+        self.low_water = low_water
+        self.refill_batch = refill_batch
+        self.max_per_question = max_per_question
+        self.seen_ttl_days = seen_ttl_days
+        self.validator = validator
+        self._validating = set()
+        self._refills = queue.Queue()
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._worker = None
+        self._initialized = False
+
+    def _connect(self):
+        # One short-lived connection per operation: safe across Streamlit threads and processes
+        if not self._initialized:
+            with self._lock:
+                if not self._initialized:
+                    os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                    with closing(sqlite3.connect(self.path, timeout=30)) as db, db:
+                        db.execute("PRAGMA journal_mode=WAL")
+                        db.executescript(_SCHEMA)
+                        columns = {row[1] for row in db.execute("PRAGMA table_info(variants)")}
+                        for column, statement in _MIGRATIONS.items():
+                            if column not in columns:
+                                db.execute(statement)
+                        db.execute("DELETE FROM seen WHERE seen_at < ?", (time.time() - self.seen_ttl_days * 86400,))
+                    self._initialized = True
+        return sqlite3.connect(self.path, timeout=30)
+
+    def add(self, question_id, text, data=None, source="llm", status=READY, question_type=None):
+        """Store a variant; returns its ID (the existing one for duplicate text)"""
+        digest = text_hash(text)
+        with closing(self._connect()) as db, db:
+            db.execute(
+                "INSERT OR IGNORE INTO variants "
+                "(question_id, text, text_hash, data, source, created_at, status, question_type) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (question_id, text, digest, json.dumps(data) if data is not None else None, source, time.time(),
+                 status, question_type),
+            )
+            row = db.execute(
+                "SELECT id FROM variants WHERE question_id = ? AND text_hash = ?", (question_id, digest)
+            ).fetchone()
+        return row[0]
+
+    def count(self, question_id):
+        with closing(self._connect()) as db:
+            return self._count(db, question_id)
+
+    def _count(self, db, question_id):
+        return db.execute(
+            "SELECT COUNT(*) FROM variants WHERE question_id = ? AND status != ?", (question_id, REJECTED)
+        ).fetchone()[0]
+
+    def unseen_count(self, question_id, session_id):
+        with closing(self._connect()) as db:
+            return db.execute(
+                "SELECT COUNT(*) FROM variants v WHERE v.question_id = ? AND v.status = ? AND NOT EXISTS "
+                "(SELECT 1 FROM seen s WHERE s.session_id = ? AND s.variant_id = v.id)",
+                (question_id, READY, session_id),
+            ).fetchone()[0]
+
+    def take(self, question_id, session_id):
+        """Oldest variant this session has not seen, marked as seen; None if there is none
+
+        Once the question's pool is full and the session has seen all of it,
+        the variant it saw longest ago is repeated rather than generating more.
+        """
+        with closing(self._connect()) as db, db:
+            row = db.execute(
+                "SELECT v.id, v.text, v.data, v.source FROM variants v WHERE v.question_id = ? AND v.status = ? "
+                "AND NOT EXISTS (SELECT 1 FROM seen s WHERE s.session_id = ? AND s.variant_id = v.id) "
+                "ORDER BY v.id LIMIT 1",
+                (question_id, READY, session_id),
+            ).fetchone()
+            if row is None and self._count(db, question_id) >= self.max_per_question:
+                row = db.execute(
+                    "SELECT v.id, v.text, v.data, v.source FROM variants v JOIN seen s ON s.variant_id = v.id "
+                    "WHERE v.question_id = ? AND v.status = ? AND s.session_id = ? ORDER BY s.seen_at LIMIT 1",
+                    (question_id, READY, session_id),
+                ).fetchone()
+            if row is not None:
+                self._mark_seen(db, session_id, row[0])
+        if row is None:
+            return None
+        return {"id": row[0], "text": row[1], "data": json.loads(row[2]) if row[2] else None, "source": row[3]}
+
+    def mark_seen(self, session_id, variant_id):
+        with closing(self._connect()) as db, db:
+            self._mark_seen(db, session_id, variant_id)
+
+    def _mark_seen(self, db, session_id, variant_id):
+        db.execute(
+            "INSERT OR REPLACE INTO seen (session_id, variant_id, seen_at) VALUES (?, ?, ?)",
+            (session_id, variant_id, time.time()),
+        )
+
+    def ensure_stock(self, question_id, session_id, question_text, question_type, generate_fn):
+        """Queue a refill if this session is running low on unseen variants (non-blocking)"""
+        if self.unseen_count(question_id, session_id) < self.low_water:
+            self.request_refill(question_id, question_text, question_type, generate_fn)
+
+    def request_refill(self, question_id, question_text, question_type, generate_fn):
+        """generate_fn(question_text, question_type) runs on the refill worker
+
+        It returns the variant text, or a dict with "text" (and optionally
+        "source"), e.g. from a local generator, which is stored whole as data.
+        """
+        with self._lock:
+            if question_id in self._pending:
+                return
+            self._pending.add(question_id)
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, daemon=True, name="variant-pool-refill")
+                self._worker.start()
+        self._refills.put((question_id, question_text, question_type, generate_fn))
+
+    def _run(self):
+        while True:
+            question_id, question_text, question_type, generate_fn = self._refills.get()
+            try:
+                self._refill(question_id, question_text, question_type, generate_fn)
+            except Exception as e:
+                print(f"⚠️ Failed to refill similar questions for {question_id}: {e}")
+            finally:
+                with self._lock:
+                    self._pending.discard(question_id)
+
+    def _refill(self, question_id, question_text, question_type, generate_fn):
+        self._revalidate_pending(question_id)
+        room = self.max_per_question - self.count(question_id)
+        for _ in range(min(self.refill_batch, room)):
+            variant = generate_fn(question_text, question_type)
+            if isinstance(variant, dict):
+                text, data, source = variant["text"], variant, variant.get("source", "llm")
+            else:
+                text, data, source = variant, None, "llm"
+            if not text or text_hash(text) == text_hash(question_text):
+                continue
+            if data is None and self.validator is not None and question_type:
+                variant_id = self.add(question_id, text, None, source, PENDING, question_type)
+                self._validate(variant_id, text, question_type)
+            else:
+                self.add(question_id, text, data, source, READY, question_type)
+
+    def _validate(self, variant_id, text, question_type):
+        with self._lock:
+            if variant_id in self._validating:
+                return
+            self._validating.add(variant_id)
+
+        def on_done(result):
+            try:
+                if result["status"] != "failed":  # no verdict; the next refill resubmits it
+                    self._store_validation(variant_id, result)
+            except Exception as e:
+                print(f"⚠️ Failed to store validation of similar question {variant_id}: {e}")
+            finally:
+                with self._lock:
+                    self._validating.discard(variant_id)
+
+        self.validator.submit(text, question_type, text_hash(text), on_done)
+
+    def _store_validation(self, variant_id, result):
+        status = REJECTED if result["status"] == "rejected" else READY
+        data = json.dumps(result["data"]) if result["data"] is not None else None
+        with closing(self._connect()) as db, db:
+            updated = db.execute(
+                "UPDATE variants SET status = ?, data = ? WHERE id = ? AND status = ?",
+                (status, data, variant_id, PENDING),
+            ).rowcount
+        if updated and status == REJECTED:
+            print(f"⚠️ Rejected similar question {variant_id}: {result['reason']}")
+
+    def _revalidate_pending(self, question_id):
+        """Resubmit variants left pending by a restart or a crashed validation worker"""
+        if self.validator is None:
+            return
+        with closing(self._connect()) as db:
+            rows = db.execute(
+                "SELECT id, text, question_type FROM variants WHERE question_id = ? AND status = ?",
+                (question_id, PENDING),
+            ).fetchall()
+        for variant_id, text, question_type in rows:
+            self._validate(variant_id, text, question_type)
+
+    def stats(self):
+        with closing(self._connect()) as db:
+            by_status = dict(db.execute("SELECT status, COUNT(*) FROM variants GROUP BY status").fetchall())
+            questions = db.execute("SELECT COUNT(DISTINCT question_id) FROM variants").fetchone()[0]
+        return {
+            "variants": sum(by_status.values()),
+            "questions": questions,
+            "ready": by_status.get(READY, 0),
+            "pending_validation": by_status.get(PENDING, 0),
+            "rejected": by_status.get(REJECTED, 0),
+            "pending_refills": len(self._pending),
+        }
+
+
+# Shared by every session in this process; the SQLite file is shared across processes
+VARIANT_POOL = VariantPool(VARIANT_POOL_PATH, validator=VARIANT_VALIDATOR)
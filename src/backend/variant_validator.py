@@ -0,0 +1,243 @@
+# backend/variant_validator.py
+"""Background validation and answer keys for model-generated practice variants.
+
+A model-written variant is stored as "pending" and handed to a small process
+pool. A worker parses the variant with sympy and solves it under a CPU time
+budget. It rejects variants that do not parse, have no real solution or
+cannot be solved in time, and derives each step's valid_answers for the
+ones that pass. Results are cached by question type and variant text hash,
+so a text the model repeats is never solved twice. Nothing here blocks a
+page render: the pool serves a variant only once it has been validated.
+"""
+import os
+import re
+import signal
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from backend.retrieval_cache import BoundedLRUCache
+from backend.variant_generators import CRITICAL_POINTS_STEPS
+
+VALIDATION_WORKERS = int(os.getenv("VARIANT_VALIDATION_WORKERS", 2))
+VALIDATION_BUDGET_SECONDS = float(os.getenv("VARIANT_VALIDATION_BUDGET_SECONDS", 2.0))
+
+# The model may rename the function or variable, e.g. "g(t) = 2t^3 - 6t"
+_FUNCTION_PATTERN = re.compile(
+    r"\b(?P<name>[a-zA-Z])\((?P<var>[a-zA-Z])\)\s*=\s*(?P<body>[^=,;]+?)"
+    r"(?=\s*(?:[.,;](?:\s|$)|$|\s+(?:on|for|over|where|and)\b))"
+)
+MAX_CRITICAL_POINTS = 8
+
+
+class ValidationTimeout(Exception):
+    pass
+
+
+def _on_alarm(signum, frame):
+    raise ValidationTimeout()
+
+
+def _format_expression(expr):
+    """sympy expression as students type it: "4x^3 - 64x" rather than "4*x**3 - 64*x" """
+    return str(expr).replace("**", "^").replace("*", "")
+
+
+def check_critical_points(text):
+    """Answer-keyed steps for "find the critical points of f(x) = ...", or raise ValueError"""
+    import sympy
+    from sympy.parsing.sympy_parser import (
+        convert_xor, implicit_multiplication_application, parse_expr, standard_transformations,
+    )
+
+    match = _FUNCTION_PATTERN.search(text)
+    if not match:
+        raise ValueError("no function definition found")
+    name, var_name = match.group("name"), match.group("var")
+    var = sympy.Symbol(var_name, real=True)
+    try:
+        f = parse_expr(
+            match.group("body"),
+            local_dict={"e": sympy.E, var_name: var},
+            transformations=standard_transformations + (implicit_multiplication_application, convert_xor),
+        )
+        # Decimals as exact fractions, so "2.5x" yields the critical point 5/4
+        f = sympy.nsimplify(f, rational=True)
+    except Exception as e:
+        raise ValueError(f"unparseable function: {e}")
+    if not isinstance(f, sympy.Expr) or f.free_symbols != {var}:
+        raise ValueError("function must depend on exactly one variable")
+
+    f_prime = sympy.expand(sympy.diff(f, var))
+    solutions = sympy.solveset(sympy.Eq(f_prime, 0), var, domain=sympy.S.Reals)
+    if not isinstance(solutions, sympy.FiniteSet) or not solutions:
+        raise ValueError("no finite set of real critical points")
+    if len(solutions) > MAX_CRITICAL_POINTS:
+        raise ValueError("too many critical points")
+    if any(p.has(sympy.CRootOf) for p in solutions):
+        raise ValueError("critical points have no closed form")
+    points = sorted(solutions, key=lambda p: float(p))
+
+    # First derivative test between neighbouring critical points
+    values = [float(p) for p in points]
+    labels = []
+    for index, value in enumerate(values):
+        left = value - 0.5 if index == 0 else (values[index - 1] + value) / 2
+        right = value + 0.5 if index == len(values) - 1 else (value + values[index + 1]) / 2
+        before, after = (complex(f_prime.subs(var, x).evalf()) for x in (left, right))
+        if before.imag or after.imag:
+            raise ValueError("derivative is not real around the critical points")
+        if before.real < 0 < after.real:
+            labels.append("local minimum")
+        elif before.real > 0 > after.real:
+            labels.append("local maximum")
+        else:
+            labels.append("neither")
+
+    derivative_text = _format_expression(f_prime)
+    points_text = ", ".join(_format_expression(p) for p in points)
+    answers = [
+        [derivative_text, derivative_text.replace(" ", "")],
+        [points_text, points_text.replace(" ", "")],
+        [f"{var_name} = {_format_expression(p)} is {label}" for p, label in zip(points, labels)],
+    ]
+    steps = []
+    for step, valid_answers in zip(CRITICAL_POINTS_STEPS, answers):
+        step = dict(step, valid_answers=valid_answers)
+        step["instruction"] = step["instruction"].replace("f(x)", f"{name}({var_name})").replace(" x.", f" {var_name}.")
+        steps.append(step)
+    return {"function": match.group("body").strip(), "steps": steps}
+
+
+VALIDATORS = {"critical_points": check_critical_points}
+
+
+def validate_variant(text, question_type, budget=VALIDATION_BUDGET_SECONDS):
+    """{"status": "valid" | "rejected" | "unchecked", "reason", "data"} for one variant
+
+    Runs in a worker process, where SIGALRM bounds the time spent solving.
+    Types without a validator are "unchecked" and served as before.
+    """
+    checker = VALIDATORS.get(question_type)
+    if checker is None:
+        return {"status": "unchecked", "reason": "no validator for this type", "data": None}
+    timed = budget and hasattr(signal, "setitimer") and threading.current_thread() is threading.main_thread()
+    if timed:
+        signal.signal(signal.SIGALRM, _on_alarm)
+        signal.setitimer(signal.ITIMER_REAL, budget)
+    try:
+        data = checker(text)
+    except ValidationTimeout:
+        return {"status": "rejected", "reason": f"not solved within {budget:g}s", "data": None}
+    except ImportError:
+        return {"status": "unchecked", "reason": "sympy is not installed", "data": None}
+    except Exception as e:
+        return {"status": "rejected", "reason": str(e) or type(e).__name__, "data": None}
+    finally:
+        if timed:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+    data.update({"text": text, "type": question_type, "source": "llm"})
+    return {"status": "valid", "reason": None, "data": data}
+
+
+def _failed(reason):
+    """Result for a validation that ended without a verdict; the variant stays pending"""
+    return {"status": "failed", "reason": reason, "data": None}
+
+
+class VariantValidator:
+    """Process pool that validates variants off the request path
+
+    submit() returns at once; on_done(result) runs on a pool callback thread
+    (or immediately, for a cached text hash), exactly once per submit. A
+    worker that dies breaks the whole pool, so the pool is replaced and its
+    variants are submitted again (once each). A validation that ends without
+    a verdict reports status "failed".
+    """
+
+    def __init__(self, workers=VALIDATION_WORKERS, budget=VALIDATION_BUDGET_SECONDS):
+        self.workers = workers
+        self.budget = budget
+        self.cache = BoundedLRUCache(4 * 1024 * 1024, lambda result: len(repr(result)))
+        self._executor = None
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self.restarts = 0
+        self.counts = {"valid": 0, "rejected": 0, "unchecked": 0, "failed": 0}
+
+    def _get_executor(self, broken=None):
+        """The pool; pass the pool a call failed on to replace it (once, however many calls saw it break)"""
+        with self._lock:
+            if self._executor is None or (broken is not None and self._executor is broken):
+                if broken is not None:
+                    broken.shutdown(wait=False)
+                    self.restarts += 1
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            return self._executor
+
+    def submit(self, text, question_type, digest, on_done):
+        key = (question_type, digest)
+        cached = self.cache.get(key)
+        if cached is not None:
+            on_done(cached)
+            return
+        with self._lock:
+            self._in_flight += 1
+        try:
+            self._submit(key, text, question_type, on_done, retries=1)
+        except BaseException:
+            with self._lock:
+                self._in_flight -= 1
+            raise
+
+    def _submit(self, key, text, question_type, on_done, retries):
+        executor = self._get_executor()
+        try:
+            future = executor.submit(validate_variant, text, question_type, self.budget)
+        except BrokenProcessPool:
+            executor = self._get_executor(broken=executor)
+            future = executor.submit(validate_variant, text, question_type, self.budget)
+
+        def finished(future):
+            result = cache = None
+            try:
+                result = cache = future.result()
+            except BrokenProcessPool as e:
+                if retries:
+                    print(f"⚠️ Variant validation worker died, restarting the pool: {e}")
+                    self._get_executor(broken=executor)
+                    try:
+                        self._submit(key, text, question_type, on_done, retries - 1)
+                        return  # still in flight
+                    except Exception as e:
+                        print(f"⚠️ Variant validation could not be resubmitted: {e}")
+                        result = _failed(f"could not be resubmitted: {e}")
+                else:
+                    # The variant itself is most likely what kills the worker; retrying it
+                    # would only break the pool again. Not cached: an unrelated crash may
+                    # have coincided, and the text can then pass on a later refill.
+                    print(f"⚠️ Variant validation worker died twice on one variant: {text[:80]!r}")
+                    self._get_executor(broken=executor)
+                    result = {"status": "rejected", "reason": "validation worker died twice", "data": None}
+            except Exception as e:
+                # A failed worker says nothing about the variant; leave it pending for a retry
+                print(f"⚠️ Variant validation failed: {e}")
+                result = _failed(str(e) or type(e).__name__)
+            try:
+                if cache is not None:
+                    self.cache.put(key, cache)
+                on_done(result)
+            finally:
+                with self._lock:
+                    self._in_flight -= 1
+                    self.counts[result["status"]] += 1
+
+        future.add_done_callback(finished)
+
+    def stats(self):
+        with self._lock:
+            return {"in_flight": self._in_flight, **self.counts, "restarts": self.restarts, "cache_hits": self.cache.hits}
+
+
+# Shared by every session in this process
+VARIANT_VALIDATOR = VariantValidator()
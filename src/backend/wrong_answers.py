@@ -0,0 +1,177 @@
+# backend/wrong_answers.py
+"""Common wrong step answers, for feedback on a known mistake without a model call.
+
+Every wrong step answer is counted under its step and its fingerprint
+(answer_checker.fingerprint), along with the first input seen. A step is
+identified by a hash of its valid_answers, so every question or instance
+with the same answer key shares its counts. precompute_feedback.py attaches
+feedback to fingerprints: authored ("common_mistakes" of a step in the
+question JSON), or written by the model for the most common mistakes that
+have none. The step interface shows it in place of the generic hint.
+
+Rows live in SQLite and are shared by every app process. Each process
+keeps them in a dict, so a lookup is one dict access. Every check_seconds
+it reads only the rows changed since its last read, ordered by each
+row's change sequence number.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from typing import Dict, List, Optional, Sequence
+
+WRONG_ANSWERS_PATH = os.getenv(
+    "WRONG_ANSWERS_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "wrong_answers.sqlite3"),
+)
+# How long the in-memory rows are trusted before rows changed by other processes are read
+WRONG_ANSWERS_CHECK_SECONDS = float(os.getenv("WRONG_ANSWERS_CHECK_SECONDS", "5.0"))
+
+AUTHORED, LLM = "authored", "llm"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS wrong_answers (
+    step_key TEXT NOT NULL,
+    fingerprint TEXT NOT NULL,
+    count INTEGER NOT NULL DEFAULT 0,
+    example TEXT NOT NULL,
+    question TEXT,
+    step TEXT,
+    feedback TEXT,
+    feedback_source TEXT,
+    seq INTEGER NOT NULL,
+    PRIMARY KEY (step_key, fingerprint)
+);
+CREATE INDEX IF NOT EXISTS wrong_answers_by_seq ON wrong_answers (seq);
+"""
+# Every write takes the next sequence number inside its own statement, so numbers follow commit order
+_NEXT_SEQ = "(SELECT COALESCE(MAX(seq), 0) + 1 FROM wrong_answers)"
+_ROW = "SELECT step_key, fingerprint, count, example, feedback, feedback_source, seq FROM wrong_answers"
+
+
+def step_key(valid_answers: Sequence[str]) -> str:
+    return hashlib.sha256("\n".join(valid_answers).encode("utf-8")).hexdigest()[:16]
+
+
+class WrongAnswerIndex:
+    """(step, fingerprint) -> {"count", "example", "feedback", "source"} of wrong answers students gave"""
+
+    def __init__(self, path, check_seconds=WRONG_ANSWERS_CHECK_SECONDS):
+        self.path = path
+        self.check_seconds = check_seconds
+        self._entries = {}
+        self._seq = 0
+        self._checked_at = None
+        self._lock = threading.Lock()
+        self._initialized = False
+
+    def _connect(self):
+        # One short-lived connection per operation: safe across Streamlit threads and processes
+        if not self._initialized:
+            with self._lock:
+                if not self._initialized:
+                    os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                    with closing(sqlite3.connect(self.path, timeout=30)) as db, db:
+                        db.execute("PRAGMA journal_mode=WAL")
+                        db.executescript(_SCHEMA)
+                    self._initialized = True
+        return sqlite3.connect(self.path, timeout=30)
+
+    def _apply(self, rows, refreshed=False):
+        """Take rows into memory; only a refresh, which read every row changed since the last one, moves _seq"""
+        with self._lock:
+            for key, fingerprint, count, example, feedback, source, seq in rows:
+                entry = self._entries.get((key, fingerprint))
+                # A refresh that read a row before record() changed it must not roll the row back
+                if entry is None or entry["seq"] < seq:
+                    self._entries[(key, fingerprint)] = {
+                        "count": count, "example": example, "feedback": feedback, "source": source, "seq": seq,
+                    }
+                if refreshed:
+                    self._seq = max(self._seq, seq)
+
+    def _refresh(self):
+        now = time.monotonic()
+        with self._lock:
+            if self._checked_at is not None and now - self._checked_at < self.check_seconds:
+                return
+            self._checked_at = now
+            seq = self._seq
+        try:
+            with closing(self._connect()) as db:
+                rows = db.execute(f"{_ROW} WHERE seq > ? ORDER BY seq", (seq,)).fetchall()
+        except sqlite3.Error as e:
+            print(f"⚠️ Could not read wrong answers from {self.path}: {e}")
+            return
+        self._apply(rows, refreshed=True)
+
+    def lookup(self, valid_answers: Sequence[str], fingerprint: str) -> Optional[Dict]:
+        """The step's entry for this wrong answer, or None if no student has given it"""
+        self._refresh()
+        with self._lock:
+            entry = self._entries.get((step_key(valid_answers), fingerprint))
+        if entry is None:
+            return None
+        return {name: value for name, value in entry.items() if name != "seq"}
+
+    def record(self, valid_answers: Sequence[str], fingerprint: str, student_input: str,
+               question: Optional[str] = None, step: Optional[str] = None) -> Optional[Dict]:
+        """Count one student giving this wrong answer; returns its entry, as lookup()"""
+        key = step_key(valid_answers)
+        try:
+            with closing(self._connect()) as db, db:
+                db.execute(
+                    "INSERT INTO wrong_answers (step_key, fingerprint, count, example, question, step, seq) "
+                    f"VALUES (?, ?, 1, ?, ?, ?, {_NEXT_SEQ}) "
+                    "ON CONFLICT (step_key, fingerprint) DO UPDATE SET count = count + 1, seq = excluded.seq",
+                    (key, fingerprint, student_input, question, step),
+                )
+                rows = db.execute(f"{_ROW} WHERE step_key = ? AND fingerprint = ?", (key, fingerprint)).fetchall()
+        except sqlite3.Error as e:
+            print(f"⚠️ Could not record a wrong answer in {self.path}: {e}")
+            return self.lookup(valid_answers, fingerprint)
+        self._apply(rows)
+        return self.lookup(valid_answers, fingerprint)
+
+    def set_feedback(self, key: str, fingerprint: str, feedback: str, source: str, example: Optional[str] = None,
+                     question: Optional[str] = None, step: Optional[str] = None) -> bool:
+        """Attach feedback to a step's wrong answer, adding it if no student has given it yet
+
+        Authored feedback is never replaced by model feedback. Returns whether it was stored.
+        """
+        with closing(self._connect()) as db, db:
+            stored = db.execute(
+                "INSERT INTO wrong_answers "
+                "(step_key, fingerprint, count, example, question, step, feedback, feedback_source, seq) "
+                f"VALUES (?, ?, 0, ?, ?, ?, ?, ?, {_NEXT_SEQ}) "
+                "ON CONFLICT (step_key, fingerprint) DO UPDATE SET feedback = excluded.feedback, "
+                "feedback_source = excluded.feedback_source, seq = excluded.seq "
+                f"WHERE feedback_source IS NOT '{AUTHORED}' OR excluded.feedback_source = '{AUTHORED}'",
+                (key, fingerprint, example or fingerprint, question, step, feedback, source),
+            ).rowcount
+        return bool(stored)
+
+    def most_common(self, min_count: int = 2, limit: int = 100) -> List[Dict]:
+        """The most given wrong answers that have no feedback yet, with their question and step"""
+        with closing(self._connect()) as db:
+            rows = db.execute(
+                "SELECT step_key, fingerprint, count, example, question, step FROM wrong_answers "
+                "WHERE feedback IS NULL AND count >= ? AND question IS NOT NULL ORDER BY count DESC LIMIT ?",
+                (min_count, limit),
+            ).fetchall()
+        return [dict(zip(("step_key", "fingerprint", "count", "example", "question", "step"), row)) for row in rows]
+
+    def stats(self):
+        with closing(self._connect()) as db:
+            rows, attempts, with_feedback = db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(count), 0), COUNT(feedback) FROM wrong_answers"
+            ).fetchone()
+        with self._lock:
+            cached = len(self._entries)
+        return {"wrong_answers": rows, "attempts": attempts, "with_feedback": with_feedback, "cached": cached}
+
+
+# Shared by every session in this process; the SQLite file is shared across processes
+WRONG_ANSWERS = WrongAnswerIndex(WRONG_ANSWERS_PATH)
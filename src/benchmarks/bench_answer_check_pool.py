@@ -0,0 +1,102 @@
+# benchmarks/bench_answer_check_pool.py
+"""Step answer check latency for well-behaved sessions next to an abusive one.
+
+--sessions threads check the corpus of bench_answer_checker (split between
+them, every input distinct) through an AnswerCheckPool, in-process
+(ANSWER_CHECK_WORKERS=0) or in worker processes. With abuse on, one more
+thread keeps submitting "k^9^7" with a new k each time until the sessions
+finish: sympy evaluates the integer power, which takes seconds and holds
+the GIL throughout. Parse caches (and sympy's) start cold and answer keys
+warm, as after prefetching.
+Run from src/:  python -m benchmarks.bench_answer_check_pool
+"""
+import argparse
+import contextlib
+import io
+import statistics
+import threading
+import time
+
+import sympy
+
+from backend import answer_checker
+from backend.answer_check_pool import AnswerCheckPool
+from backend.answer_checker import AnswerCheckError
+from benchmarks.bench_answer_checker import build_corpus
+from utils.question_loader import QuestionLoader
+
+
+def session(pool, checks, latencies, wrong):
+    for valid_answers, given, verdict in checks:
+        start = time.perf_counter()
+        if pool.check(given, valid_answers) != verdict:
+            wrong.append(given)
+        latencies.append(time.perf_counter() - start)
+
+
+def abuse(pool, stop, outcomes):
+    k = 8
+    while not stop.is_set():
+        k += 1
+        start = time.perf_counter()
+        try:
+            pool.check(f"{k}^9^7", ["4x^3 - 64x"])
+            outcome = "graded"
+        except AnswerCheckError:
+            outcome = "refused"
+        outcomes.append((outcome, time.perf_counter() - start))
+
+
+def run(corpus, workers, sessions, abusive):
+    answer_checker.parse_student_input.cache_clear()
+    answer_checker.compile_numeric.cache_clear()
+    sympy.core.cache.clear_cache()
+    pool = AnswerCheckPool(workers=workers)
+    for valid_answers, _, _ in corpus:
+        pool.warm([{"valid_answers": valid_answers}])
+    latencies, wrong, outcomes, stop = [], [], [], threading.Event()
+    abuser = threading.Thread(target=abuse, args=(pool, stop, outcomes))
+    threads = [threading.Thread(target=session, args=(pool, corpus[index::sessions], latencies, wrong))
+               for index in range(sessions)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    if abusive:
+        abuser.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    stop.set()
+    if abusive:
+        abuser.join()
+    latencies.sort()
+    return (len(latencies) / elapsed, statistics.median(latencies) * 1000,
+            latencies[int(len(latencies) * 0.99)] * 1000, latencies[-1] * 1000, len(wrong), outcomes, pool.stats())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--instances", type=int, default=200, help="template instances and generator variants per question")
+    parser.add_argument("--sessions", type=int, default=4)
+    parser.add_argument("--workers", type=int, default=2)
+    args = parser.parse_args()
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        corpus = build_corpus(QuestionLoader("missing.json"), args.instances)
+
+    print(f"{len(corpus)} checks from {args.sessions} sessions")
+    print(f"{'checker':11} | {'abuse':5} | {'checks/s':>8} | {'p50 ms':>7} | {'p99 ms':>7} | {'max ms':>7} | {'wrong':>5} | abusive answers")
+    for name, workers in (("in-process", 0), (f"{args.workers} workers", args.workers)):
+        for abusive in (False, True):
+            rate, p50, p99, slowest, wrong, outcomes, stats = run(corpus, workers, args.sessions, abusive)
+            abused = ""
+            if outcomes:
+                abused = (f"{len(outcomes)} submitted, {sum(o == 'refused' for o, _ in outcomes)} refused, "
+                          f"max {max(seconds for _, seconds in outcomes):.2f} s")
+            print(f"{name:11} | {'on' if abusive else 'off':5} | {rate:8.0f} | {p50:7.3f} | {p99:7.1f} | {slowest:7.0f} | "
+                  f"{wrong:5} | {abused}")
+    print(f"last pool: {stats}")
+
+
+if __name__ == "__main__":
+    main()
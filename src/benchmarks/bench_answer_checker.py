@@ -0,0 +1,110 @@
+# benchmarks/bench_answer_checker.py
+"""Step answer checks per second: symbolic-only vs. numeric-first equivalence.
+
+Answer keys come from the question bank: its questions' steps plus
+--instances template instances and local generator variants of each. Each
+step is checked against the student answers a grader sees: the key
+itself, equivalent rewrites (factored, Horner and unreduced-fraction
+expressions, reordered sets and statements) and wrong answers (shifted,
+scaled or differentiated expressions, a changed point, a flipped
+classification), each distinct pair once. Answer keys are
+parsed up front, as the prefetcher does; student inputs are parsed in
+both runs.
+Run from src/:  python -m benchmarks.bench_answer_checker
+"""
+import argparse
+import contextlib
+import io
+import statistics
+import time
+
+import sympy
+
+from backend import answer_checker
+from backend.answer_checker import CLASSIFICATION, EXPRESSION, SOLUTION_SET, answer_key, check_answer
+from backend.variant_generators import generate_variant, has_generator
+from utils.question_loader import QuestionLoader
+
+
+def _text(expr):
+    return str(expr).replace("**", "^")
+
+
+def student_answers(valid_answers):
+    """[(input, expected verdict)] for one step"""
+    kind, expected = answer_key(tuple(valid_answers))[0]
+    answers = [("; ".join(valid_answers) if kind == CLASSIFICATION else valid_answers[0], True)]
+    if kind == EXPRESSION:
+        x = sorted(expected.free_symbols, key=str)[0] if expected.free_symbols else sympy.Integer(1)
+        answers += [(_text(form), True) for form in (
+            sympy.factor(expected), sympy.horner(expected), sympy.expand(expected * (x + 1)) / (x + 1),
+        )]
+        answers += [(_text(form), False) for form in (
+            sympy.factor(expected + x), sympy.expand(expected + 1), sympy.diff(expected, x), 2 * expected,
+        )]
+    elif kind == SOLUTION_SET:
+        answers += [(", ".join(_text(value) for value in reversed(expected)), True),
+                    (", ".join(_text(value) for value in expected[:-1] + (expected[-1] + 1,)), False)]
+    elif kind == CLASSIFICATION:
+        statements = [f"x = {_text(point)} is {label}" for point, label in expected]
+        flipped = "local maximum" if expected[0][1] != "local maximum" else "local minimum"
+        answers += [("; ".join(reversed(statements)), True),
+                    ("; ".join([f"x = {_text(expected[0][0])} is {flipped}"] + statements[1:]), False)]
+    return answers
+
+
+def build_corpus(loader, instances):
+    steps = []
+    for section in ("1.1",):
+        for question in loader.load_section_questions(1, section):
+            variants = [question]
+            variants += [loader.generate_question(question, seed) for seed in range(instances)
+                         if loader.get_question_generator(question)]
+            variants += [generate_variant(question, seed) for seed in range(instances)
+                         if has_generator(question.get("type"))]
+            steps += [step["valid_answers"] for variant in variants for step in variant["steps"]
+                      if step.get("valid_answers")]
+    # Distinct (key, input) pairs only: a repeated input would be served from the parse cache
+    corpus = {(tuple(valid_answers), given): verdict
+              for valid_answers in steps for given, verdict in student_answers(valid_answers)}
+    return [(list(valid_answers), given, verdict) for (valid_answers, given), verdict in corpus.items()]
+
+
+def run(corpus, numeric, repeat):
+    latencies, wrong, elapsed = [], 0, 0.0
+    for _ in range(repeat):
+        # Each repetition starts with no student input parsed or compiled
+        answer_checker.parse_student_input.cache_clear()
+        answer_checker.compile_numeric.cache_clear()
+        start = time.perf_counter()
+        for valid_answers, given, verdict in corpus:
+            check_start = time.perf_counter()
+            if check_answer(given, valid_answers, numeric=numeric) != verdict:
+                wrong += 1
+            latencies.append(time.perf_counter() - check_start)
+        elapsed += time.perf_counter() - start
+    latencies.sort()
+    return len(latencies) / elapsed, statistics.median(latencies) * 1000, latencies[int(len(latencies) * 0.99)] * 1000, wrong
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--instances", type=int, default=200, help="template instances and generator variants per question")
+    parser.add_argument("--repeat", type=int, default=5, help="passes over the corpus, each with cold input caches")
+    args = parser.parse_args()
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        loader = QuestionLoader("missing.json")
+        corpus = build_corpus(loader, args.instances)
+    for valid_answers, _, _ in corpus:
+        answer_key(tuple(valid_answers))
+
+    print(f"{len(corpus)} checks over {len({tuple(v) for v, _, _ in corpus})} distinct answer keys")
+    print(f"{'strategy':14} | {'checks/s':>9} | {'p50 ms':>7} | {'p99 ms':>7} | wrong verdicts")
+    for name, numeric in (("symbolic only", False), ("numeric first", True)):
+        rate, p50, p99, wrong = run(corpus, numeric, args.repeat)
+        print(f"{name:14} | {rate:9.0f} | {p50:7.3f} | {p99:7.3f} | {wrong}")
+
+
+if __name__ == "__main__":
+    main()
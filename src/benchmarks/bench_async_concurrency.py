@@ -0,0 +1,59 @@
+# benchmarks/bench_async_concurrency.py
+"""Throughput of the async assistant APIs versus concurrency, against the mock endpoint.
+
+Run from src/:  python -m benchmarks.bench_async_concurrency --latency 0.2 --requests 256
+"""
+import argparse
+import asyncio
+import time
+
+from benchmarks.mock_openai import MockOpenAIServer, build_mock_assistant
+
+QUESTION = "Find the critical points of f(x) = x^4 - 32x^2."
+
+
+async def run_level(assistant, concurrency, total, offset):
+    # Unique queries so the embedding/retrieval caches don't hide the network cost
+    requests = [
+        (f"Question: {QUESTION}\nStudent input: attempt {offset + i}\nHelp mode: Application Help", "Application Help")
+        for i in range(total)
+    ]
+    start = time.perf_counter()
+    results = await assistant.abatch_get_answer(requests, max_concurrency=concurrency)
+    elapsed = time.perf_counter() - start
+    failures = sum(1 for result in results if result is None)
+    return elapsed, failures
+
+
+async def run_similar(assistant, concurrency, total):
+    questions = [(QUESTION, "critical_points")] * total
+    start = time.perf_counter()
+    await assistant.abatch_generate_similar_questions(questions, max_concurrency=concurrency)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--latency", type=float, default=0.2, help="mock seconds per upstream call")
+    parser.add_argument("--requests", type=int, default=256)
+    parser.add_argument("--levels", default="1,4,16,64,256")
+    args = parser.parse_args()
+    levels = [int(level) for level in args.levels.split(",")]
+
+    with MockOpenAIServer(latency=args.latency) as server:
+        server.install_env()
+        assistant = build_mock_assistant()
+
+        print(f"mock latency {args.latency * 1000:.0f} ms/call, {args.requests} requests per level")
+        print(f"{'concurrency':>11} | {'get_answer req/s':>16} | {'similar req/s':>13} | failures")
+        offset = 0
+        for level in levels:
+            total = args.requests if level > 1 else min(args.requests, 16)
+            elapsed, failures = asyncio.run(run_level(assistant, level, total, offset))
+            offset += total
+            similar_elapsed = asyncio.run(run_similar(assistant, level, total))
+            print(f"{level:>11} | {total / elapsed:>16.1f} | {total / similar_elapsed:>13.1f} | {failures}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+# benchmarks/bench_conversation_memory.py
+"""Prompt size and latency over a 30-turn chat: full-history concatenation vs ConversationMemory.
+
+The mock endpoint charges a per-prompt-token prefill delay, so latency tracks prompt size.
+Run from src/:  python -m benchmarks.bench_conversation_memory --turns 30
+"""
+import argparse
+import time
+
+from backend.conversation_memory import ConversationMemory, count_tokens
+from benchmarks.mock_openai import MockOpenAIServer, build_mock_assistant
+
+QUESTION = "Find the critical points of f(x) = x^4 - 32x^2."
+USER_TURN = "I think the derivative is 4x^3 - 64x but I am not sure what to do after setting it equal to zero, turn {turn}?"
+ASSISTANT_TURN = ("Good start. When you set 4x^3 - 64x = 0, look for a common factor you can pull out of both terms. "
+                  "Factoring lets you use the zero product property, so each factor gives you a candidate x value. "
+                  "Be careful not to divide both sides by x, because that would lose one of the solutions. ") * 3
+
+
+def build_query(question, conversation):
+    return f"""
+            The user is asking a question or making a statement in the context of the original math problem and the ongoing conversation.
+            Original Math Question: {question}
+            Current Help Mode: Application Help
+            
+            Conversation Context (most recent at bottom):
+            {conversation}
+            """
+
+
+def naive_context(chat_history):
+    return "".join(f"{msg['role'].capitalize()}: {msg['content']}\n" for msg in chat_history)
+
+
+def run(assistant, turns, use_memory):
+    memory = ConversationMemory()
+    chat_history = [{"role": "assistant", "content": ASSISTANT_TURN}]
+    sizes, latencies, pending = [], [], None
+    for turn in range(turns):
+        chat_history.append({"role": "user", "content": USER_TURN.format(turn=turn)})
+        start = time.perf_counter()
+        context = memory.build_context(chat_history) if use_memory else naive_context(chat_history)
+        query = build_query(QUESTION, context)
+        assistant.get_answer(query, "Application Help", chapter=4, section="4.1")
+        latencies.append((time.perf_counter() - start) * 1000)
+        sizes.append(count_tokens(query))
+        chat_history.append({"role": "assistant", "content": ASSISTANT_TURN})
+        if use_memory:
+            pending = memory.refresh_in_background(chat_history, assistant.summarize_conversation) or pending
+    if pending:
+        pending.result()
+    return sizes, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--turns", type=int, default=30)
+    parser.add_argument("--latency", type=float, default=0.05, help="mock base latency (s)")
+    parser.add_argument("--token-latency", type=float, default=0.0002, help="mock prefill seconds per prompt token")
+    args = parser.parse_args()
+
+    with MockOpenAIServer(latency=args.latency, prompt_token_latency=args.token_latency) as server:
+        server.install_env()
+        assistant = build_mock_assistant()
+        naive_sizes, naive_latencies = run(assistant, args.turns, use_memory=False)
+        memory_sizes, memory_latencies = run(assistant, args.turns, use_memory=True)
+
+    print(f"{'turn':>4} | {'naive tokens':>12} | {'memory tokens':>13} | {'naive ms':>8} | {'memory ms':>9}")
+    for turn in range(0, args.turns, max(1, args.turns // 10)):
+        print(f"{turn + 1:>4} | {naive_sizes[turn]:>12} | {memory_sizes[turn]:>13} | "
+              f"{naive_latencies[turn]:>8.0f} | {memory_latencies[turn]:>9.0f}")
+    print(f"total prompt tokens: naive {sum(naive_sizes)}, memory {sum(memory_sizes)}")
+    print(f"mean latency: naive {sum(naive_latencies) / args.turns:.0f} ms, memory {sum(memory_latencies) / args.turns:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+# benchmarks/bench_llm_governor.py
+"""Admission control under a bulk backlog, and rate limits shared between worker processes.
+
+Part 1: a batch job queues --bulk calls at BULK priority, then --students
+interactive calls arrive; reports how long each class waited for a slot.
+Part 2: --workers processes share one state file and each tries to make
+--calls-per-worker calls; the aggregate rate stays at --rpm.
+Model calls are simulated with sleep(--service) so only the governor is measured.
+Run from src/:  python -m benchmarks.bench_llm_governor
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from backend.llm_governor import FileTokenBucket, LLMGovernor, Priority
+
+
+def make_governor(state_path, rpm, tpm, max_in_flight, max_queue=1000):
+    return LLMGovernor(FileTokenBucket(state_path, rpm, tpm), max_in_flight=max_in_flight, max_queue=max_queue)
+
+
+def priority_run(governor, bulk, students, service):
+    waits = {Priority.BULK: [], Priority.INTERACTIVE: []}
+    lock = threading.Lock()
+
+    def call(priority):
+        queued = time.monotonic()
+        with governor.slot(priority, tokens=800):
+            with lock:
+                waits[priority].append(time.monotonic() - queued)
+            time.sleep(service)
+
+    threads = [threading.Thread(target=call, args=(Priority.BULK,)) for _ in range(bulk)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.2)  # let the backlog build up before students arrive
+    estimate = governor.estimate_wait(Priority.INTERACTIVE)
+    students_threads = [threading.Thread(target=call, args=(Priority.INTERACTIVE,)) for _ in range(students)]
+    for thread in students_threads:
+        thread.start()
+    for thread in threads + students_threads:
+        thread.join()
+    return waits, estimate
+
+
+def worker(state_path, rpm, calls):
+    governor = make_governor(state_path, rpm, 10_000_000, max_in_flight=8)
+    start = time.monotonic()
+    for _ in range(calls):
+        with governor.slot(Priority.BULK, tokens=100):
+            pass
+    return time.monotonic() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--bulk", type=int, default=200)
+    parser.add_argument("--students", type=int, default=20)
+    parser.add_argument("--service", type=float, default=0.1, help="simulated seconds per model call")
+    parser.add_argument("--max-in-flight", type=int, default=8)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--calls-per-worker", type=int, default=60)
+    parser.add_argument("--rpm", type=int, default=1200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        governor = make_governor(os.path.join(tmp, "priority.json"), 100_000, 100_000_000, args.max_in_flight)
+        waits, estimate = priority_run(governor, args.bulk, args.students, args.service)
+        print(f"{args.bulk} bulk calls queued, then {args.students} interactive calls "
+              f"({args.max_in_flight} slots, {args.service * 1000:.0f} ms per call)")
+        print(f"estimated interactive wait shown to the UI: {estimate:.2f}s")
+        print(f"{'priority':>12} | {'calls':>5} | {'p50 wait s':>10} | {'max wait s':>10}")
+        for priority, values in waits.items():
+            print(f"{priority.name:>12} | {len(values):>5} | {statistics.median(values):>10.2f} | {max(values):>10.2f}")
+
+        state_path = os.path.join(tmp, "shared.json")
+        # Start from an empty bucket so the measurement reflects the refill rate, not the burst allowance
+        bucket = FileTokenBucket(state_path, args.rpm, 10_000_000)
+        with bucket._locked_state() as state:
+            state["requests"] = 0.0
+        start = time.monotonic()
+        with ProcessPoolExecutor(max_workers=args.workers) as pool:
+            futures = [pool.submit(worker, state_path, args.rpm, args.calls_per_worker) for _ in range(args.workers)]
+            for future in futures:
+                future.result()
+        elapsed = time.monotonic() - start
+        total = args.workers * args.calls_per_worker
+        print(f"\n{args.workers} processes sharing a {args.rpm} requests/min bucket: "
+              f"{total} calls in {elapsed:.2f}s = {total / elapsed * 60:.0f} requests/min")
+
+
+if __name__ == "__main__":
+    main()
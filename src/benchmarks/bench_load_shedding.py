@@ -0,0 +1,135 @@
+# benchmarks/bench_load_shedding.py
+"""Latency per request class under a simulated overload, with and without load shedding.
+
+--requests arrive at --rate per second against a mock model that can serve
+only --slots concurrent calls of --latency seconds each. The mix is opening
+messages (precomputed answers exist), chat turns (the question's step hints
+exist) and step questions (interactive, never shed). After the burst, one
+more chat turn checks that normal service resumed on its own.
+Run from src/:  python -m benchmarks.bench_load_shedding
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import threading
+import time
+
+from backend.assistant_request import AssistantRequest
+from backend.llm_governor import GOVERNOR
+from backend.load_shedding import LOAD_SHEDDING
+from backend.precomputed_answers import PRECOMPUTED_ANSWERS
+from backend.resilience import ANSWER_CACHE
+from benchmarks.mock_openai import MockOpenAIServer, build_mock_assistant
+
+HINTS = ("Use the power rule.", "Factor the equation.", "Use the second derivative test or analyze the graph.")
+
+
+def make_request(index):
+    question = f"Find the critical points of f(x) = x^4 - {index // 5 % 5 + 2}x^2."
+    kind = ("opening", "opening", "chat", "chat", "step")[index % 5]
+    if kind == "opening":
+        return kind, AssistantRequest(question=question, help_mode="Conceptual Help", hints=HINTS)
+    if kind == "chat":
+        return kind, AssistantRequest(question=question, help_mode="Conceptual Help", hints=HINTS,
+                                      student_input=f"I got {index} for the derivative, is that right?",
+                                      history="User: I am stuck on this problem.")
+    return kind, AssistantRequest(question=question, help_mode="Conceptual Help", hints=HINTS[:1],
+                                  step="Find the derivative of f(x).", student_input=f"Do I use rule {index}?")
+
+
+def precompute(assistant):
+    """Opening answers for the five questions, as precompute_openings.py would write them"""
+    answers = {}
+    for index in range(5):
+        _, request = make_request(index * 5)
+        result = assistant.get_answer(request, request.help_mode, chapter=4, section="4.1")
+        key = assistant.request_key(request.retrieval_query(), request.prompt(), 4, "4.1")
+        answers[key] = {"answer": result["answer"], "sources": result["sources"]}
+    PRECOMPUTED_ANSWERS.save(answers)
+    ANSWER_CACHE.clear()
+
+
+def burst(assistant, requests, rate):
+    outcomes = []
+    lock = threading.Lock()
+
+    def student(index):
+        kind, request = make_request(index)
+        start = time.perf_counter()
+        result = assistant.get_answer(request, request.help_mode, chapter=4, section="4.1")
+        elapsed = time.perf_counter() - start
+        with lock:
+            outcomes.append((kind, elapsed, (result or {}).get("degraded", "model")))
+
+    threads = []
+    for index in range(requests):
+        thread = threading.Thread(target=student, args=(index,))
+        thread.start()
+        threads.append(thread)
+        time.sleep(1.0 / rate)
+    for thread in threads:
+        thread.join()
+    return outcomes
+
+
+def report(outcomes):
+    print(f"{'class':>8} | {'n':>3} | {'p50 s':>6} | {'p95 s':>6} | {'max s':>6} | served by")
+    for kind in ("opening", "chat", "step"):
+        rows = [row for row in outcomes if row[0] == kind]
+        latencies = sorted(elapsed for _, elapsed, _ in rows)
+        served = {}
+        for _, _, source in rows:
+            served[source] = served.get(source, 0) + 1
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        print(f"{kind:>8} | {len(rows):>3} | {statistics.median(latencies):>6.2f} | {p95:>6.2f} | "
+              f"{latencies[-1]:>6.2f} | {', '.join(f'{k}={v}' for k, v in sorted(served.items()))}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--rate", type=float, default=20.0, help="arrivals per second")
+    parser.add_argument("--slots", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.5)
+    args = parser.parse_args()
+
+    GOVERNOR.max_in_flight = args.slots
+    GOVERNOR.wait_latency.max_age = 5.0
+    LOAD_SHEDDING.queue_high, LOAD_SHEDDING.queue_low = 2 * args.slots, args.slots // 2
+    LOAD_SHEDDING.wait_high, LOAD_SHEDDING.wait_low = 4 * args.latency, args.latency
+    LOAD_SHEDDING.min_shed_seconds = 1.0
+
+    with tempfile.TemporaryDirectory() as tmp, MockOpenAIServer(latency=args.latency) as server:
+        server.install_env()
+        PRECOMPUTED_ANSWERS.path = os.path.join(tmp, "precomputed_answers.json")
+        assistant = build_mock_assistant()
+        assistant.coalesce_requests = False  # every student's request is distinct traffic here
+        assistant.hedge_requests = False
+        queue_high = LOAD_SHEDDING.queue_high
+        LOAD_SHEDDING.queue_high = 10 ** 9
+        precompute(assistant)
+
+        print(f"{args.requests} requests at {args.rate:.0f}/s, {args.slots} model slots x {args.latency * 1000:.0f} ms "
+              f"(capacity {args.slots / args.latency:.0f}/s)")
+        for shedding in (False, True):
+            LOAD_SHEDDING.queue_high = queue_high if shedding else 10 ** 9
+            LOAD_SHEDDING.wait_high = 4 * args.latency if shedding else float("inf")
+            LOAD_SHEDDING.latency_high = 15.0 if shedding else float("inf")
+            ANSWER_CACHE.clear()
+            time.sleep(GOVERNOR.wait_latency.max_age)  # let the previous run's samples expire
+            server.reset_counts()
+            print(f"\nshedding {'on' if shedding else 'off'}:")
+            report(burst(assistant, args.requests, args.rate))
+            print(f"model calls: {server.request_counts.get('/v1/chat/completions', 0)}, "
+                  f"policy: {LOAD_SHEDDING.stats()}")
+
+        time.sleep(GOVERNOR.wait_latency.max_age + LOAD_SHEDDING.min_shed_seconds)
+        kind, request = make_request(2)
+        result = assistant.get_answer(request, request.help_mode, chapter=4, section="4.1")
+        print(f"\nafter the burst: {kind} turn served by {result.get('degraded', 'model')}, "
+              f"shedding={LOAD_SHEDDING.stats()['shedding']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+# benchmarks/bench_prefetch.py
+"""Page transition latency with and without background prefetching.
+
+Each simulated student opens a chapter, then one of its sections, then one
+of that section's questions in Conceptual Help, on a fresh QuestionLoader
+over the synthetic bank of bench_question_bank (JSON files, or the SQLite
+store). The time a page spends loading is measured from the click. With
+prefetching, the student reads each page until the prefetcher is idle
+before clicking, and opens one of the questions at the top of the list.
+The first help message comes from the mock model (--latency) when there is
+no precomputed answer, and from precomputed_answers.json when there is.
+Run from src/:  python -m benchmarks.bench_prefetch
+"""
+import argparse
+import contextlib
+import io
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from backend.assistant_request import OPENING_HELP_MODES, AssistantRequest
+from backend.precomputed_answers import PRECOMPUTED_ANSWERS
+from backend.prefetch import PREFETCH_QUESTIONS_PER_PAGE, PREFETCHER, prefetch_chapter, prefetch_questions
+from benchmarks.bench_question_bank import write_synthetic_bank
+from benchmarks.mock_openai import MockOpenAIServer, build_mock_assistant
+from utils.question_bank import compile_question_bank
+from utils.question_loader import QuestionLoader
+from utils.question_store import write_question_store
+
+
+def write_openings(assistant, bank):
+    answers = {}
+    for question in bank["questions"].values():
+        for help_mode in OPENING_HELP_MODES:
+            request = AssistantRequest(question=question["text"], help_mode=help_mode)
+            key = assistant.request_key(request.retrieval_query(), request.prompt(), question["chapter"],
+                                        question["section"])
+            answers[key] = {"answer": "Start by finding where f'(x) = 0.", "sources": ["4.1.1.pdf"]}
+    PRECOMPUTED_ANSWERS.save(answers)
+
+
+def visit(loader, assistant, chapter, sections, rng, prefetch):
+    """(section page ms, question page ms, first help message ms) for one student"""
+    if prefetch:
+        prefetch_chapter(loader, chapter, sections)
+        PREFETCHER.join()
+    section = rng.choice(sections)
+
+    start = time.perf_counter()
+    questions = loader.load_section_questions(chapter, section)
+    [question["text"] for question in questions]
+    section_ms = (time.perf_counter() - start) * 1000
+    if prefetch:
+        prefetch_questions(loader, assistant, chapter, section, [question["id"] for question in questions])
+        PREFETCHER.join()
+    # Students open questions near the top of the list, which is what the page prefetches
+    question_id = rng.choice(questions[:PREFETCH_QUESTIONS_PER_PAGE])["id"]
+
+    # The question page shows the record and its related questions; the help page adds the step hints
+    start = time.perf_counter()
+    question = loader.get_question_by_id(question_id)
+    loader.get_related_questions(question)
+    question_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    hints = tuple(step["hint"] for step in question.get("steps", []) if step.get("hint"))
+    request = AssistantRequest(question=question["text"], help_mode="Conceptual Help", hints=hints)
+    assert assistant.get_answer(request, request.help_mode, chapter=chapter, section=section) is not None
+    return section_ms, question_ms, (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--chapters", type=int, default=5)
+    parser.add_argument("--sections", type=int, default=20)
+    parser.add_argument("--per-section", type=int, default=500)
+    parser.add_argument("--students", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=1.0, help="seconds per mock model call")
+    args = parser.parse_args()
+
+    PREFETCHER.ttl_seconds = 0  # every run starts from a fresh loader
+    with tempfile.TemporaryDirectory() as tmp, MockOpenAIServer(latency=args.latency) as server, \
+            contextlib.redirect_stdout(io.StringIO()) as debug:
+        server.install_env()
+        questions_dir = os.path.join(tmp, "questions")
+        os.makedirs(questions_dir)
+        write_synthetic_bank(questions_dir, args.chapters, args.sections, args.per_section)
+        bank = compile_question_bank(questions_dir)
+        store_path = os.path.join(tmp, "bank.sqlite3")
+        write_question_store(bank, store_path)
+        assistant = build_mock_assistant()
+        assistant.coalesce_requests = False
+        openings_path = os.path.join(tmp, "precomputed_answers.json")
+        PRECOMPUTED_ANSWERS.path = openings_path
+        write_openings(assistant, bank)
+
+        PRECOMPUTED_ANSWERS.check_seconds = 0
+        rows = []
+        # Without prefetching there are no precomputed answers either, so those runs go first
+        for prefetch in (False, True):
+            PRECOMPUTED_ANSWERS.path = openings_path if prefetch else os.path.join(tmp, "missing.json")
+            for storage, bank_path in (("json", os.path.join(tmp, "missing.json")), ("store", store_path)):
+                loader = QuestionLoader(bank_path, questions_dir)
+                rng = random.Random(0)
+                samples = []
+                for _ in range(args.students):
+                    chapter = rng.randint(1, args.chapters)
+                    sections = [f"{chapter}.{section}" for section in range(1, args.sections + 1)]
+                    samples.append(visit(loader, assistant, chapter, sections, rng, prefetch))
+                rows.append((storage, prefetch, samples, PREFETCHER.stats()))
+
+    debug.close()
+    print(f"{args.students} students; {args.chapters * args.sections * args.per_section:,} questions; "
+          f"model opening latency {args.latency * 1000:.0f} ms")
+    print(f"{'storage':8} | {'prefetch':8} | {'section page ms':>15} | {'question page ms':>16} | "
+          f"{'first message ms':>16}")
+    for storage, prefetch, samples, _ in rows:
+        section_ms, question_ms, message_ms = (statistics.median(column) for column in zip(*samples))
+        print(f"{storage:8} | {'on' if prefetch else 'off':8} | {section_ms:15.2f} | {question_ms:16.3f} | "
+              f"{message_ms:16.2f}")
+    print(f"prefetcher: {rows[-1][3]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+# benchmarks/bench_question_bank.py
+"""Question lookups on a synthetic bank: per-file JSON scans vs. the compiled bank.
+
+Writes --chapters x --sections x --per-section copies of the bank's first
+question (50,000 by default) as section files, compiles them, and times
+what the pages do on every rerun: look a question up by ID and fetch a
+section's generic hints. "cold" is a fresh loader (a new session).
+Run from src/:  python -m benchmarks.bench_question_bank
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from utils.question_bank import compile_question_bank, write_question_bank
+from utils.question_loader import QuestionLoader
+
+SAMPLE_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "questions", "chapter1_section1.1.json")
+
+
+def write_synthetic_bank(questions_dir, chapters, sections, per_section):
+    with open(SAMPLE_PATH, "r") as f:
+        sample = json.load(f)["questions"][0]
+    for chapter in range(1, chapters + 1):
+        for section in range(1, sections + 1):
+            name = f"{chapter}.{section}"
+            questions = [
+                dict(sample, id=f"{name}.{number}", text=sample["text"].replace("32", str(number)))
+                for number in range(1, per_section + 1)
+            ]
+            with open(os.path.join(questions_dir, f"chapter{chapter}_section{name}.json"), "w") as f:
+                json.dump({"section_name": name, "questions": questions}, f)
+
+
+def scan_lookup(loader, question_id):
+    """What the pages did before: load the section, then scan it"""
+    chapter, section = question_id.split(".")[0], question_id.rsplit(".", 1)[0]
+    questions = loader.load_section_questions(int(chapter), section)
+    return next((q for q in questions if q["id"] == question_id), None)
+
+
+def timed(fn, ids):
+    latencies = []
+    for question_id in ids:
+        start = time.perf_counter()
+        assert fn(question_id) is not None
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    return statistics.median(latencies) * 1e6, latencies[int(len(latencies) * 0.99)] * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--chapters", type=int, default=5)
+    parser.add_argument("--sections", type=int, default=20)
+    parser.add_argument("--per-section", type=int, default=500)
+    parser.add_argument("--lookups", type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp, contextlib.redirect_stdout(io.StringIO()) as debug:
+        questions_dir = os.path.join(tmp, "questions")
+        os.makedirs(questions_dir)
+        write_synthetic_bank(questions_dir, args.chapters, args.sections, args.per_section)
+        total = args.chapters * args.sections * args.per_section
+        rng = random.Random(0)
+        ids = [f"{rng.randint(1, args.chapters)}.{rng.randint(1, args.sections)}.{rng.randint(1, args.per_section)}"
+               for _ in range(args.lookups)]
+        bank_path = os.path.join(tmp, "question_bank.json")
+
+        start = time.perf_counter()
+        write_question_bank(compile_question_bank(questions_dir), bank_path)
+        compile_seconds = time.perf_counter() - start
+
+        def loader(with_bank):
+            return QuestionLoader(bank_path if with_bank else os.path.join(tmp, "missing.json"), questions_dir)
+
+        start = time.perf_counter()
+        banked = loader(True)
+        load_seconds = time.perf_counter() - start
+        assert banked.bank is not None
+
+        rows = []
+        json_cold = loader(False)
+        rows.append(("JSON files + scan, cold", *timed(lambda q: scan_lookup(json_cold, q), ids)))
+        rows.append(("JSON files + scan, warm", *timed(lambda q: scan_lookup(json_cold, q), ids)))
+        rows.append(("compiled bank by ID", *timed(banked.get_question_by_id, ids)))
+        hints_json = loader(False)
+        rows.append(("generic hints, JSON scan", *timed(
+            lambda q: hints_json.get_generic_hints(int(q.split(".")[0]), q.rsplit(".", 1)[0]), ids)))
+        rows.append(("generic hints, bank", *timed(
+            lambda q: banked.get_generic_hints(int(q.split(".")[0]), q.rsplit(".", 1)[0]), ids)))
+
+    print(f"{total:,} questions in {args.chapters * args.sections} section files; "
+          f"compiled in {compile_seconds:.2f}s, artifact loaded in {load_seconds:.2f}s per loader")
+    print(f"{'lookup':<28} | {'median us':>10} | {'p99 us':>10}")
+    for name, median, p99 in rows:
+        print(f"{name:<28} | {median:>10.1f} | {p99:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
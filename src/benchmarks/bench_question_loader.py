@@ -0,0 +1,89 @@
+# benchmarks/bench_question_loader.py
+"""Per-session question loaders vs. one shared, mtime-checked loader.
+
+--sessions sessions each open every section of a synthetic bank (no compiled
+artifact, so every load parses JSON). Reports parse work and resident
+section memory, how soon an edited file shows up once the section is cached,
+and eviction under a memory budget.
+Run from src/:  python -m benchmarks.bench_question_loader
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import tempfile
+import time
+
+from benchmarks.bench_question_bank import write_synthetic_bank
+from utils.question_loader import QuestionLoader
+
+
+def open_all(loader, chapters, sections):
+    for chapter in range(1, chapters + 1):
+        for section in range(1, sections + 1):
+            loader.load_section_questions(chapter, f"{chapter}.{section}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--chapters", type=int, default=2)
+    parser.add_argument("--sections", type=int, default=5)
+    parser.add_argument("--per-section", type=int, default=200)
+    parser.add_argument("--check-seconds", type=float, default=1.0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp, contextlib.redirect_stdout(io.StringIO()):
+        questions_dir = os.path.join(tmp, "questions")
+        os.makedirs(questions_dir)
+        write_synthetic_bank(questions_dir, args.chapters, args.sections, args.per_section)
+        no_bank = os.path.join(tmp, "missing.json")
+
+        start = time.perf_counter()
+        private = [QuestionLoader(no_bank, questions_dir, check_seconds=args.check_seconds)
+                   for _ in range(args.sessions)]
+        for loader in private:
+            open_all(loader, args.chapters, args.sections)
+        private_seconds = time.perf_counter() - start
+        private_bytes = sum(loader.stats()["bytes"] for loader in private)
+        private_loads = sum(loader.stats()["loads"] for loader in private)
+
+        shared = QuestionLoader(no_bank, questions_dir, check_seconds=args.check_seconds)
+        start = time.perf_counter()
+        for _ in range(args.sessions):
+            open_all(shared, args.chapters, args.sections)
+        shared_seconds = time.perf_counter() - start
+        shared_stats = shared.stats()
+
+        # Edit one question; measure until a cached lookup returns the new text
+        path = os.path.join(questions_dir, "chapter1_section1.1.json")
+        with open(path, "r") as f:
+            data = json.load(f)
+        data["questions"][0]["text"] = "Edited question"
+        with open(path, "w") as f:
+            json.dump(data, f)
+        edited = time.perf_counter()
+        while shared.get_question_by_id("1.1.1")["text"] != "Edited question":
+            time.sleep(0.01)
+        visible_after = time.perf_counter() - edited
+
+        budget = shared_stats["bytes"] // 3
+        bounded = QuestionLoader(no_bank, questions_dir, max_bytes=budget)
+        open_all(bounded, args.chapters, args.sections)
+        bounded_stats = bounded.stats()
+
+    sections = args.chapters * args.sections
+    print(f"{args.sessions} sessions x {sections} sections of {args.per_section} questions")
+    print(f"{'loader':<10} | {'parses':>6} | {'time s':>7} | {'resident MB':>11}")
+    print(f"{'private':<10} | {private_loads:>6} | {private_seconds:>7.2f} | {private_bytes / 2 ** 20:>11.1f}")
+    print(f"{'shared':<10} | {shared_stats['loads']:>6} | {shared_seconds:>7.2f} | "
+          f"{shared_stats['bytes'] / 2 ** 20:>11.1f}")
+    print(f"edited file visible to the shared loader after {visible_after:.2f}s "
+          f"(check interval {args.check_seconds:g}s)")
+    print(f"budget {budget / 2 ** 20:.1f} MB: {bounded_stats['sections']} sections resident, "
+          f"{bounded_stats['bytes'] / 2 ** 20:.1f} MB, {bounded_stats['evictions']} evictions")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+# benchmarks/bench_question_search.py
+"""Search latency over a synthetic bank: compiled inverted index vs. scanning every question.
+
+Uses the synthetic bank of bench_question_bank (50,000 questions by
+default) and runs word, formula and prefix queries like a student typing
+into the search box on the home page; "first" is the query before the
+index has cached its posting sets.
+Run from src/:  python -m benchmarks.bench_question_search
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+from benchmarks.bench_question_bank import write_synthetic_bank
+from utils.question_bank import compile_question_bank
+from utils.question_search import QuestionSearchIndex, normalize_formula
+
+QUERIES = ["x^4 - 32x^2", "x^4-250x^2", "x^4 - 3", "32x^2", "critical points", "critical poi", "deriv",
+           "x^4 - 499x^2 critical", "no such thing"]
+
+
+def scan(questions, query, limit=10):
+    """The alternative without an index: substring test on every question's normalized text"""
+    needle = normalize_formula(query)
+    return [q["id"] for q in questions if needle in normalize_formula(q["text"])][:limit]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--chapters", type=int, default=5)
+    parser.add_argument("--sections", type=int, default=20)
+    parser.add_argument("--per-section", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        write_synthetic_bank(tmp, args.chapters, args.sections, args.per_section)
+        start = time.perf_counter()
+        bank = compile_question_bank(tmp)
+        compile_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    index = QuestionSearchIndex.from_dict(bank["search"])
+    load_ms = (time.perf_counter() - start) * 1000
+    questions = list(bank["questions"].values())
+
+    print(f"{len(questions):,} questions, {len(index.terms):,} index terms; bank compiled in {compile_seconds:.1f}s, "
+          f"index ready in {load_ms:.0f} ms")
+    print(f"{'query':<24} | {'hits':>4} | {'first ms':>8} | {'index p50 ms':>12} | {'index max ms':>12} | {'scan ms':>8}")
+    for query in QUERIES:
+        began = time.perf_counter()
+        index.search(query)
+        first_ms = (time.perf_counter() - began) * 1000
+        latencies = []
+        for _ in range(args.repeat):
+            began = time.perf_counter()
+            hits = index.search(query)
+            latencies.append(time.perf_counter() - began)
+        began = time.perf_counter()
+        scan(questions, query)
+        scan_ms = (time.perf_counter() - began) * 1000
+        print(f"{query:<24} | {len(hits):>4} | {first_ms:>8.2f} | {statistics.median(latencies) * 1000:>12.2f} | "
+              f"{max(latencies) * 1000:>12.2f} | {scan_ms:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
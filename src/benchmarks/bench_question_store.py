@@ -0,0 +1,113 @@
+# benchmarks/bench_question_store.py
+"""Parse time and memory: JSON section files and bank artifact vs. the lazy SQLite store.
+
+Uses the synthetic bank of bench_question_bank (50,000 questions by
+default). For each storage path it times what render_questions needs
+(every question's text in a section) and what step mode needs (one
+question's steps), and measures the memory held once every section has
+been listed, with tracemalloc.
+Run from src/:  python -m benchmarks.bench_question_store
+"""
+import argparse
+import gc
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.bench_question_bank import write_synthetic_bank
+from utils.question_bank import QuestionBank, compile_question_bank, write_question_bank
+from utils.question_store import QuestionStore, write_question_store
+
+
+def measure_memory(fn):
+    """(result, bytes still allocated by fn once it returns)"""
+    gc.collect()
+    tracemalloc.start()
+    result = fn()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, current
+
+
+def median_ms(fn, args):
+    latencies = []
+    for arg in args:
+        start = time.perf_counter()
+        fn(*arg)
+        latencies.append(time.perf_counter() - start)
+    return statistics.median(latencies) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--chapters", type=int, default=5)
+    parser.add_argument("--sections", type=int, default=20)
+    parser.add_argument("--per-section", type=int, default=500)
+    parser.add_argument("--samples", type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        questions_dir = os.path.join(tmp, "questions")
+        os.makedirs(questions_dir)
+        write_synthetic_bank(questions_dir, args.chapters, args.sections, args.per_section)
+        bank = compile_question_bank(questions_dir)
+        bank_path, store_path = os.path.join(tmp, "bank.json"), os.path.join(tmp, "bank.sqlite3")
+        write_question_bank(bank, bank_path)
+        write_question_store(bank, store_path)
+        del bank
+
+        rng = random.Random(0)
+        sections = [(chapter, f"{chapter}.{section}") for chapter in range(1, args.chapters + 1)
+                    for section in range(1, args.sections + 1)]
+        sample = [rng.choice(sections) for _ in range(args.samples)]
+        question_ids = [(f"{section}.{rng.randint(1, args.per_section)}",) for _, section in sample]
+
+        def json_section(chapter, section):
+            with open(os.path.join(questions_dir, f"chapter{chapter}_section{section}.json")) as f:
+                return json.load(f)["questions"]
+
+        def json_all_sections():
+            return [json_section(*key) for key in sections]
+
+        store = QuestionStore(store_path)
+
+        def store_all_sections():
+            return [store.section_questions(*key) for key in sections]
+
+        def bank_all_sections():
+            loaded = QuestionBank.load(bank_path, questions_dir)
+            return loaded, [loaded.section_questions(*key) for key in sections]
+
+        def json_steps(question_id):
+            questions = json_section(int(question_id.split(".")[0]), question_id.rsplit(".", 1)[0])
+            return next(q for q in questions if q["id"] == question_id)["steps"]
+
+        bank_view = QuestionBank.load(bank_path, questions_dir)
+        rows = []
+        for name, load_all, list_section, steps in (
+            ("JSON section files", json_all_sections, json_section, json_steps),
+            ("JSON bank artifact", bank_all_sections, bank_view.section_questions, lambda q: bank_view.get(q)["steps"]),
+            ("SQLite store (lazy)", store_all_sections, store.section_questions, lambda q: store.get(q)["steps"]),
+        ):
+            start = time.perf_counter()
+            load_all()
+            load_seconds = time.perf_counter() - start
+            _, memory = measure_memory(load_all)
+            listing = median_ms(lambda c, s: [q["text"] for q in list_section(c, s)], sample)
+            rows.append((name, listing, median_ms(steps, question_ids), memory, load_seconds))
+        sizes = {path: os.path.getsize(path) for path in (bank_path, store_path)}
+
+    total = args.chapters * args.sections * args.per_section
+    print(f"{total:,} questions in {len(sections)} sections; artifact {sizes[bank_path] / 2 ** 20:.0f} MB JSON, "
+          f"{sizes[store_path] / 2 ** 20:.0f} MB SQLite")
+    print(f"{'storage':<20} | {'list section ms':>15} | {'steps ms':>8} | {'all sections MB':>15} | {'load all s':>10}")
+    for name, listing, steps, memory, seconds in rows:
+        print(f"{name:<20} | {listing:>15.2f} | {steps:>8.3f} | {memory / 2 ** 20:>15.1f} | {seconds:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
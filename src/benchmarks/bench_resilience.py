@@ -0,0 +1,104 @@
+# benchmarks/bench_resilience.py
+"""get_answer under injected tail latency, an outage and a hung endpoint.
+
+1. Tail latency: --slow-rate of chat calls take --slow-latency extra seconds;
+   compares answer latency percentiles with and without hedged requests.
+2. Outage: every chat call fails; shows the circuit opening, degraded answers
+   being served without calling the model, and recovery once the endpoint is back.
+3. Hang: chat calls take far longer than the deadline; get_answer still
+   returns (degraded) within --deadline seconds.
+Run from src/:  python -m benchmarks.bench_resilience
+"""
+import argparse
+import statistics
+import time
+
+from backend.assistant_request import AssistantRequest
+from backend.resilience import CHAT_LATENCY, MODEL_BREAKER, Deadline
+from benchmarks.mock_openai import MockOpenAIServer, build_mock_assistant
+
+CHAT_PATH = "/v1/chat/completions"
+
+
+def request(index):
+    return AssistantRequest(question=f"Find the critical points of f(x) = x^4 - {index}x^2.", help_mode="Conceptual Help")
+
+
+def timed_answer(assistant, index, deadline=None):
+    query = request(index)
+    start = time.perf_counter()
+    result = assistant.get_answer(query, query.help_mode, chapter=4, section="4.1", deadline=deadline)
+    return time.perf_counter() - start, result
+
+
+def percentiles(samples):
+    ordered = sorted(samples)
+    pick = lambda p: ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+    return statistics.median(ordered), pick(95), pick(99), ordered[-1]
+
+
+def tail_latency(server, assistant, calls, slow_rate):
+    print(f"Tail latency: {slow_rate:.0%} of chat calls +{server.slow_latency:.1f}s, {calls} requests")
+    print(f"{'hedging':>8} | {'p50 s':>6} | {'p95 s':>6} | {'p99 s':>6} | {'max s':>6} | {'chat calls':>10}")
+    offset = 0
+    for hedge in (False, True):
+        assistant.hedge_requests = hedge
+        # Warm the latency window on a healthy endpoint so hedging has a p95 to work from
+        server.slow_rate = 0.0
+        for index in range(CHAT_LATENCY.min_samples):
+            timed_answer(assistant, 10_000 + offset + index)
+        server.slow_rate = slow_rate
+        server.reset_counts()
+        samples = [timed_answer(assistant, offset + index)[0] for index in range(calls)]
+        offset += 1000
+        p50, p95, p99, worst = percentiles(samples)
+        print(f"{'on' if hedge else 'off':>8} | {p50:>6.2f} | {p95:>6.2f} | {p99:>6.2f} | {worst:>6.2f} | "
+              f"{server.request_counts.get(CHAT_PATH, 0):>10}")
+    server.slow_rate = 0.0
+
+
+def outage(server, assistant, reset_timeout):
+    print(f"\nOutage: every chat call fails; breaker opens after {MODEL_BREAKER.failure_threshold} failures")
+    MODEL_BREAKER.reset_timeout = reset_timeout
+    server.error_rate = 1.0
+    print(f"{'call':>4} | {'breaker':>9} | {'chat calls':>10} | {'seconds':>7} | answer")
+    for index in range(MODEL_BREAKER.failure_threshold + 3):
+        server.reset_counts()
+        elapsed, result = timed_answer(assistant, 20_000 + index)
+        print(f"{index:>4} | {MODEL_BREAKER.state:>9} | {server.request_counts.get(CHAT_PATH, 0):>10} | "
+              f"{elapsed:>7.2f} | {result.get('degraded', 'model')}")
+    server.error_rate = 0.0
+    time.sleep(reset_timeout)
+    elapsed, result = timed_answer(assistant, 20_100)
+    print(f"endpoint back after {reset_timeout:.0f}s: {result.get('degraded', 'model')} answer in {elapsed:.2f}s, "
+          f"breaker {MODEL_BREAKER.state}")
+
+
+def hang(server, assistant, deadline):
+    print(f"\nHang: chat calls take 30s, deadline {deadline:.1f}s")
+    server.slow_rate, server.slow_latency = 1.0, 30.0
+    elapsed, result = timed_answer(assistant, 30_000, Deadline(deadline))
+    print(f"returned in {elapsed:.2f}s with a {result.get('degraded', 'model')} answer")
+    server.slow_rate = 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.05, help="mock seconds per call")
+    parser.add_argument("--slow-rate", type=float, default=0.05)
+    parser.add_argument("--slow-latency", type=float, default=2.0)
+    parser.add_argument("--reset-timeout", type=float, default=2.0)
+    parser.add_argument("--deadline", type=float, default=2.0)
+    args = parser.parse_args()
+
+    with MockOpenAIServer(latency=args.latency, slow_latency=args.slow_latency) as server:
+        server.install_env()
+        assistant = build_mock_assistant()
+        tail_latency(server, assistant, args.calls, args.slow_rate)
+        outage(server, assistant, args.reset_timeout)
+        hang(server, assistant, args.deadline)
+
+
+if __name__ == "__main__":
+    main()
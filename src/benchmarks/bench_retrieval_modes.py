@@ -0,0 +1,100 @@
+# benchmarks/bench_retrieval_modes.py
+"""Latency and hit rate of vector / hybrid / keyword retrieval on the question bank.
+
+Queries are the prompts the frontend sends for every question in data/questions
+(auto prompts per help mode plus one per step). A hit is a top-k list containing
+at least one chunk from the relevant PDF. The corpus is the saved vector store's
+chunks plus off-topic distractors.
+
+Run from src/:
+    python -m benchmarks.bench_retrieval_modes            # mock embeddings (latency only for dense modes)
+    python -m benchmarks.bench_retrieval_modes --live     # real OpenAI embeddings from .env
+"""
+import argparse
+import glob
+import json
+import os
+import statistics
+import time
+
+from benchmarks.mock_openai import SAMPLE_CHUNKS, MockOpenAIServer
+from backend.retrieval import RETRIEVAL_MODES, ChunkRetriever
+from backend.retrieval_cache import EMBEDDING_CACHE, RETRIEVAL_CACHE
+
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STORE_DIR = os.path.join(SRC_DIR, "frontend", "pdf_vectorstore.faiss")
+QUESTIONS_GLOB = os.path.join(SRC_DIR, "data", "questions", "*.json")
+RELEVANT_SOURCE = "4.1.1.pdf"
+
+
+def bank_queries():
+    queries = []
+    for path in sorted(glob.glob(QUESTIONS_GLOB)):
+        with open(path) as f:
+            for question in json.load(f)["questions"]:
+                text = question["text"]
+                queries.append(text)
+                queries.append(f"Question: {text}\nStudent input: explain what the question is asking me to do.\nHelp mode: Conceptual Help")
+                queries.append(f"Question: {text}\nStudent input: Explain how to solve the question.\nHelp mode: Application Help")
+                for step in question.get("steps", []):
+                    queries.append(f"Question: {text}\nCurrent step: {step['instruction']}\nStudent question: {step['hint']}")
+    return queries
+
+
+def build_retriever(embeddings):
+    from langchain_community.vectorstores import FAISS
+    from langchain_core.documents import Document
+
+    stored = FAISS.load_local(STORE_DIR, embeddings, allow_dangerous_deserialization=True)
+    chunks = [stored.docstore.search(doc_id) for doc_id in stored.index_to_docstore_id.values()]
+    chunks = [(doc.page_content, doc.metadata.get("source")) for doc in chunks] + SAMPLE_CHUNKS
+    docs = [Document(page_content=text, metadata={"source": source}) for text, source in chunks]
+    # Re-embed with the benchmark's embeddings so dense dimensions always match
+    return ChunkRetriever(FAISS.from_documents(docs, embeddings), embeddings)
+
+
+def run_mode(retriever, queries, mode, k):
+    latencies, hits, precision = [], 0, []
+    for query in queries:
+        RETRIEVAL_CACHE.clear()
+        EMBEDDING_CACHE.clear()
+        start = time.perf_counter()
+        docs = retriever.search(query, k=k, mode=mode)
+        latencies.append((time.perf_counter() - start) * 1000)
+        relevant = sum(1 for doc in docs if doc.metadata.get("source") == RELEVANT_SOURCE)
+        hits += relevant > 0
+        precision.append(relevant / k)
+    return latencies, hits / len(queries), statistics.mean(precision)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--live", action="store_true", help="use real OpenAI embeddings")
+    parser.add_argument("--latency", type=float, default=0.15, help="mock embedding latency (s)")
+    parser.add_argument("-k", type=int, default=3)
+    args = parser.parse_args()
+
+    from langchain_openai import OpenAIEmbeddings
+
+    server = None
+    if not args.live:
+        server = MockOpenAIServer(latency=args.latency).start()
+        server.install_env()
+    try:
+        retriever = build_retriever(OpenAIEmbeddings(check_embedding_ctx_length=False))
+        queries = bank_queries()
+        print(f"{len(queries)} queries, {retriever.vector_store.index.ntotal} chunks, k={args.k}"
+              f"{'' if args.live else ' (mock embeddings: dense hit rates are not meaningful)'}")
+        print(f"{'mode':>8} | {'p50 ms':>8} | {'p95 ms':>8} | {'hit rate':>8} | {'P@k':>6}")
+        for mode in RETRIEVAL_MODES:
+            latencies, hit_rate, precision = run_mode(retriever, queries, mode, args.k)
+            latencies.sort()
+            p95 = latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))]
+            print(f"{mode:>8} | {statistics.median(latencies):>8.2f} | {p95:>8.2f} | {hit_rate:>8.2f} | {precision:>6.2f}")
+    finally:
+        if server:
+            server.stop()
+
+
+if __name__ == "__main__":
+    main()
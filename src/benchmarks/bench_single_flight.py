@@ -0,0 +1,65 @@
+# benchmarks/bench_single_flight.py
+"""Upstream chat calls under a burst of identical requests, with and without coalescing.
+
+Simulates the end of a lecture: --students threads open the same question in
+the same help mode at once, both for get_answer and for stream_answer.
+Run from src/:  python -m benchmarks.bench_single_flight --students 50
+"""
+import argparse
+import threading
+import time
+
+from backend.assistant_request import AssistantRequest
+from backend.retrieval_cache import EMBEDDING_CACHE, RETRIEVAL_CACHE
+from benchmarks.mock_openai import MockOpenAIServer, build_mock_assistant
+
+REQUEST = AssistantRequest(question="Find the critical points of f(x) = x^4 - 32x^2.", help_mode="Conceptual Help")
+CHAT_PATH = "/v1/chat/completions"
+
+
+def burst(assistant, students, streaming):
+    results = [None] * students
+    barrier = threading.Barrier(students)
+
+    def student(index):
+        barrier.wait()
+        if streaming:
+            *_, results[index] = assistant.stream_answer(REQUEST, REQUEST.help_mode, chapter=1, section="1.1")
+        else:
+            results[index] = assistant.get_answer(REQUEST, REQUEST.help_mode, chapter=1, section="1.1")
+
+    threads = [threading.Thread(target=student, args=(i,)) for i in range(students)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    answers = {result["answer"] for result in results if result}
+    return elapsed, sum(1 for result in results if result), len(answers)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--students", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.5, help="mock seconds per upstream call")
+    args = parser.parse_args()
+
+    with MockOpenAIServer(latency=args.latency) as server:
+        server.install_env()
+        assistant = build_mock_assistant()
+        print(f"{args.students} identical requests in one burst, mock latency {args.latency * 1000:.0f} ms")
+        print(f"{'mode':>10} | {'coalescing':>10} | {'upstream chat calls':>19} | {'answered':>8} | {'wall s':>6}")
+        for streaming in (False, True):
+            for coalesce in (False, True):
+                assistant.coalesce_requests = coalesce
+                RETRIEVAL_CACHE.clear()
+                EMBEDDING_CACHE.clear()
+                server.reset_counts()
+                elapsed, answered, _ = burst(assistant, args.students, streaming)
+                print(f"{'stream' if streaming else 'blocking':>10} | {'on' if coalesce else 'off':>10} | "
+                      f"{server.request_counts.get(CHAT_PATH, 0):>19} | {answered:>8} | {elapsed:>6.2f}")
+
+
+if __name__ == "__main__":
+    main()
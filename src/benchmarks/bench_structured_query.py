@@ -0,0 +1,94 @@
+# benchmarks/bench_structured_query.py
+"""Embedding tokens per call and retrieval precision: legacy prompt-as-query vs AssistantRequest.
+
+"legacy" embeds the whole generation prompt (question, history, instructions), as
+get_answer did when callers passed one string; "structured" embeds only
+AssistantRequest.retrieval_query(). Corpus and relevance labels are the same as
+bench_retrieval_modes.
+
+Run from src/:  python -m benchmarks.bench_structured_query [--live]
+"""
+import argparse
+import glob
+import json
+import statistics
+
+from backend.assistant_request import AssistantRequest
+from backend.conversation_memory import ConversationMemory, count_tokens
+from backend.retrieval import RETRIEVAL_MODES
+from benchmarks.bench_conversation_memory import ASSISTANT_TURN, USER_TURN
+from benchmarks.bench_retrieval_modes import QUESTIONS_GLOB, RELEVANT_SOURCE, build_retriever
+from benchmarks.mock_openai import MockOpenAIServer
+
+
+def bank_requests():
+    requests = []
+    for path in sorted(glob.glob(QUESTIONS_GLOB)):
+        with open(path) as f:
+            for question in json.load(f)["questions"]:
+                text = question["text"]
+                requests.append(AssistantRequest(question=text, help_mode="Conceptual Help"))
+                requests.append(AssistantRequest(question=text, help_mode="Application Help"))
+                chat_history = [{"role": "assistant", "content": ASSISTANT_TURN}]
+                for turn in range(4):
+                    chat_history.append({"role": "user", "content": USER_TURN.format(turn=turn)})
+                    requests.append(AssistantRequest(
+                        question=text,
+                        help_mode="Application Help",
+                        student_input=chat_history[-1]["content"],
+                        history=ConversationMemory().build_context(chat_history),
+                    ))
+                    chat_history.append({"role": "assistant", "content": ASSISTANT_TURN})
+                for step in question.get("steps", []):
+                    requests.append(AssistantRequest(
+                        question=text,
+                        help_mode="Step-by-Step",
+                        student_input=f"{step['hint']} How do I start?",
+                        step=step["instruction"],
+                    ))
+    return requests
+
+
+def precision(retriever, queries, mode, k):
+    scores = []
+    for query in queries:
+        docs = retriever.search(query, k=k, mode=mode)
+        scores.append(sum(1 for doc in docs if doc.metadata.get("source") == RELEVANT_SOURCE) / k)
+    return statistics.mean(scores)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--live", action="store_true", help="use real OpenAI embeddings")
+    parser.add_argument("-k", type=int, default=3)
+    args = parser.parse_args()
+
+    from langchain_openai import OpenAIEmbeddings
+
+    requests = bank_requests()
+    legacy = [request.prompt() for request in requests]
+    structured = [request.retrieval_query() for request in requests]
+    legacy_tokens = [count_tokens(query) for query in legacy]
+    structured_tokens = [count_tokens(query) for query in structured]
+    print(f"{len(requests)} requests")
+    print(f"embedding tokens/call: legacy mean {statistics.mean(legacy_tokens):.0f} (max {max(legacy_tokens)}), "
+          f"structured mean {statistics.mean(structured_tokens):.0f} (max {max(structured_tokens)})")
+
+    server = None
+    if not args.live:
+        server = MockOpenAIServer(latency=0.0).start()
+        server.install_env()
+    try:
+        retriever = build_retriever(OpenAIEmbeddings(check_embedding_ctx_length=False))
+        print(f"P@{args.k}{'' if args.live else ' (mock embeddings: only keyword precision is meaningful)'}")
+        print(f"{'mode':>8} | {'legacy':>7} | {'structured':>10}")
+        for mode in RETRIEVAL_MODES:
+            print(f"{mode:>8} | {precision(retriever, legacy, mode, args.k):>7.2f} | "
+                  f"{precision(retriever, structured, mode, args.k):>10.2f}")
+    finally:
+        if server:
+            server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+# benchmarks/bench_variant_generators.py
+"""Throughput of the local symbolic variant generators over the typed bank questions.
+
+Run from src/:  python -m benchmarks.bench_variant_generators --variants 2000
+"""
+import argparse
+import glob
+import json
+import os
+import time
+
+from backend.variant_generators import generate_variant, has_generator
+
+QUESTIONS_GLOB = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "questions", "*.json")
+
+
+def typed_questions():
+    questions = []
+    for path in sorted(glob.glob(QUESTIONS_GLOB)):
+        with open(path, "r") as f:
+            questions.extend(q for q in json.load(f)["questions"] if has_generator(q.get("type")))
+    return questions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--variants", type=int, default=2000)
+    args = parser.parse_args()
+
+    questions = typed_questions()
+    if not questions:
+        print("No bank questions with a local generator")
+        return
+    latencies, unique, failed = [], set(), 0
+    start = time.perf_counter()
+    for seed in range(args.variants):
+        question = questions[seed % len(questions)]
+        began = time.perf_counter()
+        variant = generate_variant(question, seed)
+        latencies.append(time.perf_counter() - began)
+        if variant is None:
+            failed += 1
+        else:
+            unique.add(variant["text"])
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    print(f"{len(questions)} typed questions, {args.variants} variants in {elapsed:.2f}s "
+          f"= {args.variants / elapsed:,.0f} variants/s")
+    print(f"per variant: p50 {latencies[len(latencies) // 2] * 1000:.2f} ms, "
+          f"p99 {latencies[int(len(latencies) * 0.99)] * 1000:.2f} ms; "
+          f"{len(unique)} distinct texts, {failed} failures")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+# benchmarks/bench_variant_pool.py
+"""Time to a similar practice question: pooled variants vs. generating on click.
+
+Pre-fills the pool for one question through the refill worker (mock model),
+then --sessions students each ask for --clicks similar questions in a row.
+Run from src/:  python -m benchmarks.bench_variant_pool
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+from backend.llm_governor import Priority
+from backend.variant_pool import VariantPool
+from benchmarks.mock_openai import MockOpenAIServer, build_mock_assistant
+
+QUESTION = {"id": "1.1.1", "text": "Find the critical points of f(x) = x^4 - 32x^2.", "type": "critical_points"}
+
+
+class NumberedReplies(MockOpenAIServer):
+    """Mock whose chat replies differ per call, like sampling at temperature 0.7"""
+
+    def reply_for(self, prompt):
+        with self._lock:
+            self.calls = getattr(self, "calls", 0) + 1
+            return f"Find the critical points of f(x) = x^4 - {2 * self.calls + 2}x^2."
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--clicks", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=1.0, help="mock seconds per generation")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp, NumberedReplies(latency=args.latency) as server:
+        server.install_env()
+        assistant = build_mock_assistant()
+        pool = VariantPool(os.path.join(tmp, "pool.sqlite3"), refill_batch=10)
+
+        def generate(text, question_type):
+            return assistant.generate_similar_question(text, question_type, priority=Priority.BACKGROUND, fallback=False)
+
+        start = time.perf_counter()
+        pool.request_refill(QUESTION["id"], QUESTION["text"], QUESTION["type"], generate)
+        while pool.stats()["pending_refills"]:
+            time.sleep(0.05)
+        print(f"refill worker stored {pool.count(QUESTION['id'])} variants in {time.perf_counter() - start:.1f}s (background)")
+
+        on_click = []
+        for _ in range(3):
+            start = time.perf_counter()
+            assistant.generate_similar_question(QUESTION["text"], QUESTION["type"])
+            on_click.append(time.perf_counter() - start)
+
+        pooled, repeats, misses = [], 0, 0
+        for session in range(args.sessions):
+            seen = set()
+            for _ in range(args.clicks):
+                start = time.perf_counter()
+                variant = pool.take(QUESTION["id"], f"session-{session}")
+                pool.ensure_stock(QUESTION["id"], f"session-{session}", QUESTION["text"], QUESTION["type"], generate)
+                pooled.append(time.perf_counter() - start)
+                if variant is None:
+                    misses += 1
+                elif variant["id"] in seen:
+                    repeats += 1
+                else:
+                    seen.add(variant["id"])
+
+        print(f"generate on click: median {statistics.median(on_click) * 1000:.0f} ms")
+        print(f"served from pool:  median {statistics.median(pooled) * 1000:.2f} ms, max {max(pooled) * 1000:.2f} ms "
+              f"over {len(pooled)} clicks ({repeats} repeats within a session, {misses} misses)")
+
+
+if __name__ == "__main__":
+    main()
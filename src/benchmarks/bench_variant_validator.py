@@ -0,0 +1,96 @@
+# benchmarks/bench_variant_validator.py
+"""Background validation of model-written variants: what gets served, and what it costs.
+
+The mock model answers with a mix of well-posed variants, broken ones (no
+function, no real critical points, a transcendental equation, one that
+exceeds the time budget) and repeats. The refill worker stores them as pending; the validator
+pool solves them off the request path while students keep taking
+questions. Reports take() latency during validation, per-variant validation
+time, and which variants ended up servable.
+Run from src/:  python -m benchmarks.bench_variant_validator
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+from backend.llm_governor import Priority
+from backend.variant_pool import VariantPool
+from backend.variant_validator import VariantValidator, validate_variant
+from benchmarks.mock_openai import MockOpenAIServer, build_mock_assistant
+
+QUESTION = {"id": "1.1.1", "text": "Find the critical points of f(x) = x^4 - 32x^2.", "type": "critical_points"}
+
+REPLIES = [
+    "Find the critical points of f(x) = x^4 - {n}x^2.",
+    "Find the critical points of g(t) = 2t^3 - {m}t.",
+    "Find the critical points of f(x) = x^2 + {n}.",
+    "Find the critical points of f(x) = x^3 + {n}x.",  # no real critical points
+    "Find all local extrema of the given function.",  # nothing to solve
+    "Find the critical points of f(x) = x^4 - 8x^2.",  # the same text every time
+    "Find the critical points of f(x) = x*cos(x) - {n}.",  # transcendental: not a finite set
+    "Find the critical points of f(x) = x^7 - 7x^5 + 3x^3 - x.",  # exceeds the time budget
+]
+
+
+class MixedReplies(MockOpenAIServer):
+    def reply_for(self, prompt):
+        with self._lock:
+            self.calls = getattr(self, "calls", 0) + 1
+            calls = self.calls
+        return REPLIES[calls % len(REPLIES)].format(n=2 * calls + 2, m=6 * calls)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--variants", type=int, default=35)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--latency", type=float, default=0.05, help="mock seconds per generation")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    for reply in REPLIES:
+        validate_variant(reply.format(n=4, m=6), QUESTION["type"])
+    print(f"inline validation of {len(REPLIES)} texts (first includes the sympy import): "
+          f"{(time.perf_counter() - started) * 1000:.0f} ms")
+
+    with tempfile.TemporaryDirectory() as tmp, MixedReplies(latency=args.latency) as server:
+        server.install_env()
+        assistant = build_mock_assistant()
+        validator = VariantValidator(workers=args.workers)
+        pool = VariantPool(os.path.join(tmp, "pool.sqlite3"), refill_batch=args.variants,
+                           max_per_question=args.variants, validator=validator)
+
+        def generate(text, question_type):
+            return assistant.generate_similar_question(text, question_type, priority=Priority.BACKGROUND, fallback=False)
+
+        start = time.perf_counter()
+        pool.request_refill(QUESTION["id"], QUESTION["text"], QUESTION["type"], generate)
+        takes, served_before_ready = [], 0
+        session = 0
+        while pool.stats()["pending_refills"] or validator.stats()["in_flight"]:
+            began = time.perf_counter()
+            variant = pool.take(QUESTION["id"], f"session-{session}")
+            takes.append(time.perf_counter() - began)
+            session += 1
+            if variant is not None and variant["data"] is None:
+                served_before_ready += 1
+            time.sleep(0.01)
+        elapsed = time.perf_counter() - start
+
+        stats, checks = pool.stats(), validator.stats()
+        print(f"{server.request_counts.get('/v1/chat/completions', 0)} generations stored and validated in "
+              f"{elapsed:.2f}s with {args.workers} workers")
+        print(f"take() while validating: median {statistics.median(takes) * 1000:.2f} ms, "
+              f"max {max(takes) * 1000:.2f} ms over {len(takes)} calls; "
+              f"{served_before_ready} served without an answer key")
+        print(f"pool: {stats['ready']} ready, {stats['rejected']} rejected, {stats['pending_validation']} pending; "
+              f"validator: {checks['valid']} valid, {checks['rejected']} rejected, {checks['cache_hits']} cache hits")
+        variant = pool.take(QUESTION["id"], "inspect")
+        if variant is not None:
+            print(f"e.g. {variant['text']!r} -> {[step['valid_answers'][0] for step in variant['data']['steps']]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+# benchmarks/bench_wrong_answers.py
+"""Feedback on a wrong step answer: wrong-answer index lookup vs. asking the model.
+
+A temporary index holds --rows wrong answers over --steps steps, a tenth
+of them with feedback. Measured: the first load of a process, a lookup
+(hit and miss), recording a wrong answer, and picking up --writes answers
+recorded by another process incrementally vs. reloading every row. The
+model row is one "wrong_answer" request to the mock endpoint (--latency).
+Run from src/:  python -m benchmarks.bench_wrong_answers
+"""
+import argparse
+import contextlib
+import io
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+from contextlib import closing
+
+from backend.assistant_request import AssistantRequest
+from backend.wrong_answers import WrongAnswerIndex, step_key
+from benchmarks.mock_openai import MockOpenAIServer, build_mock_assistant
+
+
+def fill(index, steps, rows):
+    """The steps' valid_answers; writes rows wrong answers spread over them"""
+    keys = [[f"{n}x^3 - {n * 16}x"] for n in range(steps)]
+    rng = random.Random(0)
+    with closing(index._connect()) as db, db:
+        db.executemany(
+            "INSERT INTO wrong_answers (step_key, fingerprint, count, example, question, step, feedback, "
+            "feedback_source, seq) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            ((step_key(keys[row % steps]), f"expression:{row}*x", rng.randint(1, 50), f"{row}x", "Q", "Step",
+              "Check the power rule." if row % 10 == 0 else None, "authored" if row % 10 == 0 else None, row + 1)
+             for row in range(rows)),
+        )
+    return keys
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    return statistics.median(samples) * 1000, samples[int(len(samples) * 0.99)] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--steps", type=int, default=5_000)
+    parser.add_argument("--writes", type=int, default=1_000)
+    parser.add_argument("--latency", type=float, default=1.0, help="seconds per mock model call")
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "wrong_answers.sqlite3")
+        index = WrongAnswerIndex(path, check_seconds=0)
+        keys = fill(index, args.steps, args.rows)
+
+        start = time.perf_counter()
+        index.lookup(keys[0], "expression:0*x")
+        results.append(("first load", (time.perf_counter() - start) * 1000, None))
+        index.check_seconds = 60
+        rng = random.Random(1)
+        hits = [(keys[row % args.steps], f"expression:{row}*x") for row in rng.sample(range(args.rows), 1000)]
+        results.append(("lookup, hit", *timed(lambda: index.lookup(*rng.choice(hits)), 10_000)))
+        results.append(("lookup, miss", *timed(lambda: index.lookup(rng.choice(keys), "expression:x"), 10_000)))
+        results.append(("record", *timed(lambda: index.record(*rng.choice(hits), "wrong", "Q", "Step"), 1_000)))
+
+        other = WrongAnswerIndex(path, check_seconds=0)
+        for _ in range(args.writes):
+            other.record(*rng.choice(hits), "wrong", "Q", "Step")
+        index.check_seconds = 0
+        results.append((f"read {args.writes} new", timed(index._refresh, 1)[0], None))
+        fresh = WrongAnswerIndex(path, check_seconds=0)
+        results.append(("reload all rows", timed(fresh._refresh, 1)[0], None))
+        with closing(sqlite3.connect(path)) as db:
+            rows = db.execute("SELECT COUNT(*) FROM wrong_answers").fetchone()[0]
+
+        with MockOpenAIServer(latency=args.latency) as server, contextlib.redirect_stdout(io.StringIO()):
+            server.install_env()
+            assistant = build_mock_assistant()
+            request = AssistantRequest(question="Find the critical points of f(x) = x^4 - 32x^2.",
+                                       help_mode="Conceptual Help", student_input="4x^3 - 64",
+                                       step="Find the derivative of f(x).", template="wrong_answer")
+            start = time.perf_counter()
+            assert assistant.get_answer(request, request.help_mode) is not None
+            results.append(("model call", (time.perf_counter() - start) * 1000, None))
+
+    print(f"{rows:,} wrong answers over {args.steps:,} steps")
+    print(f"{'operation':17} | {'p50 ms':>9} | {'p99 ms':>9}")
+    for name, p50, p99 in results:
+        print(f"{name:17} | {p50:9.4f} | {p99:9.4f}" if p99 is not None else f"{name:17} | {p50:9.4f} |")
+
+
+if __name__ == "__main__":
+    main()
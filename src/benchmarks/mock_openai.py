@@ -0,0 +1,249 @@
+# benchmarks/mock_openai.py
+"""Local stand-in for the OpenAI REST API used by the benchmarks.
+
+Serves /v1/chat/completions and /v1/embeddings with a configurable latency so
+throughput can be measured without spending API credits. Chat calls can also
+be made to fail (HTTP 500) or to hit a slow tail at a given rate, for the
+deadline / hedging / circuit breaker paths. Point the clients at
+it with OPENAI_BASE_URL=http://127.0.0.1:<port>/v1 (see ``MockOpenAIServer.install_env``).
+"""
+import argparse
+import base64
+import hashlib
+import json
+import os
+import random
+import struct
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+EMBEDDING_DIM = 64
+
+
+def fake_embedding(text):
+    """Deterministic unit-ish vector derived from the text hash"""
+    digest = hashlib.sha256(str(text).encode("utf-8")).digest()
+    values = []
+    while len(values) < EMBEDDING_DIM:
+        digest = hashlib.sha256(digest).digest()
+        values.extend((byte - 128) / 128.0 for byte in digest)
+    return values[:EMBEDDING_DIM]
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = "MockOpenAI/1.0"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        mock = self.server.mock
+        mock.record_request(self.path)
+
+        delay = mock.latency
+        is_chat = self.path.endswith("/chat/completions")
+        if mock.prompt_token_latency and is_chat:
+            # Model prefill cost: longer prompts take longer to start answering
+            prompt = " ".join(str(message.get("content", "")) for message in body.get("messages", []))
+            delay += len(prompt.split()) * mock.prompt_token_latency
+        fail, slow = mock.roll_faults() if is_chat else (False, False)
+        if slow:
+            delay += mock.slow_latency
+        time.sleep(delay)
+
+        try:
+            if fail:
+                mock.record_request("injected_errors")
+                self._send_json(500, {"error": {"message": "Injected failure", "type": "server_error"}})
+            else:
+                self._respond(body)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # the client gave up (deadline or hedge loser)
+
+    def _respond(self, body):
+        if self.path.endswith("/embeddings"):
+            payload = self._embeddings(body)
+        elif self.path.endswith("/chat/completions") and body.get("stream"):
+            self._stream_chat(body)
+            return
+        elif self.path.endswith("/chat/completions"):
+            payload = self._chat(body)
+        else:
+            self.send_error(404)
+            return
+
+        self._send_json(200, payload)
+
+    def _send_json(self, status, payload):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _embeddings(self, body):
+        inputs = body.get("input", [])
+        if not isinstance(inputs, list) or (inputs and isinstance(inputs[0], int)):
+            inputs = [inputs]
+        data = []
+        for index, item in enumerate(inputs):
+            vector = fake_embedding(item)
+            if body.get("encoding_format") == "base64":
+                vector = base64.b64encode(struct.pack(f"<{len(vector)}f", *vector)).decode("ascii")
+            data.append({"object": "embedding", "index": index, "embedding": vector})
+        return {
+            "object": "list",
+            "data": data,
+            "model": body.get("model", "mock-embedding"),
+            "usage": {"prompt_tokens": len(inputs), "total_tokens": len(inputs)},
+        }
+
+    def _chat(self, body):
+        prompt = " ".join(str(message.get("content", "")) for message in body.get("messages", []))
+        content = self.server.mock.reply_for(prompt)
+        return {
+            "id": "chatcmpl-mock",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "mock-chat"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }],
+            "usage": {
+                "prompt_tokens": len(prompt.split()),
+                "completion_tokens": len(content.split()),
+                "total_tokens": len(prompt.split()) + len(content.split()),
+            },
+        }
+
+    def _stream_chat(self, body):
+        prompt = " ".join(str(message.get("content", "")) for message in body.get("messages", []))
+        words = self.server.mock.reply_for(prompt).split(" ")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        for index, word in enumerate(words + [None]):
+            delta = {} if word is None else {"content": word if index == 0 else " " + word}
+            if index == 0:
+                delta["role"] = "assistant"
+            event = {
+                "id": "chatcmpl-mock",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": body.get("model", "mock-chat"),
+                "choices": [{"index": 0, "delta": delta, "finish_reason": "stop" if word is None else None}],
+            }
+            self.wfile.write(f"data: {json.dumps(event)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+            time.sleep(self.server.mock.stream_chunk_latency)
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+
+class MockOpenAIServer:
+    """Threaded mock server; use as a context manager"""
+
+    def __init__(self, latency=0.2, host="127.0.0.1", port=0, prompt_token_latency=0.0,
+                 error_rate=0.0, slow_rate=0.0, slow_latency=5.0, seed=0):
+        self.latency = latency
+        self.prompt_token_latency = prompt_token_latency
+        self.stream_chunk_latency = 0.01
+        # Fault injection for chat calls; adjustable while the server runs
+        self.error_rate = error_rate
+        self.slow_rate = slow_rate
+        self.slow_latency = slow_latency
+        self._random = random.Random(seed)
+        self.request_counts = {}
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), _Handler)
+        self._httpd.daemon_threads = True
+        self._httpd.mock = self
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def record_request(self, path):
+        with self._lock:
+            self.request_counts[path] = self.request_counts.get(path, 0) + 1
+
+    def roll_faults(self):
+        """(fail, slow) for the next chat call"""
+        with self._lock:
+            return self._random.random() < self.error_rate, self._random.random() < self.slow_rate
+
+    def reset_counts(self):
+        with self._lock:
+            self.request_counts = {}
+
+    def reply_for(self, prompt):
+        return "Let's think about which rule applies to each term of f(x) first."
+
+    def install_env(self):
+        """Route the OpenAI/LangChain clients created after this call to the mock"""
+        os.environ["OPENAI_API_KEY"] = os.environ.get("OPENAI_API_KEY") or "mock-key"
+        os.environ["OPENAI_BASE_URL"] = self.base_url
+        os.environ["OPENAI_API_BASE"] = self.base_url
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+SAMPLE_CHUNKS = [
+    ("A critical number of f is a number c in the domain of f such that f'(c) = 0 or f'(c) does not exist.", "4.1.1.pdf"),
+    ("First derivative test: if f' changes from positive to negative at c, then f has a local maximum at c.", "4.1.1.pdf"),
+    ("Second derivative test: if f'(c) = 0 and f''(c) > 0, then f has a local minimum at c.", "4.1.1.pdf"),
+    ("The power rule: the derivative of x^n is n x^(n-1) for any real number n.", "3.1.1.pdf"),
+    ("A function f is continuous at a number a if the limit of f(x) as x approaches a equals f(a).", "2.5.1.pdf"),
+    ("The chain rule: if h(x) = f(g(x)) then h'(x) = f'(g(x)) g'(x).", "3.4.1.pdf"),
+]
+
+
+def build_mock_assistant(chunks=SAMPLE_CHUNKS):
+    """MathAssistant wired to the mock endpoint with a small in-memory FAISS index"""
+    from langchain_community.vectorstores import FAISS
+    from langchain_openai import OpenAIEmbeddings
+    from backend.math_assistant import MathAssistant
+
+    embeddings = OpenAIEmbeddings(check_embedding_ctx_length=False)
+    vector_store = FAISS.from_texts(
+        [text for text, _ in chunks],
+        embeddings,
+        metadatas=[{"source": source} for _, source in chunks],
+    )
+    return MathAssistant(embeddings=embeddings, vector_store=vector_store)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a mock OpenAI endpoint")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds per request")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of chat calls answered with HTTP 500")
+    parser.add_argument("--slow-rate", type=float, default=0.0, help="fraction of chat calls delayed by --slow-latency")
+    parser.add_argument("--slow-latency", type=float, default=5.0)
+    args = parser.parse_args()
+
+    server = MockOpenAIServer(latency=args.latency, port=args.port, error_rate=args.error_rate,
+                              slow_rate=args.slow_rate, slow_latency=args.slow_latency)
+    print(f"🧪 Mock OpenAI listening on {server.base_url}")
+    server._httpd.serve_forever()
@@ -0,0 +1,44 @@
+"""Compile data/questions/*.json into the indexed question bank artifact.
+
+Run from src/ after editing the question JSON:
+    python build_question_bank.py
+QuestionLoader serves lookups from data/question_bank.json while it matches
+the JSON files, and falls back to reading them directly once it does not.
+An --out ending in .sqlite3 writes the SQLite store instead, whose questions
+decode their fields lazily (set QUESTION_BANK_PATH to use it).
+"""
+import argparse
+import os
+import sys
+import time
+
+project_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(project_dir)
+
+from utils.question_bank import QUESTION_BANK_PATH, QUESTIONS_DIR, compile_question_bank, write_question_bank
+from utils.question_loader import STORE_EXTENSIONS
+from utils.question_store import write_question_store
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--questions-dir", default=QUESTIONS_DIR)
+    parser.add_argument("--out", default=QUESTION_BANK_PATH)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    try:
+        bank = compile_question_bank(args.questions_dir)
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    if args.out.endswith(STORE_EXTENSIONS):
+        write_question_store(bank, args.out)
+    else:
+        write_question_bank(bank, args.out)
+    print(f"✅ Compiled {len(bank['questions'])} questions in {len(bank['sections'])} sections to {args.out} "
+          f"in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,7 +3,16 @@ import os
 import sys
 import time
 import json
-from frontend.utils.question_loader import QuestionLoader
+import uuid
+from utils.question_loader import get_question_loader
+from backend.answer_check_pool import ANSWER_CHECK_POOL
+from backend.answer_checker import AnswerCheckError
+from backend.assistant_request import AssistantRequest
+from backend.llm_governor import Priority
+from backend.prefetch import prefetch_answer_keys, prefetch_chapter, prefetch_questions
+from backend.variant_generators import generate_variant, has_generator
+from backend.variant_pool import VARIANT_POOL
+from backend.wrong_answers import WRONG_ANSWERS
 
 def run_frontend():
     
@@ -291,6 +300,18 @@ def initialize_session_state():
     if 'current_question_text' not in st.session_state:
         st.session_state.current_question_text = None
 
+    # Steps/answer keys of the current practice question, when it has them
+    if 'similar_question_data' not in st.session_state:
+        st.session_state.similar_question_data = None
+
+    # Identifies this browser session in the similar-question pool's "seen" table
+    if 'session_id' not in st.session_state:
+        st.session_state.session_id = uuid.uuid4().hex
+
+    if 'conversation_memory' not in st.session_state:
+        from backend.conversation_memory import ConversationMemory
+        st.session_state.conversation_memory = ConversationMemory()
+
     # Initialize MathAssistant in session state
     if 'assistant' not in st.session_state:
         # Now import and initialize the math assistant
@@ -299,7 +320,8 @@ def initialize_session_state():
             st.session_state.assistant = MathAssistant()
 
     if 'question_loader' not in st.session_state:
-        st.session_state.question_loader = QuestionLoader()
+        # One loader per process: sessions share its cache and see edited question files
+        st.session_state.question_loader = get_question_loader()
 
 def generate_similar_question(question):
     """
@@ -333,6 +355,52 @@ def generate_similar_question(question):
     
     return similar_question
 
+def next_similar_question(question_data):
+    """
+    Serves a pre-generated similar question this session has not seen yet from the
+    shared pool, and only generates one on the spot when the pool has nothing new.
+    The pool is topped up in the background either way. Questions with a template
+    block, then typed questions, are generated locally, with steps and answer keys.
+    """
+    assistant = st.session_state.assistant
+    session_id = st.session_state.session_id
+    template = st.session_state.question_loader.get_question_generator(question_data)
+    if template:
+        local_generator = template.generate
+    elif has_generator(question_data.get('type')):
+        local_generator = lambda: generate_variant(question_data)
+    else:
+        local_generator = None
+    
+    def generate_for_pool(question_text, question_type):
+        if local_generator:
+            return local_generator()
+        return assistant.generate_similar_question(
+            question_text, question_type, priority=Priority.BACKGROUND, fallback=False
+        )
+    
+    variant = VARIANT_POOL.take(question_data['id'], session_id)
+    VARIANT_POOL.ensure_stock(
+        question_data['id'], session_id, question_data['text'], question_data.get('type'), generate_for_pool
+    )
+    if variant is None and local_generator:
+        local_variant = local_generator()
+        if local_variant:
+            variant_id = VARIANT_POOL.add(
+                question_data['id'], local_variant['text'], local_variant, local_variant['source']
+            )
+            VARIANT_POOL.mark_seen(session_id, variant_id)
+            variant = {"text": local_variant['text'], "data": local_variant}
+    
+    # A new practice question starts its own step-by-step progress
+    st.session_state.step_progress = []
+    st.session_state.step_index = 0
+    if variant:
+        st.session_state.similar_question_data = variant['data']
+        return variant['text']
+    st.session_state.similar_question_data = None
+    return generate_similar_question(question_data['text'])
+
 # === Navigation Function ===
 def navigate_to(destination, chapter=None, section=None, question=None, help_mode=None):
     print(f"DEBUG: navigate_to called with destination={destination}, chapter={chapter}, section={section} (type={type(section)}), question={question}, help_mode={help_mode}")
@@ -388,6 +456,31 @@ def render_home():
     
     st.markdown("<p>Your AI-powered learning assistant for Math 127. Struggling with a concept? Need guidance on a problem? This assistant is here to provide hints, explanations, and step-by-step guidance to help you understand—without just giving you the answers.</p>", unsafe_allow_html=True)
     
+    # Search the whole bank by wording or by the expression in the problem
+    search_query = st.text_input(
+        "🔎 Search questions",
+        placeholder="e.g. x^4 - 32x^2 or critical points",
+        key="question_search",
+    )
+    if search_query.strip():
+        results = st.session_state.question_loader.search_questions(search_query)
+        if not results:
+            st.info("No questions match your search.")
+        for result in results:
+            if st.button(f"Section {result['section']}: {result['text']}", key=f"search_{result['id']}"):
+                question = st.session_state.question_loader.get_question_by_id(result['id'])
+                if question is None:
+                    # Removed from its section file since the search index was read
+                    st.warning("That question is no longer available. Please search again.")
+                    continue
+                st.session_state.current_question = result['id']
+                st.session_state.original_question = question
+                st.session_state.current_question_text = result['text']
+                navigate_to("question_detail",
+                    chapter=result['chapter'],
+                    section=result['section'],
+                    question=result['id'])
+    
     st.markdown("<h2>Select a chapter to begin:</h2>", unsafe_allow_html=True)
     
     col1, col2 = st.columns(2)
@@ -432,6 +525,8 @@ def render_sections():
     
     # Get sections for current chapter
     chapter_sections = sections.get(st.session_state.current_chapter, [])
+    # Load every section of this chapter in the background while the student picks one
+    prefetch_chapter(st.session_state.question_loader, st.session_state.current_chapter, chapter_sections)
     
     # Display sections in a grid
     cols = st.columns(3)
@@ -459,6 +554,9 @@ def render_questions():
         st.session_state.current_chapter,
         section
     )
+    # Load each listed question's page and resolve its opening answers before the student opens one
+    prefetch_questions(st.session_state.question_loader, st.session_state.assistant,
+                       st.session_state.current_chapter, section, [question['id'] for question in questions])
     
     for i, question in enumerate(questions):
         card_id = f"q_{question['id']}"
@@ -505,6 +603,8 @@ def render_question_detail():
     if not original_question_data:
         st.error("Question not found")
         return
+    # Decode the steps and parse their answer keys before the student picks a help mode
+    prefetch_answer_keys(original_question_data)
     
     st.markdown(f"<h1>Question {original_question_data['id']}</h1>", unsafe_allow_html=True)
     st.markdown(f"""
@@ -517,7 +617,7 @@ def render_question_detail():
     st.markdown('<div class="practice-button-container">', unsafe_allow_html=True)
     if st.button("✨ Practice with Similar Question", key="practice_button", use_container_width=True):
         with st.spinner("Generating similar question..."):
-            similar_question = generate_similar_question(st.session_state.current_question_text)
+            similar_question = next_similar_question(original_question_data)
             st.session_state.similar_question = similar_question
             st.session_state.current_question_text = similar_question
         navigate_to("similar_question", 
@@ -526,6 +626,21 @@ def render_question_detail():
                     question=question_id)
     st.markdown('</div>', unsafe_allow_html=True)
 
+    # Other authored questions on the same idea, precomputed when the bank was compiled
+    related_questions = st.session_state.question_loader.get_related_questions(original_question_data)
+    if related_questions:
+        with st.expander("📚 Related questions"):
+            for related in related_questions:
+                if st.button(f"Question {related['id']}: {related['text']}", key=f"related_{related['id']}"):
+                    related_section = related['id'].rsplit('.', 1)[0]
+                    st.session_state.current_question = related['id']
+                    st.session_state.original_question = related
+                    st.session_state.current_question_text = related['text']
+                    navigate_to("question_detail",
+                        chapter=int(related_section.split('.')[0]),
+                        section=related_section,
+                        question=related['id'])
+
     st.markdown("<h2>How would you like help with this question?</h2>", unsafe_allow_html=True)
     col1, col2, col3 = st.columns(3)
     with col1:
@@ -632,7 +747,7 @@ def render_similar_question():
     st.markdown('<div class="practice-button-container">', unsafe_allow_html=True)
     if st.button("🔄 Generate Another Similar Question", key="another_similar_button", use_container_width=True):
         # Generate a different similar question
-        new_similar_question = generate_similar_question(original_question['text'])
+        new_similar_question = next_similar_question(original_question)
         st.session_state.similar_question = new_similar_question
         st.session_state.current_question_text = new_similar_question # Ensure this is also updated
         st.rerun()
@@ -642,6 +757,9 @@ def render_similar_question():
     if st.button("← Back to Original Question", key="back_to_original"):
         # Explicitly set current_question_text back to the original question's text
         st.session_state.current_question_text = st.session_state.original_question['text']
+        # The original question has its own step-by-step progress
+        st.session_state.step_progress = []
+        st.session_state.step_index = 0
         navigate_to("questions", 
                   chapter=st.session_state.current_chapter,
                   section=st.session_state.current_section,
@@ -667,19 +785,14 @@ def render_chat_interface():
     </div>
     """, unsafe_allow_html=True)
     
-    # Load questions for the current section
-    section = str(st.session_state.current_section)
-    
-    questions = st.session_state.question_loader.load_section_questions(
-        st.session_state.current_chapter,
-        section
-    )
-    
-    # Find the question by ID
-    question_data = next((q for q in questions if q['id'] == question_id), None)
+    # Look up the question by ID
+    question_data = st.session_state.question_loader.get_question_by_id(question_id)
     if question_data:
         question = question_data['text']
     
+    # Step hints from the question JSON, shown instead of a model answer when the assistant is overloaded
+    question_hints = tuple(step['hint'] for step in question_data.get('steps', []) if step.get('hint')) if question_data else ()
+    
     # Initialize first message if empty
     if len(st.session_state.chat_history) == 0:
         # Get assistant from session state
@@ -687,15 +800,17 @@ def render_chat_interface():
         
         # Create automatic prompt based on help mode
         if help_mode == "Conceptual Help":
-            auto_prompt = "explain what the question is asking me to do. Retrieve from PDF 4.1.1. DO NOT explain how to solve the question"
-            
             # Show loading message while getting the answer
             with st.spinner("Getting initial information for you..."):
-                # For the query, combine the question with the auto prompt
-                query = f"Question: {question}\nStudent input: {auto_prompt}\nHelp mode: {help_mode}"
+                # The opening prompt for this help mode comes from the versioned templates
+                query = AssistantRequest(question=question, help_mode=help_mode, hints=question_hints)
                 
                 # Get answer from the assistant
-                result = assistant.get_answer(query, help_mode)
+                result = assistant.get_answer(
+                    query, help_mode,
+                    chapter=st.session_state.current_chapter,
+                    section=st.session_state.current_section
+                )
                 
                 if result:
                     # Format the answer with sources
@@ -715,15 +830,17 @@ def render_chat_interface():
                 })
                 
         elif help_mode == "Application Help":
-            auto_prompt = "Explain how to solve the question. Retrieve information from the 4.1.1 PDF, but DO NOT give the actual answer. Only explain."
-            
             # Show loading message while getting the answer
             with st.spinner("Getting initial information for you..."):
-                # For the query, combine the question with the auto prompt
-                query = f"Question: {question}\nStudent input: {auto_prompt}\nHelp mode: {help_mode}"
+                # The opening prompt for this help mode comes from the versioned templates
+                query = AssistantRequest(question=question, help_mode=help_mode, hints=question_hints)
                 
                 # Get answer from the assistant
-                result = assistant.get_answer(query, help_mode)
+                result = assistant.get_answer(
+                    query, help_mode,
+                    chapter=st.session_state.current_chapter,
+                    section=st.session_state.current_section
+                )
                 
                 if result:
                     # Format the answer with sources
@@ -764,35 +881,30 @@ def render_chat_interface():
             # Get assistant from session state
             assistant = st.session_state.assistant
             
-            # Construct conversation history for context
-            conversation_history_for_llm = ""
-            for msg in st.session_state.chat_history:
-                conversation_history_for_llm += f"{msg['role'].capitalize()}: {msg['content']}\n"
+            # Bounded conversation context: rolling summary of older turns plus the latest ones verbatim
+            memory = st.session_state.conversation_memory
+            conversation_history_for_llm = memory.build_context(st.session_state.chat_history)
             
-            # Prepare the query for the assistant, emphasizing no direct answers and context awareness
-            query_to_assistant = f"""
-            The user is asking a question or making a statement in the context of the original math problem and the ongoing conversation.
-            Original Math Question: {question}
-            Current Help Mode: {help_mode}
-            
-            Conversation Context (most recent at bottom):
-            {conversation_history_for_llm}
-            
-            Your instructions as a Math 127 AI Assistant:
-            1. Respond directly to the user's latest input, drawing upon the entire conversation history for context.
-            2. **CRITICAL: NEVER provide the direct solution or final answer to the math problem or any sub-step.** Your role is to guide, not to solve.
-            3. Provide helpful, conceptual, or application-based guidance relevant to the math problem and the current help mode. For instance, if they ask for a next step, guide them to it without giving the exact formula or number.
-            4. Maintain a helpful, encouraging, and patient tone.
-            5. **STRICTLY adhere to the topic.** If the user asks something completely unrelated to the math problem, the specific step, or the course material, politely inform them that you can only assist with math-related queries for this course. Do not engage in off-topic discussions or try to answer unrelated questions.
-            6. If the user makes a statement rather than asking a question, acknowledge their input and offer further guidance or a next logical thought process step.
-            """
+            # Only the question and the latest input are used for retrieval; the template
+            # emphasizes no direct answers and context awareness
+            query_to_assistant = AssistantRequest(
+                question=question,
+                help_mode=help_mode,
+                student_input=user_input,
+                history=conversation_history_for_llm,
+                hints=question_hints
+            )
             
             # Show typing indicator
             message_placeholder = st.empty()
             message_placeholder.markdown("<div class='bot-message'>Thinking...</div>", unsafe_allow_html=True)
             
             # Get answer from the assistant
-            result = assistant.get_answer(query_to_assistant, help_mode)
+            result = assistant.get_answer(
+                query_to_assistant, help_mode,
+                chapter=st.session_state.current_chapter,
+                section=st.session_state.current_section
+            )
             
             if result:
                 # Format the answer with sources
@@ -811,6 +923,9 @@ def render_chat_interface():
                 "content": answer
             })
             
+            # Fold older turns into the summary off the script thread
+            memory.refresh_in_background(st.session_state.chat_history, assistant.summarize_conversation)
+            
             # Remove typing indicator and refresh
             if 'message_placeholder' in locals():
                 message_placeholder.empty()
@@ -821,7 +936,7 @@ def render_chat_interface():
     if st.button("✨ Try a Similar Question", key="try_similar_button"):
         # Generate a similar question
         if st.session_state.original_question:
-            similar_question = generate_similar_question(st.session_state.original_question['text'])
+            similar_question = next_similar_question(st.session_state.original_question)
             st.session_state.similar_question = similar_question
             st.session_state.current_question_text = similar_question  # Update the current question text
             # Reset chat history
@@ -869,24 +984,22 @@ def render_improved_step_interface():
     # Check if this is a practice question (not from JSON)
     is_practice_question = question != st.session_state.original_question['text']
     
-    if is_practice_question:
+    # Practice questions from the local generator carry their own steps and answer keys
+    practice_data = st.session_state.similar_question_data
+    practice_steps = []
+    if is_practice_question and practice_data and practice_data.get('text') == question:
+        practice_steps = practice_data.get('steps', [])
+    
+    if is_practice_question and not practice_steps:
         # For practice questions, show a simpler interface with hints
         st.markdown("### Need help? Click to see hints:")
         
-        # Get the generic hints from the first question in the section
-        section = str(st.session_state.current_section)
-        questions = st.session_state.question_loader.load_section_questions(
+        # Get the generic hints of the section (precomputed in the question bank)
+        generic_hints = st.session_state.question_loader.get_generic_hints(
             st.session_state.current_chapter,
-            section
+            str(st.session_state.current_section)
         )
         
-        # Get the generic hints from the first question in the section
-        generic_hints = None
-        for q in questions:
-            if 'generic_hints' in q:
-                generic_hints = q['generic_hints']
-                break
-        
         if generic_hints:
             # Display hints in expandable sections
             for i, hint in enumerate(generic_hints, 1):
@@ -913,17 +1026,15 @@ def render_improved_step_interface():
         #         st.success("Answer submitted! Check your work against the hints above.")
         #     else:
         #         st.warning("Please enter your answer before submitting.")
+    elif practice_steps:
+        predefined_steps = practice_steps
     else:
         # For original questions, use the existing step-by-step interface
         # Get the steps from JSON
-        section = str(st.session_state.current_section)
-        questions = st.session_state.question_loader.load_section_questions(
-            st.session_state.current_chapter,
-            section
-        )
-        question_data = next((q for q in questions if q['id'] == question_id), None)
+        question_data = st.session_state.question_loader.get_question_by_id(question_id)
         predefined_steps = question_data.get('steps', []) if question_data else []
-        
+    
+    if not is_practice_question or practice_steps:
         # Initialize step_index if not in session state
         if 'step_index' not in st.session_state:
             st.session_state.step_index = 0
@@ -1015,43 +1126,52 @@ def render_improved_step_interface():
                 if submit_button and user_input:
                     # For original questions, use predefined valid answers
                     valid_answers = current_step.get('valid_answers', [])
-                    is_correct = False
-                    
-                    # Normalize the input for comparison
-                    normalized_input = user_input.strip().lower().replace(" ", "")
-                    
-                    # Check against all valid answer formats
-                    for valid_answer in valid_answers:
-                        normalized_valid = valid_answer.strip().lower().replace(" ", "")
-                        if normalized_input == normalized_valid or normalized_valid in normalized_input:
-                            is_correct = True
-                            break
                     
-                    feedback = current_step.get('hint', "Try checking your work and try again.")
+                    # Equivalent forms count ("4x(x^2-16)"), solution sets in any order (backend/answer_checker.py).
+                    # Checks run in a worker pool under a time budget; oversized or too costly answers are not graded
+                    try:
+                        is_correct, wrong_answer = ANSWER_CHECK_POOL.grade(user_input, valid_answers)
+                    except AnswerCheckError as e:
+                        feedback_container.warning(f"⚠️ {e}")
+                    else:
+                        feedback = current_step.get('hint', "Try checking your work and try again.")
                     
-                    # Increment attempts
-                    st.session_state.step_progress[current_index]["attempts"] += 1
+                        # Increment attempts
+                        st.session_state.step_progress[current_index]["attempts"] += 1
                     
-                    # Store user's answer
-                    st.session_state.step_progress[current_index]["user_answer"] = user_input
+                        # Store user's answer
+                        st.session_state.step_progress[current_index]["user_answer"] = user_input
                     
-                    # Show feedback based on correctness
-                    if is_correct:
-                        # Mark step as completed
-                        st.session_state.step_progress[current_index]["completed"] = True
+                        # Show feedback based on correctness
+                        if is_correct:
+                            # Mark step as completed
+                            st.session_state.step_progress[current_index]["completed"] = True
                         
-                        # Display success message
-                        feedback_container.success(f"✅ Correct! Great job on step {current_index + 1}.")
+                            # Display success message
+                            feedback_container.success(f"✅ Correct! Great job on step {current_index + 1}.")
                         
-                        # Move to next step
-                        st.session_state.step_index += 1
+                            # Move to next step
+                            st.session_state.step_index += 1
                         
-                        # Rerun to refresh the page
-                        time.sleep(1)  # Small delay for feedback to be visible
-                        st.rerun()
-                    else:
-                        # Display error message with hint
-                        feedback_container.error(f"❌ That's not quite right. {feedback}")
+                            # Rerun to refresh the page
+                            time.sleep(1)  # Small delay for feedback to be visible
+                            st.rerun()
+                        else:
+                            # A known mistake gets its own feedback instead of the hint, without a model call
+                            # (backend/wrong_answers.py). A session counts each wrong answer once per step
+                            if wrong_answer is not None:
+                                counted = st.session_state.step_progress[current_index].setdefault("wrong_answers", [])
+                                if wrong_answer in counted:
+                                    mistake = WRONG_ANSWERS.lookup(valid_answers, wrong_answer)
+                                else:
+                                    counted.append(wrong_answer)
+                                    mistake = WRONG_ANSWERS.record(valid_answers, wrong_answer, user_input,
+                                                                   question, current_step.get('instruction'))
+                                if mistake and mistake["feedback"]:
+                                    feedback = mistake["feedback"]
+                            
+                            # Display error message with hint
+                            feedback_container.error(f"❌ That's not quite right. {feedback}")
                 
                 # Handle question asking
                 if ask_button and user_input and user_input.strip().endswith("?"):
@@ -1061,21 +1181,21 @@ def render_improved_step_interface():
                     assistant = st.session_state.assistant
                     
                     # Prepare a specific query for this step question
-                    query = f"""
-                    Question: {question}
-                    Current step: "{current_step['instruction']}"
-                    Student question: {user_input}
-                    Help mode: {help_mode}
-                    
-                    Instructions:
-                    1. Answer their specific question about this step.
-                    2. Give helpful guidance without giving away the exact answer.
-                    3. Focus only on this current step.
-                    """
+                    query = AssistantRequest(
+                        question=question,
+                        help_mode=help_mode,
+                        student_input=user_input,
+                        step=current_step['instruction'],
+                        hints=(current_step['hint'],) if current_step.get('hint') else ()
+                    )
                     
                     # Show typing indicator
                     with st.spinner("Thinking about your question..."):
-                        result = assistant.get_answer(query, help_mode)
+                        result = assistant.get_answer(
+                            query, help_mode,
+                            chapter=st.session_state.current_chapter,
+                            section=st.session_state.current_section
+                        )
                         
                         if result:
                             answer = result["answer"]
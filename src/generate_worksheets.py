@@ -0,0 +1,303 @@
+"""Generate a unique worksheet with answer keys for every student on a roster.
+
+Run from src/, e.g. for a quiz on sections 1.1 and 1.2:
+    python generate_worksheets.py --roster roster.csv --sections 1.1,1.2 --variants 4 --out quiz3.jsonl
+Each student gets --variants problems per section, drawn deterministically
+from a seed derived from --seed and the student ID, so rerunning gives the
+same worksheets. Templated and typed questions are generated locally across
+a process pool. Other questions get a shared set of model-written variants
+first (at most --llm-concurrency calls at a time, validated in the same
+pool, saved next to the output). Output is streamed to JSONL (one student
+per line) or CSV (one problem per row), and --resume continues an
+interrupted run where it stopped.
+"""
+import argparse
+import asyncio
+import csv
+import glob
+import json
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+project_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(project_dir)
+
+from backend.llm_governor import Priority
+from backend.variant_generators import generate_variant, has_generator
+from backend.variant_validator import validate_variant
+from utils.question_template import QuestionTemplate, TemplateError
+
+CSV_FIELDS = ["student", "section", "number", "question_id", "source", "text", "answer_key"]
+DUPLICATE_TRIES = 10
+
+# Set in each worker process by _init_worker
+_SECTIONS = []
+_TEMPLATES = {}
+_MODEL_VARIANTS = {}
+_SEED = ""
+_VARIANTS = 1
+
+
+def load_bank(questions_dir, sections=None):
+    """[(section, questions)] in chapter/section order, optionally only the given sections"""
+    bank = []
+    for path in sorted(glob.glob(os.path.join(questions_dir, "chapter*_section*.json"))):
+        with open(path, "r") as f:
+            data = json.load(f)
+        section = str(data.get("section_name", ""))
+        if data["questions"] and (not sections or section in sections):
+            bank.append((section, data["questions"]))
+    return bank
+
+
+def read_roster(path):
+    """Student IDs from a CSV with a student_id/student/id column, or one ID per line"""
+    with open(path, "r", newline="") as f:
+        lines = [line for line in f.read().splitlines() if line.strip()]
+    header = next(csv.reader(lines[:1]), [])
+    column = next((name for name in ("student_id", "student", "id") if name in header), None)
+    if column is None:
+        return [line.strip() for line in lines]
+    return [row[column].strip() for row in csv.DictReader(lines) if row.get(column, "").strip()]
+
+
+def needs_model(question):
+    return "template" not in question and not has_generator(question.get("type"))
+
+
+def _init_worker(sections, model_variants, seed, variants):
+    global _SECTIONS, _MODEL_VARIANTS, _SEED, _VARIANTS
+    _SECTIONS, _MODEL_VARIANTS, _SEED, _VARIANTS = sections, model_variants, seed, variants
+    for _, questions in sections:
+        for question in questions:
+            if "template" in question:
+                try:
+                    _TEMPLATES[question["id"]] = QuestionTemplate(question)
+                except (TemplateError, KeyError, TypeError) as e:
+                    print(f"⚠️ Template for question {question.get('id')} does not compile: {e}")
+
+
+def _variant(question, seed):
+    template = _TEMPLATES.get(question["id"])
+    if template is not None:
+        return template.generate(seed)
+    if has_generator(question.get("type")):
+        return generate_variant(question, seed)
+    variants = _MODEL_VARIANTS.get(question["id"])
+    if variants:
+        return random.Random(seed).choice(variants)
+    return None
+
+
+def answer_key(step):
+    """A step's answers with spacing-only alternatives ("-4, 0, 4" / "-4,0,4") collapsed"""
+    answers = {}
+    for answer in step["valid_answers"]:
+        answers.setdefault(answer.replace(" ", ""), answer)
+    return "; ".join(answers.values())
+
+
+def build_worksheet(student):
+    """All problems of one student's worksheet; runs in a worker process"""
+    problems = []
+    for section, questions in _SECTIONS:
+        texts = set()
+        for number in range(1, _VARIANTS + 1):
+            question = questions[(number - 1) % len(questions)]
+            variant = None
+            for attempt in range(DUPLICATE_TRIES):
+                candidate = _variant(question, f"{_SEED}:{student}:{section}:{number}:{attempt}")
+                if candidate is not None:
+                    variant = candidate
+                    if candidate["text"] not in texts:
+                        break
+            if variant is None:
+                variant = {"text": question["text"], "steps": question.get("steps", []), "source": "bank"}
+            texts.add(variant["text"])
+            problems.append({
+                "section": section,
+                "number": number,
+                "question_id": question["id"],
+                "source": variant.get("source", "llm"),
+                "text": variant["text"],
+                "steps": variant.get("steps", []),
+                "answer_key": [answer_key(step) for step in variant.get("steps", []) if step.get("valid_answers")],
+            })
+    return student, problems
+
+
+async def generate_model_variants(questions, count, concurrency):
+    """count model-written variants per question, at most concurrency calls in flight"""
+    from backend.math_assistant import MathAssistant
+
+    assistant = MathAssistant()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(question):
+        async with semaphore:
+            try:
+                return question["id"], await assistant.agenerate_similar_question(
+                    question["text"], question.get("type"), priority=Priority.BULK, fallback=False
+                )
+            except Exception as e:
+                print(f"⚠️ Failed to generate a variant of {question['id']}: {e}")
+                return question["id"], None
+
+    return await asyncio.gather(*(one(question) for question in questions for _ in range(count)))
+
+
+def model_variants(bank, path, args, executor):
+    """Validated model variants per question ID, loaded from path when a previous run saved them"""
+    questions = [question for _, section_questions in bank for question in section_questions if needs_model(question)]
+    if not questions or args.no_model:
+        return {}
+    if os.path.exists(path):
+        with open(path, "r") as f:
+            saved = json.load(f)
+        if all(question["id"] in saved for question in questions):
+            print(f"🧮 Reusing model variants from {path}")
+            return saved
+
+    print(f"🧮 Generating {args.model_variants} variants for each of {len(questions)} questions "
+          f"(at most {args.llm_concurrency} model calls at a time)...")
+    start = time.perf_counter()
+    generated = asyncio.run(generate_model_variants(questions, args.model_variants, args.llm_concurrency))
+    by_id = {question["id"]: question for question in questions}
+    texts = [(question_id, text) for question_id, text in generated if text]
+    results = executor.map(validate_variant, [text for _, text in texts],
+                           [by_id[question_id].get("type") for question_id, _ in texts])
+    variants, rejected = {question["id"]: [] for question in questions}, 0
+    for (question_id, text), result in zip(texts, results):
+        if result["status"] == "rejected":
+            rejected += 1
+        elif text not in (variant["text"] for variant in variants[question_id]):
+            variants[question_id].append(result["data"] or {"text": text, "steps": [], "source": "llm"})
+    print(f"✅ {sum(len(v) for v in variants.values())} usable model variants, {rejected} rejected, "
+          f"{len(generated) - len(texts)} failed, in {time.perf_counter() - start:.1f}s")
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(variants, f)
+    os.replace(tmp_path, path)
+    return variants
+
+
+def resume_point(out_path, progress_path):
+    """Students already written, after cutting the output back to the last complete student"""
+    done, offset = set(), 0
+    if os.path.exists(progress_path):
+        with open(progress_path, "r") as f:
+            for line in f:
+                student, _, position = line.rstrip("\n").rpartition("\t")
+                if student and position.isdigit():
+                    done.add(student)
+                    offset = int(position)
+    if os.path.exists(out_path):
+        with open(out_path, "r+b") as f:
+            f.truncate(offset)
+    return done
+
+
+class WorksheetWriter:
+    """Streams worksheets to JSONL or CSV and records each finished student's end offset"""
+
+    def __init__(self, out_path, progress_path, append):
+        self.csv = out_path.endswith(".csv")
+        self.out = open(out_path, "a" if append else "w", newline="")
+        self.progress = open(progress_path, "a" if append else "w")
+        self.rows = csv.DictWriter(self.out, CSV_FIELDS) if self.csv else None
+        if self.csv and self.out.tell() == 0:
+            self.rows.writeheader()
+
+    def write(self, student, seed, problems):
+        if self.csv:
+            for problem in problems:
+                self.rows.writerow({
+                    "student": student,
+                    **{field: problem[field] for field in CSV_FIELDS[1:-1]},
+                    "answer_key": " | ".join(problem["answer_key"]),
+                })
+        else:
+            self.out.write(json.dumps({"student": student, "seed": seed, "problems": problems}) + "\n")
+        self.out.flush()
+        # The output is only ever cut back to an offset recorded here, so a student is all or nothing
+        self.progress.write(f"{student}\t{self.out.tell()}\n")
+        self.progress.flush()
+
+    def close(self):
+        self.out.close()
+        self.progress.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    students = parser.add_mutually_exclusive_group(required=True)
+    students.add_argument("--roster", help="CSV with a student_id column, or one student ID per line")
+    students.add_argument("--students", type=int, help="number of anonymous students (student0001, ...)")
+    parser.add_argument("--sections", help="comma-separated sections, e.g. 1.1,1.2 (default: all)")
+    parser.add_argument("--variants", type=int, default=3, help="problems per section per student")
+    parser.add_argument("--seed", default="worksheet", help="course/assessment seed; change it for a new quiz")
+    parser.add_argument("--out", default="worksheets.jsonl", help="output path (.jsonl or .csv)")
+    parser.add_argument("--resume", action="store_true", help="continue an interrupted run of the same command")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--llm-concurrency", type=int, default=8)
+    parser.add_argument("--model-variants", type=int, default=20,
+                        help="model-written variants per question without a template or local generator")
+    parser.add_argument("--no-model", action="store_true", help="use bank text for questions without a generator")
+    parser.add_argument("--questions-dir", default=os.path.join(project_dir, "data", "questions"))
+    parser.add_argument("--target-students", type=int, default=2000, help="class size for the time estimate")
+    args = parser.parse_args()
+
+    sections = set(args.sections.split(",")) if args.sections else None
+    bank = load_bank(args.questions_dir, sections)
+    if not bank:
+        print("❌ No questions found for the requested sections")
+        return
+    roster = read_roster(args.roster) if args.roster else [f"student{i:04d}" for i in range(1, args.students + 1)]
+    progress_path = f"{args.out}.progress"
+    done = resume_point(args.out, progress_path) if args.resume else set()
+    remaining = [student for student in roster if student not in done]
+    if done:
+        print(f"🧮 Resuming: {len(done)} students already written, {len(remaining)} to go")
+
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        variants = model_variants(bank, f"{args.out}.variants.json", args, executor)
+
+    problems_per_student = args.variants * len(bank)
+    print(f"🧮 Writing {len(remaining)} worksheets of {problems_per_student} problems to {args.out} "
+          f"with {args.workers} workers...")
+    writer = WorksheetWriter(args.out, progress_path, append=bool(done))
+    start = last_report = time.perf_counter()
+    written = 0
+    try:
+        with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker,
+                                 initargs=(bank, variants, args.seed, args.variants)) as executor:
+            chunksize = max(1, min(64, len(remaining) // (4 * args.workers)))
+            for student, problems in executor.map(build_worksheet, remaining, chunksize=chunksize):
+                writer.write(student, args.seed, problems)
+                written += 1
+                if time.perf_counter() - last_report > 5:
+                    last_report = time.perf_counter()
+                    print(f"   {written}/{len(remaining)} students, "
+                          f"{written * problems_per_student / (last_report - start):,.0f} problems/s")
+    finally:
+        writer.close()
+
+    elapsed = max(time.perf_counter() - start, 1e-9)
+    rate = written / elapsed
+    print(f"✅ {written} worksheets ({written * problems_per_student} problems) in {elapsed:.2f}s: "
+          f"{rate:,.0f} students/s, {rate * problems_per_student:,.0f} problems/s")
+    if rate:
+        print(f"   {args.target_students} students x {problems_per_student} problems would take "
+              f"~{args.target_students / rate:.1f}s at this rate (after any model variants)")
+
+
+if __name__ == "__main__":
+    main()
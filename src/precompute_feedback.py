@@ -0,0 +1,88 @@
+"""Attach feedback to the common wrong answers of each step.
+
+Run from src/ (e.g. nightly, or after editing the question JSON):
+    python precompute_feedback.py
+Authored feedback comes from the "common_mistakes" of each step in the
+question JSON, e.g. {"answer": "4x^3 - 64", "feedback": "..."}; it is
+stored for the answer's fingerprint whether or not a student has given it
+yet. Then the model writes feedback for the --limit most common wrong
+answers (given at least --min-count times) that have none. The app shows
+it in place of the step's hint, without a model call.
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+project_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(project_dir)
+
+from backend.answer_checker import fingerprint
+from backend.assistant_request import AssistantRequest
+from backend.llm_governor import Priority
+from backend.math_assistant import MathAssistant
+from backend.wrong_answers import AUTHORED, LLM, WRONG_ANSWERS, step_key
+
+
+def store_authored(questions_dir):
+    """Store the feedback of every step's common_mistakes; returns how many were stored"""
+    stored = 0
+    for path in sorted(glob.glob(os.path.join(questions_dir, "chapter*_section*.json"))):
+        with open(path, "r") as f:
+            data = json.load(f)
+        for question in data["questions"]:
+            for step in question.get("steps", []):
+                if not step.get("valid_answers"):
+                    continue
+                for mistake in step.get("common_mistakes", []):
+                    stored += WRONG_ANSWERS.set_feedback(
+                        step_key(step["valid_answers"]), fingerprint(mistake["answer"], step["valid_answers"]),
+                        mistake["feedback"], AUTHORED, mistake["answer"], question["text"], step.get("instruction"),
+                    )
+    return stored
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--questions-dir", default=os.path.join(project_dir, "data", "questions"))
+    parser.add_argument("--min-count", type=int, default=3, help="students who gave a wrong answer")
+    parser.add_argument("--limit", type=int, default=200, help="wrong answers to write feedback for")
+    parser.add_argument("--max-concurrency", type=int, default=16)
+    args = parser.parse_args()
+
+    print(f"✍️ Stored {store_authored(args.questions_dir)} authored feedback entries")
+
+    mistakes = WRONG_ANSWERS.most_common(args.min_count, args.limit)
+    if not mistakes:
+        print("✅ No common wrong answers without feedback")
+        return
+
+    assistant = MathAssistant()
+    requests = [
+        AssistantRequest(question=mistake["question"], help_mode="Conceptual Help", student_input=mistake["example"],
+                         step=mistake["step"], template="wrong_answer")
+        for mistake in mistakes
+    ]
+    print(f"🧮 Writing feedback for {len(requests)} common wrong answers...")
+    start = time.perf_counter()
+    results = assistant.batch_get_answer(
+        [(request, request.help_mode, None, None, Priority.BULK) for request in requests], args.max_concurrency
+    )
+
+    stored = 0
+    for mistake, result in zip(mistakes, results):
+        # Degraded and filtered answers are canned text, not feedback on this mistake
+        if result and not result.get("degraded") and not result.get("filtered"):
+            stored += WRONG_ANSWERS.set_feedback(mistake["step_key"], mistake["fingerprint"], result["answer"], LLM)
+    print(f"✅ Saved feedback for {stored}/{len(requests)} wrong answers to {WRONG_ANSWERS.path} "
+          f"in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Precompute the opening assistant message for every question in the bank.
+
+Run from src/ (e.g. nightly, or after editing the question JSON):
+    python precompute_openings.py
+The answers are written to data/precomputed_answers.json. The app serves
+them as the first help message without calling the model, and as the
+fallback when it sheds load or the model is down.
+"""
+import argparse
+import glob
+import json
+import os
+import re
+import sys
+import time
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+project_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(project_dir)
+
+from backend.assistant_request import OPENING_HELP_MODES, AssistantRequest
+from backend.llm_governor import Priority
+from backend.math_assistant import MathAssistant
+from backend.precomputed_answers import PRECOMPUTED_ANSWERS
+
+
+def bank_requests(questions_dir):
+    """(request key parts, AssistantRequest) for both opening prompts of every question"""
+    for path in sorted(glob.glob(os.path.join(questions_dir, "chapter*_section*.json"))):
+        chapter = int(re.match(r"chapter(\d+)_", os.path.basename(path)).group(1))
+        with open(path, "r") as f:
+            data = json.load(f)
+        section = str(data.get("section_name", ""))
+        for question in data["questions"]:
+            for help_mode in OPENING_HELP_MODES:
+                yield chapter, section, AssistantRequest(question=question["text"], help_mode=help_mode)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--questions-dir", default=os.path.join(project_dir, "data", "questions"))
+    parser.add_argument("--max-concurrency", type=int, default=16)
+    args = parser.parse_args()
+
+    assistant = MathAssistant()
+    requests = list(bank_requests(args.questions_dir))
+    print(f"🧮 Precomputing {len(requests)} opening answers...")
+    start = time.perf_counter()
+    results = assistant.batch_get_answer(
+        [(request, request.help_mode, chapter, section, Priority.BULK) for chapter, section, request in requests],
+        args.max_concurrency,
+    )
+
+    answers = {}
+    for (chapter, section, request), result in zip(requests, results):
+        # Degraded and filtered answers are canned text; served first, they would stick
+        if result and not result.get("degraded") and not result.get("filtered"):
+            key = assistant.request_key(request.retrieval_query(), request.prompt(), chapter, section)
+            answers[key] = {"answer": result["answer"], "sources": result["sources"]}
+    PRECOMPUTED_ANSWERS.save(answers)
+    print(f"✅ Saved {len(answers)}/{len(requests)} answers to {PRECOMPUTED_ANSWERS.path} "
+          f"in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
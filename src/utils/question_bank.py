@@ -0,0 +1,153 @@
+"""Compiled question bank: every data/questions/*.json file in one indexed artifact.
+
+The artifact holds ID -> question record, (chapter, section) -> question IDs
+in file order, each section's generic_hints and the search index of
+question_search.py, so lookups need no file reads or list scans. Each
+question also carries the IDs of its 'related' questions
+(question_similarity.py). It also records the size and mtime of the files it
+was built from, and QuestionLoader reads a section's JSON file instead once
+that file changes. Build it with build_question_bank.py after editing the
+question JSON.
+"""
+import glob
+import json
+import os
+import re
+from typing import Dict, List, Optional, Tuple
+
+from utils.question_search import QuestionSearchIndex, indexed_text, tokenize
+from utils.question_similarity import related_questions
+
+QUESTIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'questions')
+QUESTION_BANK_PATH = os.getenv(
+    "QUESTION_BANK_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'question_bank.json'),
+)
+BANK_VERSION = 2
+
+_FILE_PATTERN = re.compile(r'chapter(\d+)_section(.+)\.json$')
+
+
+def section_key(chapter, section) -> str:
+    return f"{int(chapter)}:{section}"
+
+
+def source_files(questions_dir: str = QUESTIONS_DIR) -> Dict[str, Tuple[int, int]]:
+    """{file name: (size, mtime_ns)} for every section file in questions_dir"""
+    sources = {}
+    for path in sorted(glob.glob(os.path.join(questions_dir, 'chapter*_section*.json'))):
+        stat = os.stat(path)
+        sources[os.path.basename(path)] = (stat.st_size, stat.st_mtime_ns)
+    return sources
+
+
+def compile_question_bank(questions_dir: str = QUESTIONS_DIR) -> Dict:
+    """The bank artifact as a dict; raises ValueError on duplicate question IDs"""
+    sources = source_files(questions_dir)
+    questions, sections, generic_hints = {}, {}, {}
+    for file_name in sources:
+        match = _FILE_PATTERN.match(file_name)
+        if not match:
+            continue
+        chapter, file_section = int(match.group(1)), match.group(2)
+        with open(os.path.join(questions_dir, file_name), 'r') as f:
+            data = json.load(f)
+        # Sections are keyed by the file name, which is what QuestionLoader looks up
+        key = section_key(chapter, file_section)
+        ids = []
+        for question in data['questions']:
+            if question['id'] in questions:
+                raise ValueError(f"Duplicate question ID {question['id']} in {file_name}")
+            questions[question['id']] = dict(question, chapter=chapter, section=file_section)
+            ids.append(question['id'])
+        sections[key] = ids
+        # The section's generic hints are those of its first question that has any
+        generic_hints[key] = next(
+            (question['generic_hints'] for question in data['questions'] if 'generic_hints' in question), []
+        )
+    records = list(questions.values())
+    tokens = [tokenize(indexed_text(question)) for question in records]
+    for question_id, related in related_questions(records, tokens).items():
+        questions[question_id]['related'] = related
+    search = QuestionSearchIndex.build(((q, q['chapter'], q['section']) for q in records), tokens)
+    return {
+        'version': BANK_VERSION,
+        'sources': sources,
+        'questions': questions,
+        'sections': sections,
+        'generic_hints': generic_hints,
+        'search': search.to_dict(),
+    }
+
+
+def build_search_index(questions_dir: str = QUESTIONS_DIR) -> QuestionSearchIndex:
+    """The search index of compile_question_bank() alone, read straight from the JSON files"""
+    records = []
+    for file_name in source_files(questions_dir):
+        match = _FILE_PATTERN.match(file_name)
+        if not match:
+            continue
+        with open(os.path.join(questions_dir, file_name), 'r') as f:
+            data = json.load(f)
+        records.extend((question, int(match.group(1)), match.group(2)) for question in data['questions'])
+    return QuestionSearchIndex.build(records)
+
+
+def write_question_bank(bank: Dict, path: str = QUESTION_BANK_PATH) -> None:
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(bank, f, separators=(',', ':'))
+    os.replace(tmp_path, path)
+
+
+class QuestionBank:
+    """Read-only view of a compiled bank artifact with constant-time lookups"""
+
+    def __init__(self, bank: Dict):
+        self.questions: Dict[str, Dict] = bank['questions']
+        self.sections: Dict[str, List[str]] = bank['sections']
+        self.generic_hints: Dict[str, List[str]] = bank['generic_hints']
+        self.sources = {name: tuple(value) for name, value in bank['sources'].items()}
+        self.search_index = QuestionSearchIndex.from_dict(bank['search'])
+        self._section_questions: Dict[str, List[Dict]] = {}
+
+    @classmethod
+    def load(cls, path: str = QUESTION_BANK_PATH, questions_dir: str = QUESTIONS_DIR) -> Optional['QuestionBank']:
+        """The artifact at path, or None if it is missing or from another bank version"""
+        try:
+            with open(path, 'r') as f:
+                bank = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            print(f"Warning: Could not read question bank {path}: {e}")
+            return None
+        if bank.get('version') != BANK_VERSION:
+            return None
+        bank = cls(bank)
+        if bank.is_stale(questions_dir):
+            print(f"Warning: {path} is out of date; run build_question_bank.py. Changed sections are read from JSON.")
+        return bank
+
+    def is_stale(self, questions_dir: str = QUESTIONS_DIR) -> bool:
+        return source_files(questions_dir) != self.sources
+
+    def get(self, question_id: str) -> Optional[Dict]:
+        return self.questions.get(question_id)
+
+    def has_section(self, chapter, section) -> bool:
+        return section_key(chapter, section) in self.sections
+
+    def section_ids(self, chapter, section) -> List[str]:
+        return self.sections.get(section_key(chapter, section), [])
+
+    def section_questions(self, chapter, section) -> List[Dict]:
+        key = section_key(chapter, section)
+        questions = self._section_questions.get(key)
+        if questions is None:
+            questions = [self.questions[question_id] for question_id in self.sections.get(key, [])]
+            self._section_questions[key] = questions
+        return questions
+
+    def section_generic_hints(self, chapter, section) -> List[str]:
+        return self.generic_hints.get(section_key(chapter, section), [])
@@ -1,12 +1,70 @@
 import json
 import os
 import re
-from typing import Dict, List, Optional
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from utils.question_bank import QUESTION_BANK_PATH, QUESTIONS_DIR, QuestionBank, build_search_index, source_files
+from utils.question_search import QuestionSearchIndex
+from utils.question_store import LazyQuestion, QuestionStore, deep_sizeof
+from utils.question_template import QuestionTemplate, TemplateError
+
+QUESTION_CACHE_BYTES = int(os.getenv("QUESTION_CACHE_BYTES", 64 * 1024 * 1024))
+# How long a cached section is trusted before its file is stat()ed again
+QUESTION_CHECK_SECONDS = float(os.getenv("QUESTION_CHECK_SECONDS", 1.0))
+# A QUESTION_BANK_PATH with one of these extensions is a SQLite store (question_store.py)
+STORE_EXTENSIONS = ('.sqlite3', '.sqlite', '.db')
+
+
+class _SectionEntry:
+    """One cached section: its questions, the file state they came from and their size"""
+
+    __slots__ = ('questions', 'by_id', 'signature', 'nbytes', 'checked_at')
+
+    def __init__(self, questions: List[Dict], signature: Tuple[int, int], nbytes: int):
+        self.questions = questions
+        self.by_id = {q['id']: q for q in questions}
+        self.signature = signature
+        self.nbytes = nbytes
+        self.checked_at = time.monotonic()
+
 
 class QuestionLoader:
-    def __init__(self):
-        self.questions_cache: Dict[str, List[Dict]] = {}
-        self.base_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'questions')
+    """Section questions from the compiled bank or the JSON files, shared by all sessions
+
+    Each cached section remembers the size and mtime of its file and is
+    re-validated at most every check_seconds; a changed file is parsed in
+    full and then swapped in, so readers see either the old or the new
+    section, never a mix. Sections are accounted by approximate memory and
+    the least recently used ones are evicted beyond max_bytes. Fields a
+    SQLite store question decodes later (question_store.py) are charged to
+    its section as they are decoded. Sections served from the JSON bank
+    share its records, so they are charged only their question list; the
+    bank itself is reported separately as bank_bytes.
+    """
+
+    def __init__(self, bank_path: str = QUESTION_BANK_PATH, questions_dir: str = QUESTIONS_DIR,
+                 max_bytes: int = QUESTION_CACHE_BYTES, check_seconds: float = QUESTION_CHECK_SECONDS):
+        self.questions_cache: "OrderedDict[str, _SectionEntry]" = OrderedDict()
+        self.templates: Dict[str, Optional[QuestionTemplate]] = {}
+        self.base_path = questions_dir
+        self.max_bytes = max_bytes
+        self.check_seconds = check_seconds
+        self.current_bytes = 0
+        self.counts = {'hits': 0, 'loads': 0, 'reloads': 0, 'evictions': 0}
+        self._lock = threading.Lock()
+        self._search_index: Optional[QuestionSearchIndex] = None
+        self._search_sources = None
+        self._search_checked_at = 0.0
+        self._bank_bytes = None
+        # Compiled bank (build_question_bank.py); sections whose file changed since are read from JSON
+        if bank_path.endswith(STORE_EXTENSIONS):
+            self.bank = QuestionStore.load(bank_path)
+        else:
+            self.bank = QuestionBank.load(bank_path, self.base_path)
     
     def _sanitize_section_name(self, section: str) -> str:
         """Convert section name to a valid filename."""
@@ -20,36 +78,169 @@ class QuestionLoader:
     def load_section_questions(self, chapter: int, section: str) -> List[Dict]:
         """Load all questions for a given chapter and section."""
         print("DEBUG: load_section_questions called with chapter =", chapter, "section =", section)
-        # Sanitize the section name
+        entry = self._section(chapter, section)
+        return entry.questions if entry else []
+
+    def _section(self, chapter: int, section: str) -> Optional[_SectionEntry]:
+        """The cached section, reloaded first if its file changed; None if there is no such file"""
         sanitized_section = self._sanitize_section_name(str(section))
-        print("DEBUG: Sanitized section =", sanitized_section)
         file_name = f"chapter{chapter}_section{sanitized_section}.json"
-        file_path = os.path.join(self.base_path, file_name)
-        print("DEBUG: Trying to load file:", file_path)
         cache_key = f"{chapter}_{sanitized_section}"
-        if cache_key in self.questions_cache:
-            return self.questions_cache[cache_key]
+        with self._lock:
+            entry = self.questions_cache.get(cache_key)
+            if entry is not None:
+                self.questions_cache.move_to_end(cache_key)
+                if time.monotonic() - entry.checked_at < self.check_seconds:
+                    self.counts['hits'] += 1
+                    return entry
+        signature = self._signature(file_name)
+        if entry is not None and entry.signature == signature:
+            entry.checked_at = time.monotonic()
+            with self._lock:
+                self.counts['hits'] += 1
+            return entry
+        if signature is None:
+            print(f"Warning: No questions found for Chapter {chapter}, Section {sanitized_section}")
+            self._replace(cache_key, None)
+            return None
+
+        # Parse outside the lock; concurrent reloads of one section just do the work twice
+        if self.bank is not None and self.bank.sources.get(file_name) == signature:
+            questions = self.bank.section_questions(chapter, sanitized_section)
+        else:
+            try:
+                file_path = os.path.join(self.base_path, file_name)
+                print("DEBUG: Trying to load file:", file_path)
+                with open(file_path, 'r') as f:
+                    questions = json.load(f)['questions']
+            except Exception as e:
+                print(f"Error loading questions: {e}")
+                return entry
+        if isinstance(self.bank, QuestionBank) and self.bank.sources.get(file_name) == signature:
+            # The records belong to the bank, which stays resident; evicting the section frees only its list
+            nbytes = sys.getsizeof(questions)
+        else:
+            nbytes = deep_sizeof(questions)
+        new_entry = _SectionEntry(questions, signature, nbytes)
+        for question in questions:
+            if isinstance(question, LazyQuestion):
+                question.on_decode = lambda decoded, entry=new_entry: self._charge(cache_key, entry, decoded)
+        self._replace(cache_key, new_entry, reload=entry is not None)
+        return new_entry
+
+    def _signature(self, file_name: str) -> Optional[Tuple[int, int]]:
         try:
-            with open(file_path, 'r') as f:
-                data = json.load(f)
-                self.questions_cache[cache_key] = data['questions']
-                return data['questions']
+            stat = os.stat(os.path.join(self.base_path, file_name))
         except FileNotFoundError:
-            print(f"Warning: No questions found for Chapter {chapter}, Section {sanitized_section}")
-            return []
-        except Exception as e:
-            print(f"Error loading questions: {e}")
-            return []
-    
+            return None
+        return stat.st_size, stat.st_mtime_ns
+
+    def _replace(self, cache_key: str, entry: Optional[_SectionEntry], reload: bool = False) -> None:
+        with self._lock:
+            old = self.questions_cache.pop(cache_key, None)
+            if old is not None:
+                self.current_bytes -= old.nbytes
+                for question_id in old.by_id:
+                    self.templates.pop(question_id, None)
+            if entry is None:
+                return
+            self.questions_cache[cache_key] = entry
+            self.current_bytes += entry.nbytes
+            self.counts['reloads' if reload else 'loads'] += 1
+            self._evict()
+
+    def _charge(self, cache_key: str, entry: _SectionEntry, nbytes: int) -> None:
+        """Account for a field a lazily decoded question of entry decoded after loading"""
+        with self._lock:
+            entry.nbytes += nbytes
+            if self.questions_cache.get(cache_key) is entry:
+                self.current_bytes += nbytes
+                self._evict()
+
+    def _evict(self) -> None:
+        # Least recently used sections go first; the most recently used one always stays
+        while self.current_bytes > self.max_bytes and len(self.questions_cache) > 1:
+            _, evicted = self.questions_cache.popitem(last=False)
+            self.current_bytes -= evicted.nbytes
+            for question_id in evicted.by_id:
+                self.templates.pop(question_id, None)
+            self.counts['evictions'] += 1
+
+    def search_questions(self, query: str, limit: int = 10) -> List[Dict]:
+        """Questions whose text, step instructions or formulas match query (see question_search.py)."""
+        return self._get_search_index().search(query, limit)
+
+    def _get_search_index(self) -> QuestionSearchIndex:
+        # The bank's index while every section file still matches it; otherwise (no bank, or a
+        # file edited since it was built) index the JSON files in-process, again whenever one changes
+        now = time.monotonic()
+        if self._search_index is None or now - self._search_checked_at >= self.check_seconds:
+            self._search_checked_at = now
+            sources = source_files(self.base_path)
+            if self.bank is not None and sources == self.bank.sources:
+                self._search_index = self.bank.search_index
+                self._search_sources = sources
+            elif sources != self._search_sources:
+                self._search_index = build_search_index(self.base_path)
+                self._search_sources = sources
+        return self._search_index
+
+    def stats(self) -> Dict:
+        # The JSON bank is loaded once and never changes, so it is measured once
+        if self._bank_bytes is None:
+            self._bank_bytes = deep_sizeof(self.bank.questions) if isinstance(self.bank, QuestionBank) else 0
+        with self._lock:
+            return {
+                'sections': len(self.questions_cache),
+                'bytes': self.current_bytes,
+                'bank_bytes': self._bank_bytes,
+                'section_bytes': {key: entry.nbytes for key, entry in self.questions_cache.items()},
+                **self.counts,
+            }
+
+    def get_question_generator(self, question: Dict) -> Optional[QuestionTemplate]:
+        """The compiled template of a question, or None if it has none (compiled once, on first use)."""
+        if 'template' not in question:
+            return None
+        if question['id'] not in self.templates:
+            try:
+                self.templates[question['id']] = QuestionTemplate(question)
+            except (TemplateError, KeyError, TypeError) as e:
+                print(f"Error compiling template for question {question.get('id')}: {e}")
+                self.templates[question['id']] = None
+        return self.templates[question['id']]
+
+    def generate_question(self, question: Dict, seed=None) -> Optional[Dict]:
+        """One instance (text, steps with valid_answers) of a templated question."""
+        template = self.get_question_generator(question)
+        return template.generate(seed) if template else None
+
     def get_question_by_id(self, question_id: str) -> Optional[Dict]:
-        """Get a specific question by its ID (format: chapter.section.question)."""
+        """Get a specific question by its ID (format: chapter.section.question, e.g. 1.1.1)."""
         try:
-            chapter, section, _ = question_id.split('.')
-            questions = self.load_section_questions(int(chapter), section)
-            return next((q for q in questions if q['id'] == question_id), None)
+            # The section is everything between the chapter and the question number ("1.1" in "1.1.1")
+            section, _ = question_id.rsplit('.', 1)
+            chapter = section.split('.')[0]
+            entry = self._section(int(chapter), section)
+            return entry.by_id.get(question_id) if entry else None
         except Exception as e:
             print(f"Error getting question by ID: {e}")
             return None
+
+    def get_related_questions(self, question: Dict) -> List[Dict]:
+        """The questions compiled as related to question that are still in the bank (none without a bank)."""
+        related = (self.get_question_by_id(question_id) for question_id in question.get('related', []))
+        return [related_question for related_question in related if related_question is not None]
+
+    def get_generic_hints(self, chapter: int, section: str) -> List[str]:
+        """The section's generic hints: those of its first question that has any."""
+        entry = self._section(chapter, section)
+        if entry is None:
+            return []
+        sanitized_section = self._sanitize_section_name(str(section))
+        if self.bank is not None and entry.signature == self.bank.sources.get(f"chapter{chapter}_section{sanitized_section}.json"):
+            return self.bank.section_generic_hints(chapter, sanitized_section)
+        return next((q['generic_hints'] for q in entry.questions if 'generic_hints' in q), [])
     
     def get_question_steps(self, question_id: str) -> Optional[List[Dict]]:
         """Get the steps for a specific question."""
@@ -68,4 +259,18 @@ class QuestionLoader:
             'structure': question['text'],
             'steps': question['steps']
         }
-        return template 
+        return template
+
+
+_LOADER = None
+_LOADER_LOCK = threading.Lock()
+
+
+def get_question_loader() -> QuestionLoader:
+    """The question loader shared by every session in this process"""
+    global _LOADER
+    if _LOADER is None:
+        with _LOADER_LOCK:
+            if _LOADER is None:
+                _LOADER = QuestionLoader()
+    return _LOADER
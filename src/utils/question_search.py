@@ -0,0 +1,121 @@
+"""Inverted index over question text, step instructions and normalized formulas.
+
+Built by compile_question_bank() and stored in the bank artifact, so a
+search only looks up postings. Formulas are normalized before indexing
+("x^4 - 32x^2", "x^4-32x^2" and "x**4 - 32*x^2" are one token) and also
+indexed term by term ("32x^2"), so students can find a question by the
+expression they are looking at. Every query token matches as a prefix
+("deriv", "x^4 - 3"), and a question must match all tokens.
+"""
+import bisect
+import functools
+import re
+from typing import Dict, FrozenSet, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+# Runs of operands joined by operators, e.g. "f(x) = x^4 - 32x^2"; or a single power such as "32x^2"
+_FORMULA_PATTERN = re.compile(r"[\w^().]+(?:\s*(?:[-+*/=]|\*\*)\s*[\w^().]+)+|\w*\^\w+")
+_WORD_PATTERN = re.compile(r"[a-z0-9]+")
+_STOP_WORDS = {"a", "an", "and", "as", "at", "by", "each", "for", "in", "is", "it", "of", "on", "or", "the",
+               "to", "with"}
+MIN_PREFIX_LENGTH = 2
+# Posting sets kept per index for recently queried tokens (common words match most of the bank)
+MATCH_CACHE_SIZE = 512
+
+
+def normalize_formula(formula: str) -> str:
+    """Spacing, "*" and "**" removed, so equal expressions share one token"""
+    return formula.lower().replace("**", "^").replace("*", "").replace(" ", "").strip(".,;:")
+
+
+def tokenize(text: str) -> List[str]:
+    """Formula tokens (whole sides of "=" and their +/- terms) and lowercase words, in order"""
+    tokens = []
+    for match in _FORMULA_PATTERN.finditer(text):
+        for side in normalize_formula(match.group(0)).split("="):
+            if not side:
+                continue
+            tokens.append(side)
+            terms = [term.lstrip("+-") for term in re.split(r"(?=[-+])", side)]
+            tokens.extend(term for term in terms if term and term != side)
+    for word in _WORD_PATTERN.findall(_FORMULA_PATTERN.sub(" ", text).lower()):
+        if word not in _STOP_WORDS and (len(word) > 1 or word.isdigit()):
+            tokens.append(word)
+    return tokens
+
+
+def indexed_text(question: Mapping) -> str:
+    instructions = " ".join(step.get("instruction", "") for step in question.get("steps", []))
+    return f"{question['text']} {instructions}"
+
+
+class QuestionSearchIndex:
+    """docs: [[id, chapter, section, text]]; postings: token -> ascending doc numbers"""
+
+    def __init__(self, docs: List[List], postings: Dict[str, List[int]]):
+        self.docs = docs
+        self.postings = postings
+        self.terms = sorted(postings)
+        self._matching = functools.lru_cache(maxsize=MATCH_CACHE_SIZE)(self._match_prefix)
+        self._exact = functools.lru_cache(maxsize=MATCH_CACHE_SIZE)(self._match_exact)
+
+    @classmethod
+    def build(cls, questions: Iterable[Mapping], tokens: Optional[Sequence[List[str]]] = None) -> "QuestionSearchIndex":
+        """Index of (question, chapter, section) records, in the order given, optionally already tokenized"""
+        docs, postings = [], {}
+        for number, (question, chapter, section) in enumerate(questions):
+            docs.append([question["id"], chapter, section, question["text"]])
+            question_tokens = tokens[number] if tokens is not None else tokenize(indexed_text(question))
+            for token in set(question_tokens):
+                postings.setdefault(token, []).append(number)
+        return cls(docs, postings)
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "QuestionSearchIndex":
+        return cls(data["docs"], data["postings"])
+
+    def to_dict(self) -> Dict:
+        return {"docs": self.docs, "postings": self.postings}
+
+    def _match_exact(self, token: str) -> Tuple[Sequence[int], FrozenSet[int]]:
+        docs = self.postings.get(token, ())
+        return docs, frozenset(docs)
+
+    def _match_prefix(self, token: str) -> Tuple[Sequence[int], FrozenSet[int]]:
+        """Docs with a token starting with token (only exact matches for very short tokens)"""
+        if len(token) < MIN_PREFIX_LENGTH:
+            return self._exact(token)
+        docs = set()
+        position = bisect.bisect_left(self.terms, token)
+        while position < len(self.terms) and self.terms[position].startswith(token):
+            docs.update(self.postings[self.terms[position]])
+            position += 1
+        return sorted(docs), frozenset(docs)
+
+    @staticmethod
+    def _first(matches: List[Tuple[Sequence[int], FrozenSet[int]]], limit: int, skip=frozenset()) -> List[int]:
+        """The first limit docs, in bank order, that are in every match and not in skip"""
+        ordered, _ = min(matches, key=lambda match: len(match[0]))
+        others = [docs for _, docs in matches]
+        found = []
+        for doc in ordered:
+            if doc not in skip and all(doc in docs for docs in others):
+                found.append(doc)
+                if len(found) == limit:
+                    break
+        return found
+
+    def search(self, query: str, limit: int = 10) -> List[Dict]:
+        """Questions matching every query token; those matching all of them exactly come first, then bank order"""
+        # A lone digit or letter the bank never uses on its own, e.g. the "3" of "x^4 - 3", is still being typed
+        tokens = [token for token in dict.fromkeys(tokenize(query))
+                  if len(token) >= MIN_PREFIX_LENGTH or token in self.postings]
+        if not tokens:
+            return []
+        # Walking the rarest posting list in order stops as soon as limit docs are found
+        ranked = self._first([self._exact(token) for token in tokens], limit)
+        if len(ranked) < limit:
+            ranked += self._first([self._matching(token) for token in tokens], limit - len(ranked), frozenset(ranked))
+        return [
+            {"id": question_id, "chapter": chapter, "section": section, "text": text}
+            for question_id, chapter, section, text in (self.docs[doc] for doc in ranked)
+        ]
@@ -0,0 +1,117 @@
+"""Related authored questions, precomputed when the bank is compiled.
+
+Each question is a TF-IDF vector over the tokens question_search indexes
+(words and normalized formulas, from its text and step instructions), so
+this needs no model and works offline. compile_question_bank() stores the
+nearest questions of the same type in each question's 'related' field, and
+the question page offers them without any work per request.
+"""
+import os
+from collections import Counter
+from typing import Dict, List, Mapping, Optional, Sequence
+
+import numpy as np
+
+from utils.question_search import indexed_text, tokenize
+
+RELATED_QUESTIONS = int(os.getenv("RELATED_QUESTIONS", "5"))
+# Cosine similarity below which a question is not offered as related
+MIN_SIMILARITY = 0.2
+# Rows of the similarity matrix computed at a time, bounding memory to _BLOCK_ROWS x questions
+_BLOCK_ROWS = 256
+# Terms in at least 1/_DENSE_FRACTION of the questions ("find", "critical") go through one BLAS product;
+# the rest are summed along their postings, which costs only their document frequency squared
+_DENSE_FRACTION = 32
+
+
+class TfidfVectors:
+    """Sparse L2-normalized rows of sublinear TF x smoothed IDF, one per token list, as (row, column, weight)"""
+
+    def __init__(self, documents: Sequence[Sequence[str]]):
+        counts = [Counter(tokens) for tokens in documents]
+        document_frequency = Counter(token for count in counts for token in count)
+        # A token only one question uses adds nothing to any pair's similarity
+        vocabulary = {token: column for column, token in
+                      enumerate(token for token, df in document_frequency.items() if df > 1)}
+        rows, columns, tf = [], [], []
+        for row, count in enumerate(counts):
+            for token, n in count.items():
+                column = vocabulary.get(token)
+                if column is not None:
+                    rows.append(row)
+                    columns.append(column)
+                    tf.append(n)
+        self.shape = (len(documents), len(vocabulary))
+        self.rows = np.array(rows, dtype=np.int64)
+        self.columns = np.array(columns, dtype=np.int64)
+        self.document_frequency = np.array([document_frequency[token] for token in vocabulary], dtype=np.int64)
+        idf = np.log((1 + len(documents)) / (1 + self.document_frequency)) + 1
+        weights = np.log1p(np.array(tf, dtype=np.float64)) * idf[self.columns]
+        norms = np.sqrt(np.bincount(self.rows, weights ** 2, minlength=len(documents)))
+        self.weights = (weights / norms[self.rows]) if len(weights) else weights
+
+
+def nearest_neighbors(vectors: TfidfVectors, k: int, min_similarity: float = MIN_SIMILARITY) -> List[List[int]]:
+    """For each row, up to k other rows by descending cosine similarity"""
+    total, width = vectors.shape
+    k = min(k, total - 1)
+    if k <= 0:
+        return [[] for _ in range(total)]
+    dense_columns = vectors.document_frequency * _DENSE_FRACTION >= total
+    is_dense = dense_columns[vectors.columns]
+    # The common terms as a dense matrix
+    dense_index = np.cumsum(dense_columns) - 1
+    dense = np.zeros((total, int(dense_columns.sum())), dtype=np.float32)
+    dense[vectors.rows[is_dense], dense_index[vectors.columns[is_dense]]] = vectors.weights[is_dense]
+    # The other terms' postings, grouped by column
+    rows, columns, weights = vectors.rows[~is_dense], vectors.columns[~is_dense], vectors.weights[~is_dense]
+    order = np.argsort(columns, kind="stable")
+    posting_rows, posting_weights = rows[order], weights[order]
+    posting_starts = np.concatenate(([0], np.cumsum(np.bincount(columns, minlength=width))))
+    row_starts = np.concatenate(([0], np.cumsum(np.bincount(rows, minlength=total))))
+
+    neighbors = []
+    for start in range(0, total, _BLOCK_ROWS):
+        stop = min(start + _BLOCK_ROWS, total)
+        similarity = (dense[start:stop] @ dense.T).astype(np.float64)
+        # Every (block row, term) entry adds its weight times the term's postings
+        entries = slice(row_starts[start], row_starts[stop])
+        entry_rows, entry_columns, entry_weights = rows[entries] - start, columns[entries], weights[entries]
+        lengths = posting_starts[entry_columns + 1] - posting_starts[entry_columns]
+        offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        postings = np.repeat(posting_starts[entry_columns], lengths) + offsets
+        cells = np.repeat(entry_rows, lengths) * total + posting_rows[postings]
+        similarity += np.bincount(cells, np.repeat(entry_weights, lengths) * posting_weights[postings],
+                                  minlength=(stop - start) * total).reshape(stop - start, total)
+
+        block = np.arange(stop - start)
+        similarity[block, block + start] = -1
+        top = np.argpartition(-similarity, k - 1, axis=1)[:, :k]
+        scores = np.take_along_axis(similarity, top, axis=1)
+        order = np.argsort(-scores, axis=1, kind="stable")
+        top, scores = np.take_along_axis(top, order, axis=1), np.take_along_axis(scores, order, axis=1)
+        neighbors.extend(row[score >= min_similarity].tolist() for row, score in zip(top, scores))
+    return neighbors
+
+
+def related_questions(questions: Sequence[Mapping], tokens: Optional[Sequence[List[str]]] = None,
+                      k: int = RELATED_QUESTIONS) -> Dict[str, List[str]]:
+    """Question ID -> IDs of up to k most similar questions of the same type"""
+    if tokens is None:
+        tokens = [tokenize(indexed_text(question)) for question in questions]
+    by_type: Dict[str, List[int]] = {}
+    for number, question in enumerate(questions):
+        by_type.setdefault(question.get("type"), []).append(number)
+    related = {}
+    for group in by_type.values():
+        # Questions with identical tokens are one vector: they would only point at each other
+        distinct: Dict[tuple, List[str]] = {}
+        for number in group:
+            distinct.setdefault(tuple(sorted(tokens[number])), []).append(questions[number]["id"])
+        members = list(distinct.values())
+        neighbors = nearest_neighbors(TfidfVectors(list(distinct)), k)
+        for ids, rows in zip(members, neighbors):
+            nearest = [members[row][0] for row in rows]
+            for question_id in ids:
+                related[question_id] = nearest
+    return related
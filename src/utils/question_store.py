@@ -0,0 +1,216 @@
+"""SQLite question-bank storage whose questions decode their fields lazily.
+
+An alternative to the JSON bank artifact (question_bank.py) for large banks.
+Listing a section reads only each question's id, type and text. Every other
+field (steps, generic_steps, generic_hints, template, ...) is stored as its
+own JSON value and is fetched and decoded the first time a page reads it.
+The question list page therefore never parses steps, and step mode parses
+only the question it shows. Build it with
+    python build_question_bank.py --out data/question_bank.sqlite3
+and point QUESTION_BANK_PATH at it.
+"""
+import json
+import os
+import sqlite3
+import sys
+import threading
+from collections.abc import Mapping
+from typing import Dict, List, Optional
+
+from utils.question_bank import BANK_VERSION, section_key
+from utils.question_search import QuestionSearchIndex
+
+_SCHEMA = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE sections (key TEXT PRIMARY KEY, generic_hints TEXT NOT NULL);
+CREATE TABLE questions (
+    id TEXT PRIMARY KEY,
+    section_key TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    type TEXT,
+    text TEXT NOT NULL,
+    fields TEXT NOT NULL
+);
+CREATE TABLE question_fields (
+    question_id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    value TEXT NOT NULL,
+    PRIMARY KEY (question_id, name)
+) WITHOUT ROWID;
+CREATE INDEX questions_by_section ON questions (section_key, position);
+"""
+_EAGER_FIELDS = ('id', 'type', 'text')
+
+
+def write_question_store(bank: Dict, path: str) -> None:
+    """Write a compiled bank (compile_question_bank()) as a SQLite store, replacing path atomically"""
+    tmp_path = f"{path}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    db = sqlite3.connect(tmp_path)
+    try:
+        db.executescript(_SCHEMA)
+        db.execute("INSERT INTO meta VALUES ('version', ?)", (str(bank['version']),))
+        db.execute("INSERT INTO meta VALUES ('sources', ?)", (json.dumps(bank['sources']),))
+        db.execute("INSERT INTO meta VALUES ('search', ?)", (json.dumps(bank['search']),))
+        db.executemany(
+            "INSERT INTO sections VALUES (?, ?)",
+            ((key, json.dumps(hints)) for key, hints in bank['generic_hints'].items()),
+        )
+        for key, question_ids in bank['sections'].items():
+            for position, question_id in enumerate(question_ids):
+                question = bank['questions'][question_id]
+                lazy = [name for name in question if name not in _EAGER_FIELDS]
+                db.execute(
+                    "INSERT INTO questions VALUES (?, ?, ?, ?, ?, ?)",
+                    (question_id, key, position, question.get('type'), question['text'], ','.join(lazy)),
+                )
+                db.executemany(
+                    "INSERT INTO question_fields VALUES (?, ?, ?)",
+                    ((question_id, name, json.dumps(question[name])) for name in lazy),
+                )
+        db.commit()
+    finally:
+        db.close()
+    os.replace(tmp_path, path)
+
+
+def deep_sizeof(value) -> int:
+    """Approximate memory held by parsed JSON (dicts, lists, strings, numbers)
+
+    A LazyQuestion reports only the fields decoded so far.
+    """
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(deep_sizeof(k) + deep_sizeof(v) for k, v in value.items())
+    elif isinstance(value, list):
+        size += sum(deep_sizeof(item) for item in value)
+    return size
+
+
+class LazyQuestion(Mapping):
+    """Read-only question record; fields other than id/type/text are decoded on first access
+
+    on_decode, if set, is called with the size (deep_sizeof) of each field
+    as it is decoded, so a cache holding the question can account for it.
+    """
+
+    __slots__ = ('_store', '_values', '_lazy', '_decoded_bytes', 'on_decode')
+
+    def __init__(self, store: 'QuestionStore', question_id: str, question_type: Optional[str], text: str,
+                 lazy_fields: str):
+        self._store = store
+        self._values = {'id': question_id, 'type': question_type, 'text': text}
+        if question_type is None:
+            del self._values['type']
+        self._lazy = tuple(name for name in lazy_fields.split(',') if name)
+        self._decoded_bytes = 0
+        self.on_decode = None
+
+    def __getitem__(self, name):
+        try:
+            return self._values[name]
+        except KeyError:
+            if name not in self._lazy:
+                raise
+        value = self._store.field(self._values['id'], name)
+        if name in self._values:  # decoded by another thread meanwhile; count it once
+            return self._values[name]
+        self._values[name] = value
+        nbytes = sys.getsizeof(name) + deep_sizeof(value)
+        self._decoded_bytes += nbytes
+        if self.on_decode is not None:
+            self.on_decode(nbytes)
+        return value
+
+    def __contains__(self, name):
+        return name in self._values or name in self._lazy
+
+    def __iter__(self):
+        yield from (name for name in _EAGER_FIELDS if name in self._values)
+        yield from self._lazy
+
+    def __len__(self):
+        return len(self._values) + sum(1 for name in self._lazy if name not in self._values)
+
+    def __sizeof__(self):
+        # Counts only what has been decoded so far, which is the point of being lazy
+        eager = sum(sys.getsizeof(self._values[name]) for name in _EAGER_FIELDS if name in self._values)
+        return object.__sizeof__(self) + sys.getsizeof(self._values) + eager + self._decoded_bytes
+
+    def to_dict(self) -> Dict:
+        return {name: self[name] for name in self}
+
+    def __repr__(self):
+        return f"LazyQuestion({self._values['id']!r})"
+
+
+class QuestionStore:
+    """Read-only access to a SQLite store, with the same interface QuestionLoader uses on QuestionBank"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._search_index = None
+        meta = dict(self._db().execute("SELECT key, value FROM meta").fetchall())
+        self.version = int(meta.get('version', 1))
+        self.sources = {name: tuple(value) for name, value in json.loads(meta['sources']).items()}
+
+    @classmethod
+    def load(cls, path: str) -> Optional['QuestionStore']:
+        if not os.path.exists(path):
+            return None
+        try:
+            store = cls(path)
+        except sqlite3.Error as e:
+            print(f"Warning: Could not read question store {path}: {e}")
+            return None
+        return store if store.version == BANK_VERSION else None
+
+    def _db(self) -> sqlite3.Connection:
+        # sqlite3 connections are per thread; Streamlit serves sessions from several
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+            self._local.db = db
+        return db
+
+    @property
+    def search_index(self) -> QuestionSearchIndex:
+        # Decoded on the first search rather than at startup
+        if self._search_index is None:
+            row = self._db().execute("SELECT value FROM meta WHERE key = 'search'").fetchone()
+            self._search_index = QuestionSearchIndex.from_dict(json.loads(row[0]))
+        return self._search_index
+
+    def field(self, question_id: str, name: str):
+        row = self._db().execute(
+            "SELECT value FROM question_fields WHERE question_id = ? AND name = ?", (question_id, name)
+        ).fetchone()
+        if row is None:
+            raise KeyError(name)
+        return json.loads(row[0])
+
+    def get(self, question_id: str) -> Optional[LazyQuestion]:
+        row = self._db().execute(
+            "SELECT id, type, text, fields FROM questions WHERE id = ?", (question_id,)
+        ).fetchone()
+        return LazyQuestion(self, *row) if row else None
+
+    def has_section(self, chapter, section) -> bool:
+        return self._db().execute(
+            "SELECT 1 FROM sections WHERE key = ?", (section_key(chapter, section),)
+        ).fetchone() is not None
+
+    def section_questions(self, chapter, section) -> List[LazyQuestion]:
+        rows = self._db().execute(
+            "SELECT id, type, text, fields FROM questions WHERE section_key = ? ORDER BY position",
+            (section_key(chapter, section),),
+        ).fetchall()
+        return [LazyQuestion(self, *row) for row in rows]
+
+    def section_generic_hints(self, chapter, section) -> List[str]:
+        row = self._db().execute(
+            "SELECT generic_hints FROM sections WHERE key = ?", (section_key(chapter, section),)
+        ).fetchone()
+        return json.loads(row[0]) if row else []
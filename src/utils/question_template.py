@@ -0,0 +1,184 @@
+"""Parameterized question templates, compiled once into fast instance generators.
+
+A question may carry an optional "template" block describing a family of
+problems:
+
+    "template": {
+        "variables": {"a": {"range": [2, 9]}, "s": {"choices": [-1, 1]}},
+        "constraints": ["a != 5"],
+        "derived": {"c": "2 * a**2"},
+        "text": "Find the critical points of f(x) = x^4 - {c}x^2.",
+        "steps": [
+            {"valid_answers": ["4x^3 - {2 * c}x", "4x^3-{2 * c}x"]},
+            ...
+        ]
+    }
+
+Variables are drawn from their domains ("range" is inclusive, with optional
+"step" and "exclude"; "choices" or a bare list gives the values). Derived
+values are computed in order from the variables. An instance is redrawn
+until every constraint holds. Strings may contain {expression} placeholders
+over all of these names, using arithmetic, comparisons, conditional
+expressions and abs/min/max/gcd/signed ("+ 3" or "- 3", for writing terms).
+Write {{ and }} for literal braces. Template steps are merged by index over
+the question's own steps. A field the template leaves out is kept as is,
+except the placeholder, which would show the original question's answer.
+"""
+import ast
+import math
+import random
+import re
+from typing import Dict, List, Optional
+
+
+class TemplateError(ValueError):
+    """A template block that cannot be compiled"""
+
+
+def signed(value) -> str:
+    """Value as a term to append after another one: "+ 3", "- 3" """
+    return f"- {format_value(-value)}" if value < 0 else f"+ {format_value(value)}"
+
+
+_FUNCTIONS = {"abs": abs, "min": min, "max": max, "gcd": math.gcd, "signed": signed}
+
+_ALLOWED_NODES = (
+    ast.Expression, ast.BinOp, ast.UnaryOp, ast.BoolOp, ast.Compare, ast.IfExp, ast.Call, ast.Name, ast.Load,
+    ast.Constant, ast.operator, ast.unaryop, ast.boolop, ast.cmpop,
+)
+_PLACEHOLDER_PATTERN = re.compile(r"\{\{|\}\}|\{([^{}]+)\}")
+_STEP_FIELDS = ("instruction", "hint", "format", "placeholder")
+
+
+def format_value(value) -> str:
+    """Numbers as a student would write them: 4 rather than 4.0"""
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    if isinstance(value, float):
+        return f"{value:g}"
+    return str(value)
+
+
+def _compile_expression(source: str, names: set):
+    try:
+        tree = ast.parse(source.strip(), mode="eval")
+    except SyntaxError as e:
+        raise TemplateError(f"invalid expression {source!r}: {e.msg}")
+    for node in ast.walk(tree):
+        if not isinstance(node, _ALLOWED_NODES):
+            raise TemplateError(f"{type(node).__name__} is not allowed in {source!r}")
+        if isinstance(node, ast.Name) and node.id not in names and node.id not in _FUNCTIONS:
+            raise TemplateError(f"unknown name {node.id!r} in {source!r}")
+        if isinstance(node, ast.Call) and (not isinstance(node.func, ast.Name) or node.func.id not in _FUNCTIONS
+                                           or node.keywords):
+            raise TemplateError(f"only {', '.join(sorted(_FUNCTIONS))} may be called in {source!r}")
+    return compile(tree, "<question template>", "eval")
+
+
+def _compile_string(text: str, names: set):
+    """Literal chunks and compiled placeholders, joined at generation time"""
+    parts, position = [], 0
+    for match in _PLACEHOLDER_PATTERN.finditer(text):
+        parts.append(text[position:match.start()])
+        if match.group(1) is None:
+            parts.append(match.group(0)[0])
+        else:
+            parts.append(_compile_expression(match.group(1), names))
+        position = match.end()
+    parts.append(text[position:])
+    parts = [part for part in parts if part != ""]
+    if len(parts) == 1 and isinstance(parts[0], str):
+        return parts[0]
+    return parts
+
+
+def _render(compiled, scope: Dict) -> str:
+    if isinstance(compiled, str):
+        return compiled
+    return "".join(part if isinstance(part, str) else format_value(eval(part, scope)) for part in compiled)
+
+
+def _domain(name: str, spec) -> List:
+    if isinstance(spec, list):
+        values = spec
+    elif isinstance(spec, dict) and "choices" in spec:
+        values = spec["choices"]
+    elif isinstance(spec, dict) and "range" in spec:
+        low, high = spec["range"]
+        values = list(range(low, high + 1, spec.get("step", 1)))
+    else:
+        raise TemplateError(f"variable {name!r} needs a list, \"choices\" or \"range\"")
+    excluded = set(spec.get("exclude", [])) if isinstance(spec, dict) else set()
+    values = [value for value in values if value not in excluded]
+    if not values:
+        raise TemplateError(f"variable {name!r} has an empty domain")
+    return values
+
+
+class QuestionTemplate:
+    """A compiled template block; generate(seed) emits one question instance"""
+
+    max_tries = 1000
+
+    def __init__(self, question: Dict):
+        block = question["template"]
+        self.question_id = question.get("id")
+        self.question_type = question.get("type")
+        self.domains = {name: _domain(name, spec) for name, spec in block.get("variables", {}).items()}
+        if not self.domains:
+            raise TemplateError("a template needs at least one variable")
+        names = set(self.domains)
+        self.derived = []
+        for name, source in block.get("derived", {}).items():
+            self.derived.append((name, _compile_expression(str(source), names)))
+            names.add(name)
+        self.constraints = [_compile_expression(source, names) for source in block.get("constraints", [])]
+        self.text = _compile_string(block.get("text", question["text"]), names)
+        self.steps = self._compile_steps(question.get("steps", []), block.get("steps", []), names)
+
+    def _compile_steps(self, question_steps: List[Dict], template_steps: List[Dict], names: set) -> List[Dict]:
+        if template_steps and len(template_steps) != len(question_steps):
+            raise TemplateError("template steps must match the question's steps one to one")
+        compiled = []
+        for index, step in enumerate(question_steps):
+            override = template_steps[index] if template_steps else {}
+            fields = {}
+            for field in _STEP_FIELDS:
+                if field in override:
+                    fields[field] = _compile_string(override[field], names)
+                elif field in step and field != "placeholder":
+                    fields[field] = _compile_string(step[field], names)
+            answers = override.get("valid_answers", step.get("valid_answers", []))
+            fields["valid_answers"] = [_compile_string(answer, names) for answer in answers]
+            compiled.append(fields)
+        return compiled
+
+    def sample(self, rng: random.Random) -> Optional[Dict]:
+        """Variable and derived values satisfying every constraint, or None"""
+        for _ in range(self.max_tries):
+            scope = {"__builtins__": {}, **_FUNCTIONS}
+            for name, values in self.domains.items():
+                scope[name] = rng.choice(values)
+            for name, code in self.derived:
+                scope[name] = eval(code, scope)
+            if all(eval(code, scope) for code in self.constraints):
+                return scope
+        return None
+
+    def generate(self, seed=None) -> Optional[Dict]:
+        """{"text", "type", "steps", "variables", "source": "template"} for one instance"""
+        scope = self.sample(random.Random(seed))
+        if scope is None:
+            return None
+        steps = []
+        for fields in self.steps:
+            step = {field: _render(value, scope) for field, value in fields.items() if field != "valid_answers"}
+            step["valid_answers"] = [_render(answer, scope) for answer in fields["valid_answers"]]
+            steps.append(step)
+        return {
+            "text": _render(self.text, scope),
+            "type": self.question_type,
+            "steps": steps,
+            "variables": {name: scope[name] for name in self.domains},
+            "source": "template",
+        }